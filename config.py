@@ -36,6 +36,82 @@ PAGE_CONFIG = {
 DEFAULT_MAP_CENTER = [33.5138, 36.2765]  # دمشق
 DEFAULT_ZOOM = 11
 
+# إعدادات بلاطات الخريطة (Tiles) المحلية
+# auto: استخدام البلاطات المحلية إن وجدت (والناقص منها من OpenStreetMap) وإلا OpenStreetMap
+# local: البلاطات المحلية فقط (الخريطة محصورة بمنطقتها) / online: OpenStreetMap فقط
+MAP_TILES_MODE = "auto"
+TILES_DIR = "static/tiles"  # يُخدَّم عبر Streamlit static serving
+LOCAL_TILES_URL = "/app/static/tiles/{z}/{x}/{y}.png"
+LOCAL_TILES_ATTRIBUTION = "&copy; OpenStreetMap contributors (offline cache)"
+TILE_SOURCE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+TILE_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
+TILE_PREFETCH_ZOOMS = (10, 16)
+TILE_PREFETCH_DELAY = 0.1  # ثانية بين الطلبات احتراماً لسياسة خوادم OSM
+TILE_USER_AGENT = "UNDP-Houses-Rehab-Dashboard/1.0 (offline tile prefetch)"
+
+# عدد الخرائط المبنية المحفوظة في الذاكرة (LRU مشترك بين المستخدمين)
+MAP_CACHE_MAX_ENTRIES = 32
+MAP_CACHE_TTL = 600  # ثانية؛ تعيد بناء الخريطة فتتجدد روابط صور النوافذ المنبثقة وأوقات استخدامها
+MAP_HEIGHT = 600
+
+# نصف القطر الافتراضي لاستعلام المنازل القريبة (متر)
+NEARBY_RADIUS_M = 500
+
+# الحدود التقريبية لسوريا للتحقق من صحة إحداثيات GPS (جنوب، غرب، شمال، شرق)
+SYRIA_BBOX = (32.3, 35.6, 37.4, 42.4)
+
+# أعمدة علامات جودة GPS (تُضاف في clean_houses_data)
+GPS_FLAG_COLUMNS = ['gps_missing', 'gps_zero', 'gps_swapped', 'gps_outside', 'gps_duplicate']
+
+# ملفات الحدود الإدارية (GeoJSON) للخرائط الملونة حسب المنطقة
+BOUNDARIES_DIR = "data/boundaries"
+# خصائص اسم المنطقة بالترتيب المفضل (تسميات OCHA COD ثم أسماء عامة)
+BOUNDARY_NAME_PROPERTIES = ("ADM3_AR", "ADM3_EN", "ADM2_AR", "ADM2_EN", "name", "NAME")
+
+# مخزن الصور على القرص (صور KoboToolbox تُحمّل مرة واحدة لكل نشر)
+# الصور الأصلية (وثائق شخصية وملكية) وبيانات التحقق خارج مجلد static فلا تُخدَّم للعموم؛
+# النسخ المصغرة وحدها تُخدَّم عبر Streamlit static serving مع ETag و Cache-Control طويل
+IMAGE_CACHE_DIR = "data/cache/images"
+IMAGE_VARIANTS_DIR = "static/media"
+MEDIA_URL_PREFIX = "/app/static/media"
+IMAGE_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+IMAGE_FETCH_TIMEOUT = 10  # ثانية
+IMAGE_PREFETCH_WORKERS = 8  # الحد الأقصى للتنزيلات المتزامنة لمعرض صور واحد
+IMAGE_REVALIDATE_AFTER = 24 * 3600  # ثانية قبل إعادة التحقق من الصورة (ETag / Last-Modified)
+
+# مزامنة جميع الوسائط للعمل دون اتصال (python -m utils.media_sync)
+MEDIA_MANIFEST_PATH = "data/media_manifest.json"
+MEDIA_SYNC_WORKERS = 4
+MEDIA_SYNC_RATE = 5.0  # الحد الأقصى للطلبات في الثانية
+
+# عروض الصور المصغرة (WebP) المولدة مرة واحدة لكل صورة
+THUMBNAIL_SIZES = (160, 400, 1200)
+THUMBNAIL_QUALITY = 80
+PHOTO_CAROUSEL_HEIGHT = 640  # ارتفاع معرض صور المنزل في النافذة المنبثقة
+
+# التنقل بين المستفيدين في النافذة المنبثقة (السابق / التالي)
+MODAL_PREFETCH_RADIUS = 1  # عدد المستفيدين المجهزين مسبقاً في كل اتجاه
+MODAL_PREFETCH_WORKERS = 2  # خيوط التجهيز في الخلفية (مشتركة بين الجلسات)
+
+# أحجام صفحة الجداول المرقمة (الأول هو الافتراضي)
+TABLE_PAGE_SIZES = (50, 100, 250)
+
+# تصدير ملفات المستفيدين القابلة للطباعة (ZIP)
+DOSSIER_EXPORT_WORKERS = 4  # عمليات البناء المتوازية
+DOSSIER_CHUNK_SIZE = 10  # عدد الملفات في كل مهمة
+DOSSIER_PHOTO_WIDTH = 400  # عرض صور الملفات (أحد THUMBNAIL_SIZES)
+DOSSIER_TEMP_MAX_AGE = 3600  # ثانية؛ ملفات ZIP التي لم تُنزّل تُحذف بعدها
+
+# تصدير البيانات المفلترة (Excel، CSV، Parquet) على دفعات
+EXPORT_CHUNK_ROWS = 5000  # عدد الصفوف المقروءة والمكتوبة في كل دفعة
+
+# عميل HTTP المشترك (وسائط KoboToolbox)
+HTTP_POOL_SIZE = 16  # اتصالات مفتوحة لكل خادم
+HTTP_RETRY_ATTEMPTS = 3
+HTTP_RETRY_BACKOFF = 0.5  # ثانية (تتضاعف مع كل محاولة)
+HTTP_USER_AGENT = "UNDP-Houses-Rehab-Dashboard/1.0"
+HTTP_HOST_COOLDOWN = 60  # ثانية لا تُرسل فيها طلبات لخادم تعذر الوصول إليه
+
 # مسارات البيانات
 DATA_PATH = "data/raw/181-UNDP-Houses Rehab Tracker.xlsx"
 IMAGES_PATH = "assets/images/"
@@ -3,8 +3,11 @@
 """
 import streamlit as st
 import pandas as pd
+import numpy as np
 from pathlib import Path
 import sys
+import zlib
+import functools
 
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -17,10 +20,15 @@ from utils.data_loader import (
     load_houses_data,
     load_main_items,
     load_sub_items,
-    filter_houses,
-    search_houses
+    get_filtered_positions,
+    get_data_version
 )
 from utils.beneficiary_modal import create_beneficiary_modal
+from utils.geo_index import get_house_index
+from utils.pagination import create_pager
+from utils.dossiers import create_dossier_bundle, read_dossier_bundle
+from utils.export import create_data_export
+from utils.records import get_beneficiary_records
 
 st.set_page_config(**PAGE_CONFIG)
 st.markdown(get_dynamic_css(tm), unsafe_allow_html=True)
@@ -32,9 +40,12 @@ with st.sidebar:
     create_language_switcher(tm)
 
 
+DATA_FILE = Path(__file__).parent.parent / DATA_PATH
+
+
 @st.cache_data
 def load_all_data():
-    file_path = Path(__file__).parent.parent / DATA_PATH
+    file_path = DATA_FILE
     if not file_path.exists():
         return None, None, None
     houses = load_houses_data(str(file_path))
@@ -60,58 +71,134 @@ if df is not None and not df.empty:
         types = [tm.t('beneficiaries.all')] + sorted(df['نوع المنزل'].dropna().unique().tolist())
         sel_type = st.selectbox(f"🏘️ {tm.t('beneficiaries.filter_house_type')}", types, key="type")
     
-    # تطبيق الفلاتر
+    # تطبيق الفلاتر: مواضع الصفوف المطابقة بترتيب العرض، دون نسخ البيانات
     all_text = tm.t('beneficiaries.all')
-    filtered_df = df.copy()
-    if search_term:
-        filtered_df = search_houses(filtered_df, search_term)
-    filtered_df = filter_houses(
-        filtered_df,
-        governorate=sel_gov if sel_gov != all_text else None,
-        damage_status=sel_damage if sel_damage != all_text else None,
-        house_type=sel_type if sel_type != all_text else None
-    )
+    data_version = get_data_version(str(DATA_FILE))
     
-    # عنوان النتائج مع زر عرض التفاصيل
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        st.markdown(f"### 📊 {tm.t('beneficiaries.results')}: ({len(filtered_df)} {tm.t('beneficiaries.beneficiary')})")
+    # عنوان النتائج مع الترتيب وزر عرض التفاصيل
+    col1, col2, col3 = st.columns([2, 1, 1], vertical_alignment="bottom")
     with col2:
+        sort_options = {
+            None: tm.t('beneficiaries.sort_default'),
+            'الاسم الكامل': tm.t('fields.full_name'),
+            'المحافظة': tm.t('fields.governorate'),
+            'المنطقة': tm.t('fields.district'),
+            'حالة الضرر': tm.t('fields.damage_status'),
+        }
+        sort_column = st.selectbox(f"↕️ {tm.t('beneficiaries.sort_by')}", list(sort_options), format_func=sort_options.get, key="sort")
+    with col3:
         view_btn = st.button(f"👁️ {tm.t('buttons.view_details')}", type="primary", use_container_width=True)
     
-    if len(filtered_df) > 0:
+    positions = get_filtered_positions(
+        data_version,
+        sort_column,
+        search_term,
+        sel_gov if sel_gov != all_text else None,
+        sel_damage if sel_damage != all_text else None,
+        sel_type if sel_type != all_text else None,
+        df
+    )
+    with col1:
+        st.markdown(f"### 📊 {tm.t('beneficiaries.results')}: ({len(positions)} {tm.t('beneficiaries.beneficiary')})")
+    
+    if len(positions) > 0:
+        # الصفحة المعروضة فقط تُقتطع من الترتيب وتُرسل للمتصفح
+        start, end = create_pager(
+            len(positions),
+            key="beneficiaries",
+            reset_on=(search_term, sel_gov, sel_damage, sel_type, sort_column)
+        )
+        page_positions = positions[start:end]
+        
         # تحضير الجدول
         display_cols = ['الاسم الكامل', 'المحافظة', 'المنطقة', 'حالة الضرر', '_index']
-        available = [c for c in display_cols if c in filtered_df.columns]
-        display_df = filtered_df[available].copy()
+        available = [c for c in display_cols if c in df.columns]
+        display_df = df.iloc[page_positions][available]
+        ids = df['_index'].to_numpy()
+        page_ids = ids[page_positions].tolist()
+        
+        # التحديد يُحفظ كـ _index ثابت لا كموضع في الصفحة؛ مفتاح الجدول يتغير مع
+        # صفوفه فلا ينتقل تحديد صف إلى مستفيد آخر عند تغيير الصفحة أو الفلاتر
+        table_key = f"beneficiaries_table_{zlib.crc32(page_positions.tobytes())}"
+        
+        def remember_selection():
+            rows = st.session_state[table_key].selection.rows
+            st.session_state['selected_beneficiary'] = page_ids[rows[0]] if rows else None
         
         # عرض الجدول مع إمكانية التحديد
-        selected = st.dataframe(
+        st.dataframe(
             display_df,
             use_container_width=True,
             hide_index=True,
             height=400,
-            on_select="rerun",
-            selection_mode="single-row"
+            on_select=remember_selection,
+            selection_mode="single-row",
+            key=table_key
         )
         
-        # تحديد المستفيد المختار
-        selected_idx = None
-        if selected and selected.selection and selected.selection.rows:
-            selected_idx = selected.selection.rows[0]
+        # تحديد المستفيد المختار (ضمن النتائج الحالية، وإلا أول عنصر)
+        order_ids = ids[positions]
+        selected_id = st.session_state.get('selected_beneficiary')
+        matches = np.flatnonzero(order_ids == selected_id) if selected_id is not None else []
+        selected_pos = int(matches[0]) if len(matches) else None
+        if selected_pos is not None:
+            selected_record = get_beneficiary_records(data_version, df).get(selected_id)
+            if selected_record is not None:
+                st.caption(f"✔️ {tm.t('beneficiaries.selected')}: {selected_record.full_name or selected_id}")
+        
+        # تصدير النتائج الحالية (جميع الصفحات) من البيانات الأصلية مباشرة
+        with st.expander(f"📥 {tm.t('export.title')}"):
+            create_data_export(df, key="beneficiaries_export", positions=positions, file_stem="beneficiaries")
+        
+        # ملفات المستفيدين القابلة للطباعة لجميع النتائج الحالية (ZIP)
+        with st.expander(f"📦 {tm.t('dossiers.title')}"):
+            st.caption(tm.t('dossiers.note').format(count=len(positions)))
+            export_key = (data_version, tm.get_current_language(), search_term, sel_gov, sel_damage, sel_type, sort_column)
+            if st.button(f"🗂️ {tm.t('dossiers.create')}", key="dossiers_create"):
+                previous = st.session_state.pop('dossier_export', None)
+                if previous:
+                    Path(previous[1]).unlink(missing_ok=True)
+                
+                records = get_beneficiary_records(data_version, df)
+                bar = st.progress(0.0, text=tm.t('messages.loading'))
+                
+                def report(done, total):
+                    bar.progress(done / total, text=tm.t('dossiers.progress').format(done=done, total=total))
+                
+                path = create_dossier_bundle([records[i] for i in order_ids.tolist()], sub_items_df, data_version, progress=report)
+                st.session_state['dossier_export'] = (export_key, str(path))
+            
+            # الجلسة تحفظ مسار الملف فقط؛ يُقرأ عند الضغط على زر التنزيل ثم يُحذف،
+            # فيختفي الزر في إعادة التشغيل التالية للضغط
+            if st.session_state.get('dossiers_download'):
+                st.session_state.pop('dossier_export', None)
+            export = st.session_state.get('dossier_export')
+            if export and export[0] == export_key and Path(export[1]).exists():
+                st.download_button(
+                    f"⬇️ {tm.t('dossiers.download')}",
+                    data=functools.partial(read_dossier_bundle, export[1]),
+                    file_name="dossiers.zip",
+                    mime="application/zip",
+                    use_container_width=True,
+                    key="dossiers_download"
+                )
         
         # فتح التفاصيل عند الضغط على الزر
         if view_btn:
-            if selected_idx is not None:
-                row_data = filtered_df.iloc[selected_idx]
-            else:
-                row_data = filtered_df.iloc[0]  # أول عنصر
-            
-            beneficiary_name = f"{row_data.get('الاسم الأول', '')} {row_data.get('اسم الأب', '')} {row_data.get('الكنية', '')}"
+            # موضع المستفيد في النتائج المفلترة؛ أزرار السابق / التالي في النافذة تغيره
+            st.session_state['modal_position'] = selected_pos if selected_pos is not None else 0  # أول عنصر
+            row_data = df.iloc[positions[st.session_state['modal_position']]]
             
-            @st.dialog(f"{tm.t('beneficiaries.title')}: {beneficiary_name}", width="large")
+            # العنوان ثابت أثناء التنقل، واسم المستفيد الحالي في شريط التنقل داخل النافذة
+            @st.dialog(tm.t('beneficiaries.title'), width="large")
             def show_details():
-                create_beneficiary_modal(row_data, main_items_df, sub_items_df)
+                create_beneficiary_modal(
+                    row_data, main_items_df, sub_items_df,
+                    houses_df=df,
+                    geo_index=get_house_index(data_version, df),
+                    data_version=data_version,
+                    order=order_ids.tolist()
+                )
             
             show_details()
     else:
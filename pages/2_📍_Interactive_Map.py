@@ -5,14 +5,31 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 import sys
-from streamlit_folium import st_folium
+import functools
+import streamlit.components.v1 as components
 
 # إضافة مسار المشروع
 sys.path.append(str(Path(__file__).parent.parent))
 
 from config import *
-from utils.data_loader import load_houses_data, filter_houses
-from utils.maps import create_houses_map, add_map_legend
+from utils.data_loader import (
+    load_houses_data,
+    load_sub_items,
+    filter_houses,
+    get_filtered_positions,
+    get_data_version,
+    get_assessed_mask,
+    get_gps_quality_summary
+)
+from utils.maps import get_houses_map_html
+from utils.geo_index import get_house_index, nearby_houses, nearest_house
+from utils.routing import plan_route
+from utils.clustering import get_house_costs, get_work_packages
+from utils.gazetteer import get_gazetteer, get_bounds_for
+from utils.boundaries import list_boundary_files, get_area_assignment
+from utils.timeline import get_timeline, filter_timeline
+from utils.geo_export import EXPORT_FORMATS, read_export
+from utils.export import create_data_export
 from utils.i18n import tm
 from utils.styles import get_dynamic_css
 from utils.sidebar import get_sidebar_css, create_language_switcher
@@ -35,15 +52,21 @@ with st.sidebar:
     create_language_switcher(tm)
     st.markdown("---")
 
+DATA_FILE = Path(__file__).parent.parent / DATA_PATH
+
 # تحميل البيانات
 @st.cache_data
 def load_data():
-    file_path = Path(__file__).parent.parent / DATA_PATH
+    file_path = DATA_FILE
     if not file_path.exists():
         st.error(f"⚠️ {tm.t('messages.no_data')}")
         return None
     return load_houses_data(str(file_path))
 
+@st.cache_data
+def load_sub_items_data():
+    return load_sub_items(str(DATA_FILE))
+
 df = load_data()
 
 if df is not None and not df.empty:
@@ -70,16 +93,36 @@ if df is not None and not df.empty:
     
     # تطبيق الفلاتر
     all_text = tm.t('beneficiaries.all')
+    map_filters = (
+        selected_gov if selected_gov != all_text else None,
+        selected_damage if selected_damage != all_text else None,
+        selected_type if selected_type != all_text else None
+    )
     filtered_df = filter_houses(
         df,
-        governorate=selected_gov if selected_gov != all_text else None,
-        damage_status=selected_damage if selected_damage != all_text else None,
-        house_type=selected_type if selected_type != all_text else None
+        governorate=map_filters[0],
+        damage_status=map_filters[1],
+        house_type=map_filters[2]
     )
     
     # فلترة المنازل التي لديها إحداثيات
     map_df = filtered_df[filtered_df['latitude'].notna() & filtered_df['longitude'].notna()]
     
+    # جودة الإحداثيات (العلامات محسوبة مسبقاً عند تحميل البيانات)
+    gps_summary = get_gps_quality_summary(filtered_df)
+    with st.expander(f"🛰️ {tm.t('map.gps.title')} ({gps_summary.get('gps_suspect', 0)})"):
+        gps_cols = st.columns(5)
+        for gps_col, flag in zip(gps_cols, ['gps_missing', 'gps_zero', 'gps_swapped', 'gps_outside', 'gps_duplicate']):
+            with gps_col:
+                st.metric(tm.t(f'map.gps.{flag}'), gps_summary.get(flag, 0))
+        show_suspect = st.checkbox(tm.t('map.gps.show_suspect'), value=True)
+        show_imputed = st.checkbox(tm.t('map.gps.show_imputed'), value=True)
+    
+    if not show_suspect and 'gps_suspect' in map_df.columns:
+        map_df = map_df[~map_df['gps_suspect'].astype(bool)]
+    if not show_imputed and 'gps_imputed' in map_df.columns:
+        map_df = map_df[map_df['gps_imputed'] == '']
+    
     # عرض الإحصائيات
     col1, col2, col3 = st.columns(3)
     
@@ -87,24 +130,250 @@ if df is not None and not df.empty:
         st.metric(f"📋 {tm.t('map.total_houses')}", len(filtered_df))
     
     with col2:
-        st.metric(f"📍 {tm.t('map.houses_on_map')}", len(map_df))
+        imputed_count = int((map_df['gps_imputed'] != '').sum()) if 'gps_imputed' in map_df.columns else 0
+        st.metric(
+            f"📍 {tm.t('map.houses_on_map')}",
+            len(map_df),
+            help=f"{tm.t('map.gps.approximate')}: {imputed_count}" if imputed_count else None
+        )
     
     with col3:
-        missing = len(filtered_df) - len(map_df)
+        missing = gps_summary.get('gps_missing', len(filtered_df) - len(map_df))
         st.metric(f"⚠️ {tm.t('map.without_coordinates')}", missing)
     
+    # تصدير المنازل المفلترة لأنظمة المعلومات الجغرافية
+    with st.expander(f"📤 {tm.t('map.export.title')}"):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            export_format = st.selectbox(
+                tm.t('map.export.format'),
+                list(EXPORT_FORMATS.keys()),
+                format_func=lambda fmt: tm.t(f'map.export.format_{fmt}')
+            )
+        with col2:
+            extension, mime = EXPORT_FORMATS[export_format]
+            # الملف يُكتب عند الضغط فقط ويُحذف بعد قراءته
+            st.download_button(
+                f"⬇️ {tm.t('map.export.download')}",
+                data=functools.partial(read_export, filtered_df, export_format),
+                file_name=f"houses.{extension}",
+                mime=mime,
+                on_click='ignore',
+                use_container_width=True
+            )
+        st.caption(tm.t('map.export.note'))
+    
+    # تصدير جدول المنازل المفلترة (Excel، CSV، Parquet) من البيانات الأصلية بمواضع الصفوف
+    with st.expander(f"📥 {tm.t('export.title')}"):
+        create_data_export(
+            df,
+            key="map_export",
+            positions=get_filtered_positions(get_data_version(str(DATA_FILE)), None, '', *map_filters, df),
+            file_stem="houses"
+        )
+    
     st.markdown("---")
     
     # عرض الخريطة
     if len(map_df) > 0:
         st.markdown(f"### 🗺️ {tm.t('nav.map')}")
         
-        # إنشاء الخريطة مع تمرير مدير الترجمات
-        houses_map = create_houses_map(map_df, tm=tm)
-        houses_map = add_map_legend(houses_map, tm=tm)
+        # مخطط مسار الزيارات الميدانية
+        route_df = None
+        with st.expander(f"🧭 {tm.t('map.route.title')}"):
+            route_groups = {
+                'Contractor': tm.t('map.route.contractor'),
+                'القرية': tm.t('map.route.village')
+            }
+            route_groups = {col: label for col, label in route_groups.items() if col in map_df.columns}
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                group_col = st.selectbox(
+                    tm.t('map.route.group_by'),
+                    list(route_groups.keys()),
+                    format_func=lambda col: route_groups[col]
+                )
+            with col2:
+                group_values = [v for v in sorted(map_df[group_col].astype(str).unique()) if v.strip()]
+                group_value = st.selectbox(tm.t('map.route.group'), [None] + group_values,
+                                           format_func=lambda v: tm.t('map.route.none') if v is None else v)
+            
+            if group_value is not None:
+                route_df, route_total = plan_route(map_df[map_df[group_col].astype(str) == group_value])
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric(f"📍 {tm.t('map.route.stops')}", len(route_df))
+                with col2:
+                    st.metric(f"📏 {tm.t('map.route.total_distance')}", f"{route_total / 1000:,.2f} km")
+                
+                route_cols = ['visit_order', 'الاسم الكامل', 'القرية', 'حالة الضرر', 'leg_m']
+                st.dataframe(
+                    route_df[[c for c in route_cols if c in route_df.columns]].rename(columns={
+                        'visit_order': tm.t('map.route.order'),
+                        'leg_m': tm.t('map.route.leg')
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+        
+        # تقسيم المنازل المعروضة إلى حزم عمل متقاربة ومتوازنة التكلفة
+        packages = None
+        with st.expander(f"📦 {tm.t('map.packages.title')}"):
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                n_packages = st.number_input(
+                    tm.t('map.packages.count'),
+                    min_value=0,
+                    max_value=max(0, min(30, len(map_df))),
+                    value=0,
+                    help=tm.t('map.packages.help')
+                )
+            
+            if n_packages > 0:
+                costs = get_house_costs(df, load_sub_items_data())
+                packages = get_work_packages(
+                    get_data_version(str(DATA_FILE)),
+                    map_filters + (show_suspect, show_imputed),
+                    int(n_packages),
+                    map_df,
+                    costs
+                )
+                packages_df, packages_summary = packages
+                
+                with col2:
+                    st.metric(
+                        f"⚖️ {tm.t('map.packages.balance')}",
+                        f"{packages_summary['cost_share'].min():.0%} – {packages_summary['cost_share'].max():.0%}"
+                    )
+                
+                summary_cols = ['houses', 'cost', 'cost_share', 'radius_m', 'villages']
+                st.dataframe(
+                    packages_summary[[c for c in summary_cols if c in packages_summary.columns]]
+                    .reset_index()
+                    .rename(columns={col: tm.t(f'map.packages.col_{col}') for col in ['package'] + summary_cols}),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={tm.t('map.packages.col_cost_share'): st.column_config.NumberColumn(format="percent")}
+                )
+                
+                col1, col2 = st.columns(2)
+                for column, fmt in zip((col1, col2), ('csv', 'geojson')):
+                    extension, mime = EXPORT_FORMATS[fmt]
+                    with column:
+                        st.download_button(
+                            f"⬇️ {tm.t(f'map.export.format_{fmt}')}",
+                            data=functools.partial(read_export, packages_df, fmt),
+                            file_name=f"work_packages.{extension}",
+                            mime=mime,
+                            on_click='ignore',
+                            use_container_width=True,
+                            key=f"packages_{fmt}"
+                        )
+        
+        # تلوين المناطق الإدارية (ملفات GeoJSON في BOUNDARIES_DIR)
+        choropleth = None
+        area_ids = None
+        with st.expander(f"🗾 {tm.t('map.choropleth.title')}"):
+            boundary_files = list_boundary_files()
+            if not boundary_files:
+                st.info(tm.t('map.choropleth.no_files').format(folder=BOUNDARIES_DIR))
+            else:
+                col1, col2 = st.columns(2)
+                with col1:
+                    boundary_file = st.selectbox(
+                        tm.t('map.choropleth.file'),
+                        [None] + [str(f) for f in boundary_files],
+                        format_func=lambda f: tm.t('map.choropleth.none') if f is None else Path(f).stem
+                    )
+                with col2:
+                    metric = st.selectbox(
+                        tm.t('map.choropleth.metric'),
+                        ['houses', 'cost', 'severe_share'],
+                        format_func=lambda m: tm.t(f'map.choropleth.metric_{m}')
+                    )
+                
+                if boundary_file is not None:
+                    boundary_version = Path(boundary_file).stat().st_mtime
+                    choropleth = (boundary_file, boundary_version, metric)
+                    area_ids = get_area_assignment(
+                        get_data_version(str(DATA_FILE)), boundary_file, boundary_version, df
+                    )
+                    matched = int((area_ids.reindex(map_df.index) >= 0).sum())
+                    st.caption(tm.t('map.choropleth.matched').format(matched=matched, total=len(map_df)))
+        
+        # الخط الزمني للتقييمات (إطارات الأيام محسوبة مرة واحدة لكل إصدار بيانات)
+        show_timeline = st.toggle(f"⏱️ {tm.t('map.timeline.toggle')}", help=tm.t('map.timeline.help'))
+        timeline = None
+        if show_timeline:
+            timeline = filter_timeline(get_timeline(get_data_version(str(DATA_FILE)), df), map_df.index)
+        
+        # بناء الخريطة (أو استرجاعها من الذاكرة المؤقتة لنفس الفلاتر واللغة)
+        map_html = get_houses_map_html(
+            get_data_version(str(DATA_FILE)),
+            map_filters + (show_suspect, show_imputed, show_timeline),
+            tm.get_current_language(),
+            map_df,
+            tm,
+            route=tuple(route_df.index) if route_df is not None else None,
+            _bounds=get_bounds_for(get_gazetteer(get_data_version(str(DATA_FILE)), df), map_df),
+            choropleth=choropleth,
+            _area_ids=area_ids,
+            _timeline=timeline,
+            packages=(int(n_packages),) if packages is not None else None,
+            _packages=packages
+        )
         
         # عرض الخريطة
-        st_folium(houses_map, width=None, height=600)
+        components.html(map_html, height=MAP_HEIGHT)
+        
+        # استعلام المنازل القريبة
+        st.markdown("---")
+        st.markdown(f"### 📏 {tm.t('map.nearby.title')}")
+        
+        geo_index = get_house_index(get_data_version(str(DATA_FILE)), df)
+        assessed_mask = get_assessed_mask(df)
+        anchor_positions = df.index.get_indexer(map_df.index).tolist()
+        
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            anchor = st.selectbox(
+                f"🏠 {tm.t('map.nearby.anchor')}",
+                anchor_positions,
+                format_func=lambda pos: f"{df.iloc[pos].get('الاسم الكامل', '')} - {df.iloc[pos].get('القرية', '')}"
+            )
+        with col2:
+            radius = st.number_input(f"📏 {tm.t('map.nearby.radius')}", min_value=50, max_value=20000,
+                                     value=NEARBY_RADIUS_M, step=50)
+        with col3:
+            assessed_only = st.checkbox(tm.t('map.nearby.assessed_only'))
+        
+        neighbours = nearby_houses(df, geo_index, anchor, radius,
+                                   mask=assessed_mask if assessed_only else None)
+        
+        st.markdown(f"**{tm.t('map.nearby.results')}: {len(neighbours)}**")
+        if len(neighbours) > 0:
+            nearby_cols = ['الاسم الكامل', 'القرية', 'حالة الضرر', 'distance_m']
+            st.dataframe(
+                neighbours[[c for c in nearby_cols if c in neighbours.columns]].rename(
+                    columns={'distance_m': tm.t('map.nearby.distance')}
+                ),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info(tm.t('map.nearby.none_found'))
+        
+        nearest = nearest_house(df, geo_index, anchor, mask=~assessed_mask)
+        if nearest is not None:
+            nearest_row, nearest_dist = nearest
+            st.success(
+                f"🎯 {tm.t('map.nearby.nearest_unassessed')}: "
+                f"{nearest_row.get('الاسم الكامل', '')} - {nearest_row.get('القرية', '')} ({nearest_dist:,.0f} m)"
+            )
+        else:
+            st.info(tm.t('map.nearby.no_unassessed'))
         
         # معلومات إضافية
         st.markdown("---")
@@ -0,0 +1,267 @@
+"""
+عرض تبويبات معلومات المستفيد (الشخصية، الأسرة، العنوان، المنزل) كقالب HTML واحد
+
+كل جزء من التبويب يُبنى من قالب Jinja2 مُجمّع مرة واحدة إلى كتلة HTML واحدة
+(رسالة st.markdown واحدة بدلاً من رسالة لكل حقل)، ويُخزن لكل (مستفيد، لغة).
+القيم تُقرأ من سجل المستفيد (BeneficiaryRecord) المُطبّع مسبقاً.
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import streamlit as st
+from jinja2 import Environment
+from markupsafe import Markup, escape
+
+from utils.i18n import tm
+from utils.records import BeneficiaryRecord
+
+
+class InfoField(NamedTuple):
+    """حقل معلومات: مفتاح الترجمة، سمة السجل (BeneficiaryRecord)، الأيقونة"""
+    label: str
+    attr: str
+    icon: str
+    label_suffix: str = ''
+    value_format: str = '{}'
+
+
+class InfoSection(NamedTuple):
+    """قسم بعنوان فرعي وحقوله موزعة على أعمدة (مع عنوان اختياري لكل عمود)"""
+    icon: str
+    title: Optional[str]
+    columns: List[List[InfoField]]
+    note_field: Optional[str] = None
+    column_titles: Tuple[Tuple[str, str], ...] = ()
+
+
+class InfoPart(NamedTuple):
+    """جزء من تبويب يُعرض كتلة HTML واحدة"""
+    icon: Optional[str]
+    title: Optional[str]
+    sections: List[InfoSection]
+
+
+F = InfoField
+
+# أجزاء التبويبات بالترتيب الذي تُعرض به
+INFO_PARTS: Dict[str, InfoPart] = {
+    'personal': InfoPart('👤', 'modal.personal_info', [
+        InfoSection('', None, [
+            [F('fields.first_name', 'first_name', '📝'),
+             F('fields.father_name', 'father_name', '👨'),
+             F('fields.last_name', 'last_name', '📛'),
+             F('fields.mother_name', 'mother_name', '👩')],
+            [F('fields.gender', 'gender', '⚧'),
+             F('fields.birth_date', 'birth_date', '📅'),
+             F('fields.marital_status', 'marital_status', '💍'),
+             F('fields.spouse_name', 'spouse_name', '👫')],
+            [F('fields.id_type', 'id_type', '📋'),
+             F('fields.id_number', 'id_number', '🔢')],
+            [F('fields.phone', 'phone', '📱'),
+             F('fields.phone_alt', 'phone_alt', '📞')],
+        ], column_titles=(
+            ('📝', 'modal.basic_info'),
+            ('ℹ️', 'modal.additional_info'),
+            ('🆔', 'modal.document_info'),
+            ('📞', 'modal.contact_info'),
+        )),
+    ]),
+    'health': InfoPart(None, None, [
+        InfoSection('🏥', 'modal.health_info', [
+            [F('fields.disability', 'disability', '♿')],
+            [F('fields.chronic_diseases', 'chronic_diseases', '💊')],
+        ]),
+    ]),
+    'family': InfoPart('👨‍👩‍👧‍👦', 'modal.family_info', [
+        InfoSection('', None, [
+            [F('fields.families_in_house', 'families_in_house', '🏠')],
+            [F('fields.family_size', 'family_size', '👥')],
+            [F('fields.family_type', 'family_type', '💼')],
+        ]),
+        InfoSection('📊', 'modal.family_distribution', [
+            [F('fields.men', 'men', '👨', ' (+18)'),
+             F('fields.women', 'women', '👩', ' (+18)')],
+            [F('fields.boys', 'boys', '👦'),
+             F('fields.girls', 'girls', '👧')],
+            [F('fields.child_boys', 'child_boys', '👶'),
+             F('fields.child_girls', 'child_girls', '👶')],
+        ]),
+        InfoSection('🎯', 'modal.special_categories', [
+            [F('fields.elderly_count', 'elderly_count', '👴'),
+             F('fields.disabled_count', 'disabled_count', '♿'),
+             F('fields.separated_children', 'separated_children', '👶')],
+            [F('fields.nursing_mothers', 'nursing_mothers', '🤱'),
+             F('fields.pregnant_women', 'pregnant_women', '🤰')],
+            [F('fields.divorced_women', 'divorced_women', '💔'),
+             F('fields.widowed_women', 'widowed_women', '🖤')],
+        ]),
+        InfoSection('💰', 'modal.economic_info', [
+            [F('fields.income_source', 'income_source', '💵')],
+            [F('fields.working_members', 'working_members', '👷')],
+            [],
+        ]),
+    ]),
+    'address': InfoPart('📍', 'modal.address_info', [
+        InfoSection('', None, [
+            [F('fields.governorate', 'governorate', '🏛️'),
+             F('fields.district', 'district', '🏘️'),
+             F('fields.subdistrict', 'subdistrict', '📍'),
+             F('fields.village', 'village', '🏡')],
+            [F('fields.detailed_address', 'detailed_address', '🗺️'),
+             F('fields.full_address', 'full_address', '📮'),
+             F('fields.residence_status', 'residence_area_status', '🏠')],
+        ]),
+        InfoSection('🌍', 'modal.gps_coordinates', [
+            [F('fields.latitude', 'gps_latitude', '🧭')],
+            [F('fields.longitude', 'gps_longitude', '🧭')],
+        ]),
+        InfoSection('', None, [
+            [F('fields.residence_status', 'residence_status', '🏚️')],
+        ]),
+    ]),
+    'house': InfoPart('🏠', 'modal.house_info', [
+        InfoSection('📝', 'modal.basic_info', [
+            [F('fields.house_type', 'house_type', '🏘️'),
+             F('fields.rooms', 'rooms', '🛏️')],
+            [F('fields.floor', 'floor', '🏢'),
+             F('fields.area', 'area', '📐', value_format='{} m²')],
+            [F('fields.damage_status', 'damage_status', '⚠️')],
+        ]),
+        InfoSection('📄', 'modal.ownership_documents', [
+            [F('fields.ownership_document', 'ownership_document', '📋')],
+            [F('fields.ownership_type', 'ownership_type', '📑')],
+            [F('fields.ownership_date', 'ownership_date', '📅')],
+        ]),
+    ]),
+    'house_condition': InfoPart(None, None, [
+        InfoSection('🔍', 'modal.house_condition', [
+            [F('fields.external_walls', 'external_walls', '🧱'),
+             F('fields.internal_walls', 'internal_walls', '🏗️')],
+            [F('fields.roof', 'roof', '🏚️'),
+             F('fields.building_damage', 'building_damage', '⚠️')],
+            [F('fields.facilities', 'facilities', '🚰'),
+             F('fields.sewerage', 'sewerage', '🚽')],
+        ]),
+        InfoSection('📝', 'modal.damage_description', [], note_field='damage_description'),
+    ]),
+}
+
+
+def _nl2br(value) -> Markup:
+    """تهريب النص وتحويل الأسطر الجديدة إلى <br> (السطر الفارغ ينهي كتلة HTML في Markdown)"""
+    return Markup('<br>').join(escape(str(value)).splitlines())
+
+
+# القالب مُجمّع مرة واحدة؛ بلا أسطر فارغة أو مسافات بادئة كي يبقى كتلة HTML واحدة في Markdown
+_env = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+_env.filters['nl2br'] = _nl2br
+INFO_TEMPLATE = _env.from_string("""\
+<style>
+.bm-part { {{ direction }} }
+.bm-grid { display: grid; gap: 0 16px; margin-bottom: 8px; }
+.bm-field { margin-bottom: 4px; }
+.bm-note { background: rgba(28, 131, 225, 0.1); color: inherit; padding: 12px 16px; border-radius: 8px; }
+@media (max-width: 640px) { .bm-grid { grid-template-columns: 1fr !important; } }
+</style>
+<div class="bm-part">
+{% if heading %}
+<h3>{{ heading }}</h3>
+{% endif %}
+{% for section in sections %}
+{% if not loop.first or not heading %}
+<hr>
+{% endif %}
+{% if section.title %}
+<h4>{{ section.title }}</h4>
+{% endif %}
+{% if section.columns %}
+<div class="bm-grid" style="grid-template-columns: repeat({{ section.columns|length }}, minmax(0, 1fr));">
+{% for column in section.columns %}
+<div>
+{% if section.column_titles %}
+<h4>{{ section.column_titles[loop.index0] }}</h4>
+{% endif %}
+{% for field in column %}
+<div class="bm-field"><strong>{{ field.icon }} {{ field.label }}:</strong> {{ field.value|nl2br }}</div>
+{% endfor %}
+</div>
+{% endfor %}
+</div>
+{% endif %}
+{% if section.note is not none %}
+<div class="bm-note">{{ section.note|nl2br }}</div>
+{% endif %}
+{% endfor %}
+</div>
+""")
+
+
+def _field_context(record: BeneficiaryRecord, field: InfoField) -> Dict:
+    """قيمة الحقل وتسميته كما تعرضهما display_field"""
+    value = getattr(record, field.attr)
+    value = tm.t('messages.no_data') if value is None else field.value_format.format(value)
+    return {'icon': field.icon, 'label': tm.t(field.label) + field.label_suffix, 'value': value}
+
+
+def render_info_part(part: str, record: BeneficiaryRecord) -> str:
+    """
+    بناء كتلة HTML لجزء من تبويب معلومات المستفيد
+
+    Args:
+        part: مفتاح في INFO_PARTS
+        record: سجل المستفيد
+
+    Returns:
+        نص HTML جاهز لـ st.markdown(unsafe_allow_html=True)
+    """
+    spec = INFO_PARTS[part]
+    sections = []
+    for section in spec.sections:
+        columns = [[_field_context(record, field) for field in column] for column in section.columns]
+        note = None
+        if section.note_field:
+            note = getattr(record, section.note_field)
+            if note is None:
+                note = tm.t('messages.no_data')
+        sections.append({
+            'title': f"{section.icon} {tm.t(section.title)}" if section.title else None,
+            'columns': columns,
+            'column_titles': [f"{icon} {tm.t(title)}" for icon, title in section.column_titles],
+            'note': note,
+        })
+
+    direction = "direction: rtl; text-align: right;" if tm.is_rtl() else "direction: ltr; text-align: left;"
+    return INFO_TEMPLATE.render(
+        direction=direction,
+        heading=f"{spec.icon} {tm.t(spec.title)}" if spec.title else None,
+        sections=sections,
+    )
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def get_info_part_html(part: str, record: BeneficiaryRecord, language: str) -> str:
+    """
+    render_info_part مخزنة لكل (الجزء، المستفيد، اللغة)
+
+    السجل ثابت وقابل للتجزئة فهو نفسه مفتاح التخزين: تغير أي قيمة في
+    البيانات ينتج مفتاحاً جديداً.
+
+    Args:
+        part: مفتاح في INFO_PARTS
+        record: سجل المستفيد
+        language: اللغة الحالية
+
+    Returns:
+        نص HTML
+    """
+    return render_info_part(part, record)
+
+
+def display_info_part(part: str, record: BeneficiaryRecord):
+    """
+    عرض جزء من تبويب معلومات المستفيد برسالة st.markdown واحدة
+
+    Args:
+        part: مفتاح في INFO_PARTS
+        record: سجل المستفيد
+    """
+    st.markdown(get_info_part_html(part, record, tm.get_current_language()), unsafe_allow_html=True)
@@ -1,9 +1,25 @@
 """
 نافذة منبثقة شاملة لعرض تفاصيل المستفيد
 """
+import threading
+from html import escape
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import streamlit as st
 import pandas as pd
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config import NEARBY_RADIUS_M, MODAL_PREFETCH_WORKERS, MODAL_PREFETCH_RADIUS
 from utils.i18n import tm
+from utils.data_loader import get_assessed_mask
+from utils.geo_index import nearby_houses, nearest_house
+from utils.thumbnails import get_variant_urls, image_src, pick_variant, variant_src
+from utils.carousel import get_carousel_payload, render_carousel
+from utils.beneficiary_html import INFO_PARTS, display_info_part, get_info_part_html
+from utils.records import BeneficiaryRecord, get_beneficiary_records, get_record
+
+# عرض صورتي الوثيقة الشخصية في تبويب المعلومات الشخصية
+ID_PHOTO_WIDTH = 200
 
 
 def get_direction_style():
@@ -22,13 +38,21 @@ def display_field(label: str, value: any, icon: str = "•"):
         st.markdown(f"<div style='{direction}'><strong>{icon} {label}:</strong> {tm.t('messages.no_data')}</div>", unsafe_allow_html=True)
 
 
+@st.fragment
 def display_image_with_rotate(url: str, label: str, key: str, width: int = 300):
-    """عرض صورة مع زر تدوير يظهر عند hover فقط"""
+    """
+    عرض صورة مع زر تدوير يظهر عند hover فقط
+
+    الدالة fragment: زر التدوير يعيد رسم هذه الصورة وحدها دون باقي النافذة والصفحة.
+    """
     if pd.notna(url) and url:
         # تحديد حالة التدوير
         rotation_key = f"rotation_{key}"
         if rotation_key not in st.session_state:
             st.session_state[rotation_key] = 0
+
+        def rotate():
+            st.session_state[rotation_key] = (st.session_state[rotation_key] + 90) % 360
         
         rotation = st.session_state[rotation_key]
         
@@ -44,12 +68,12 @@ def display_image_with_rotate(url: str, label: str, key: str, width: int = 300):
                     margin: 0 auto;
                 }}
             </style>
-            <img src="{url}" alt="{label}" class="img-{key}">
+            <img src="{variant_src(url, width)}" alt="{label}" class="img-{key}">
         """, unsafe_allow_html=True)
         
         # زر التدوير
-        if st.button(f"🔄 {tm.t('buttons.rotate')}", key=f"btn_{key}", help=tm.t('buttons.rotate') + " 90°"):
-            st.session_state[rotation_key] = (st.session_state[rotation_key] + 90) % 360
+        # التدوير في callback كي يظهر مع إعادة الرسم نفسها
+        st.button(f"🔄 {tm.t('buttons.rotate')}", key=f"btn_{key}", help=tm.t('buttons.rotate') + " 90°", on_click=rotate)
     else:
         st.info(f"📷 {label}: {tm.t('messages.no_data')}")
 
@@ -59,62 +83,26 @@ def display_image_field(label: str, url: str, icon: str = "📄"):
     if pd.notna(url) and url:
         st.markdown(f"**{icon} {label}**")
         try:
-            st.image(url, use_container_width=True)
-        except:
+            st.image(image_src(url, 1200), use_container_width=True)
+        except Exception:
             st.info(f"🔗 {url}")
     else:
         st.info(f"{icon} {label}: {tm.t('messages.no_data')}")
 
 
-def create_personal_info_tab(row):
+def create_personal_info_tab(record):
     """تبويب المعلومات الشخصية - تخطيط محسّن بأربعة أعمدة"""
     direction = get_direction_style()
     
-    st.markdown(f"<h3 style='{direction}'>👤 {tm.t('modal.personal_info')}</h3>", unsafe_allow_html=True)
-    
-    # 1. تجميع الأقسام الأربعة في سطر واحد بأربعة أعمدة
-    col1, col2, col3, col4 = st.columns(4)
-    
-    # العمود الأول: المعلومات الأساسية
-    with col1:
-        st.markdown(f"<h4 style='{direction}'>📝 {tm.t('modal.basic_info')}</h4>", unsafe_allow_html=True)
-        display_field(tm.t('fields.first_name'), row.get('الاسم الأول'), "📝")
-        display_field(tm.t('fields.father_name'), row.get('اسم الأب'), "👨")
-        display_field(tm.t('fields.last_name'), row.get('الكنية'), "📛")
-        display_field(tm.t('fields.mother_name'), row.get('اسم الأم كما هو مذكور في الهوية'), "👩")
-        
-    # العمود الثاني: معلومات إضافية
-    with col2:
-        st.markdown(f"<h4 style='{direction}'>ℹ️ {tm.t('modal.additional_info')}</h4>", unsafe_allow_html=True)
-        display_field(tm.t('fields.gender'), row.get('الجنس'), "⚧")
-        display_field(tm.t('fields.birth_date'), row.get('تاريخ الميلاد كما هو مذكور في الهوية'), "📅")
-        display_field(tm.t('fields.marital_status'), row.get('الحالة الاجتماعية'), "💍")
-        display_field(tm.t('fields.spouse_name'), row.get('الاسم الثلاثي للزوج أو الزوجة (إن وجد)'), "👫")
-    
-    # العمود الثالث: معلومات الوثيقة
-    with col3:
-        st.markdown(f"<h4 style='{direction}'>🆔 {tm.t('modal.document_info')}</h4>", unsafe_allow_html=True)
-        display_field(tm.t('fields.id_type'), row.get('نوع الوثيقة الشخصية'), "📋")
-        display_field(tm.t('fields.id_number'), row.get('رقم الوثيقة الشخصية (الرقم الوطني)'), "🔢")
-        # إضافة حقلين فارغين للحفاظ على التوازن المرئي مع الأعمدة الأخرى
-        # display_field("", "", "")
-        # display_field("", "", "")
-    
-    # العمود الرابع: معلومات الاتصال
-    with col4:
-        st.markdown(f"<h4 style='{direction}'>📞 {tm.t('modal.contact_info')}</h4>", unsafe_allow_html=True)
-        display_field(tm.t('fields.phone'), row.get('رقم الهاتف الرئيسي (واتساب إن أمكن)'), "📱")
-        display_field(tm.t('fields.phone_alt'), row.get('رقم هاتف بديل (إضافي)'), "📞")
-        # إضافة حقلين فارغين للحفاظ على التوازن المرئي مع الأعمدة الأخرى
-        # display_field("", "", "")
-        # display_field("", "", "")
+    # 1. الأقسام الأربعة في سطر واحد بأربعة أعمدة (كتلة HTML واحدة)
+    display_info_part('personal', record)
     
     # 2. صور الوثيقة (الوجه الأمامي والخلفي) - دمج 4 أعمدة
     st.markdown("---")
     st.markdown(f"<h3 style='{direction}'>📸 {tm.t('modal.id_photos')}</h3>", unsafe_allow_html=True)
     
-    front_url = row.get('صورة الوثيقة الشخصية (الوجه الأول)_URL')
-    back_url = row.get('صورة الوثيقة الشخصية (الوجه الثاني)_URL')
+    front_url = record.id_photo_front
+    back_url = record.id_photo_back
     
     # استخدام st.columns(2) لعرض الصورتين بجانب بعضهما، مع تقليل حجم الصورة (width=200)
     img_col1, img_col2 = st.columns(2)
@@ -122,472 +110,211 @@ def create_personal_info_tab(row):
     with img_col1:
         st.markdown(f"**🪪 {tm.t('fields.id_photo_front')}**")
         # تم تقليل العرض من 300 إلى 200 لتقليل الحجم
-        display_image_with_rotate(front_url, tm.t('fields.id_photo_front'), "id_front", width=200)
+        display_image_with_rotate(front_url, tm.t('fields.id_photo_front'), f"id_front_{record.index}", width=ID_PHOTO_WIDTH)
     
     with img_col2:
         st.markdown(f"**🪪 {tm.t('fields.id_photo_back')}**")
         # تم تقليل العرض من 300 إلى 200 لتقليل الحجم
-        display_image_with_rotate(back_url, tm.t('fields.id_photo_back'), "id_back", width=200)
+        display_image_with_rotate(back_url, tm.t('fields.id_photo_back'), f"id_back_{record.index}", width=ID_PHOTO_WIDTH)
         
-    # 3. القسم الرابع: معلومات صحية (افتراضاً أنه يمثل "الصورة الخلفية" المطلوبة)
-    st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>🏥 {tm.t('modal.health_info')}</h4>", unsafe_allow_html=True)
-    col_health1, col_health2 = st.columns(2)
-    with col_health1:
-        display_field(tm.t('fields.disability'), row.get('هل مالك المنزل من الأشخاص ذوي الإعاقة؟'), "♿")
-    with col_health2:
-        display_field(tm.t('fields.chronic_diseases'), row.get('هل تعاني من أمراض مزمنة؟'), "💊")
-
-def create_family_info_tab(row):
+    # 3. القسم الرابع: معلومات صحية
+    display_info_part('health', record)
+
+
+def create_family_info_tab(record):
     """تبويب معلومات الأسرة - تخطيط محسّن بـ 3 أعمدة متوازنة لجميع الأقسام"""
-    direction = get_direction_style()
-    
-    st.markdown(f"<h3 style='{direction}'>👨‍👩‍👧‍👦 {tm.t('modal.family_info')}</h3>", unsafe_allow_html=True)
-    
-    # 1. معلومات عامة (3 حقول / 3 أعمدة = 1 حقل لكل عمود)
-    # st.markdown(f"<h4 style='{direction}'>🏠 {tm.t('modal.general_info')}</h4>", unsafe_allow_html=True)
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        display_field(tm.t('fields.families_in_house'), row.get('عدد العائلات المقيمة في نفس المنزل'), "🏠")
-    with col2:
-        display_field(tm.t('fields.family_size'), row.get('عدد أفراد الأسرة (بما فيهم مالك المنزل)'), "👥")
-    with col3:
-        display_field(tm.t('fields.family_type'), row.get('نوع معيل الأسرة'), "💼")
-    
-    st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>📊 {tm.t('modal.family_distribution')}</h4>", unsafe_allow_html=True)
-    
-    # 2. توزيع الأسرة (6 حقول / 3 أعمدة = 2 حقل لكل عمود)
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        display_field(tm.t('fields.men') + " (+18)", row.get('عدد الرجال (العمر أكبر من 18 سنة)'), "👨")
-        display_field(tm.t('fields.women') + " (+18)", row.get('عدد النساء (العمر أكبر من 18 سنة)'), "👩")
-    
-    with col2:
-        display_field(tm.t('fields.boys'), row.get('عدد الشباب الذكور (من 12 إلى 17 سنة)'), "👦")
-        display_field(tm.t('fields.girls'), row.get('عدد الفتيات الإناث (من 12 إلى 17 سنة)'), "👧")
-    
-    with col3:
-        display_field(tm.t('fields.child_boys'), row.get('عدد الأطفال الذكور (دون سن 12 سنة)'), "👶")
-        display_field(tm.t('fields.child_girls'), row.get('عدد الأطفال الإناث (دون سن 12 سنة)'), "👶")
-    
-    st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>🎯 {tm.t('modal.special_categories')}</h4>", unsafe_allow_html=True)
-    
-    # 3. الفئات الخاصة (7 حقول / 3 أعمدة = 3، 2، 2)
-    col1, col2, col3 = st.columns(3)
-    
-    # العمود الأول: 3 حقول
-    with col1:
-        display_field(tm.t('fields.elderly_count'), row.get('عدد أفراد الأسرة من كبار السن (60 سنة فأكثر)'), "👴")
-        display_field(tm.t('fields.disabled_count'), row.get('عدد أفراد الأسرة من ذوي الإعاقة'), "♿")
-        display_field(tm.t('fields.separated_children'), row.get('عدد الأطفال المنفصلين عن ذويهم'), "👶")
-    
-    # العمود الثاني: 2 حقل
-    with col2:
-        display_field(tm.t('fields.nursing_mothers'), row.get('عدد النساء المرضعات'), "🤱")
-        display_field(tm.t('fields.pregnant_women'), row.get('عدد النساء الحوامل'), "🤰")
-        # حقل فارغ للحفاظ على التوازن المرئي
-        # display_field("", "", "")
-    
-    # العمود الثالث: 2 حقل
-    with col3:
-        display_field(tm.t('fields.divorced_women'), row.get('عدد النساء المطلقات'), "💔")
-        display_field(tm.t('fields.widowed_women'), row.get('عدد النساء الأرامل'), "🖤")
-        # حقل فارغ للحفاظ على التوازن المرئي
-        # display_field("", "", "")
-    
-    st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>💰 {tm.t('modal.economic_info')}</h4>", unsafe_allow_html=True)
-    
-    # 4. المعلومات الاقتصادية (2 حقل / 3 أعمدة = 1، 1، 0)
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        display_field(tm.t('fields.income_source'), row.get('ما هو مصدر الدخل الرئيسي للأسرة؟'), "💵")
-    with col2:
-        display_field(tm.t('fields.working_members'), row.get('عدد الأفراد العاملين في الأسرة'), "👷")
-    # with col3:
-        # حقل فارغ للحفاظ على التوازن المرئي
-        # display_field("", "", "")
+    display_info_part('family', record)
 
 
-def create_address_tab(row):
+def create_address_tab(record, houses_df=None, geo_index=None):
     """تبويب معلومات العنوان"""
-    direction = get_direction_style()
-    
-    st.markdown(f"<h3 style='{direction}'>📍 {tm.t('modal.address_info')}</h3>", unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        display_field(tm.t('fields.governorate'), row.get('المحافظة'), "🏛️")
-        display_field(tm.t('fields.district'), row.get('المنطقة'), "🏘️")
-        display_field(tm.t('fields.subdistrict'), row.get('الناحية'), "📍")
-        display_field(tm.t('fields.village'), row.get('القرية'), "🏡")
-    
-    with col2:
-        display_field(tm.t('fields.detailed_address'), row.get('العنوان التفصيلي لمكان السكن الحالي'), "🗺️")
-        display_field(tm.t('fields.full_address'), row.get('عنوان المنزل الكامل'), "📮")
-        display_field(tm.t('fields.residence_status'), row.get('ما هي حالة إقامتك في المنطقة؟'), "🏠")
+    display_info_part('address', record)
     
-    # إحداثيات GPS
-    st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>🌍 {tm.t('modal.gps_coordinates')}</h4>", unsafe_allow_html=True)
-    col1, col2 = st.columns(2)
-    with col1:
-        display_field(tm.t('fields.latitude'), row.get('_إحداثيات الموقع الجغرافي للمنزل (GPS)_latitude'), "🧭")
-    with col2:
-        display_field(tm.t('fields.longitude'), row.get('_إحداثيات الموقع الجغرافي للمنزل (GPS)_longitude'), "🧭")
-    
-    # حالة الإقامة
-    st.markdown("---")
-    display_field(tm.t('fields.residence_status'), row.get('حالة الاقامة في المنزل'), "🏚️")
+    # المنازل القريبة
+    if houses_df is not None and geo_index is not None and record.label in houses_df.index:
+        create_nearby_section(record, houses_df, geo_index)
 
 
-def create_house_info_tab(row):
-    """تبويب معلومات المنزل - تخطيط محسّن بـ 3 أعمدة متوازنة لجميع الأقسام"""
+def create_nearby_section(record, houses_df, geo_index):
+    """قسم المنازل القريبة من المستفيد وأقرب منزل غير مدروس"""
     direction = get_direction_style()
     
-    st.markdown(f"<h3 style='{direction}'>🏠 {tm.t('modal.house_info')}</h3>", unsafe_allow_html=True)
-    
-    # 1. معلومات أساسية (5 حقول / 3 أعمدة = 2، 2، 1 + حقل فارغ)
-    st.markdown(f"<h4 style='{direction}'>📝 {tm.t('modal.basic_info')}</h4>", unsafe_allow_html=True)
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        display_field(tm.t('fields.house_type'), row.get('نوع المنزل'), "🏘️")
-        display_field(tm.t('fields.rooms'), row.get('عدد الغرف (بما فيها الصالون)'), "🛏️")
-    
-    with col2:
-        display_field(tm.t('fields.floor'), row.get('رقم الطابق الذي يقع فيه المنزل'), "🏢")
-        area = row.get('مساحة المنزل بالمتر المربع')
-        if pd.notna(area):
-            display_field(tm.t('fields.area'), f"{area} m²", "📐")
-        else:
-            display_field(tm.t('fields.area'), None, "📐")
-    
-    with col3:
-        display_field(tm.t('fields.damage_status'), row.get('حالة الضرر'), "⚠️")
-        # حقل فارغ للحفاظ على التوازن المرئي
-        # display_field("", "", "")
-    
-    # 2. وثائق الملكية (3 حقول / 3 أعمدة = 1، 1، 1)
     st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>📄 {tm.t('modal.ownership_documents')}</h4>", unsafe_allow_html=True)
-    col1, col2, col3 = st.columns(3)
+    st.markdown(f"<h4 style='{direction}'>📏 {tm.t('map.nearby.title')} ({NEARBY_RADIUS_M} m)</h4>", unsafe_allow_html=True)
     
-    with col1:
-        display_field(tm.t('fields.ownership_document'), row.get('هل لديك وثيقة اثبات ملكية حديث؟'), "📋")
-    with col2:
-        display_field(tm.t('fields.ownership_type'), row.get('نوع وثيقة الملكية'), "📑")
-    with col3:
-        display_field(tm.t('fields.ownership_date'), row.get('تاريخ إصدار وثيقة الملكية'), "📅")
+    position = houses_df.index.get_loc(record.label)
+    neighbours = nearby_houses(houses_df, geo_index, position, NEARBY_RADIUS_M)
+    
+    if len(neighbours) > 0:
+        nearby_cols = ['الاسم الكامل', 'القرية', 'حالة الضرر', 'distance_m']
+        st.dataframe(
+            neighbours[[c for c in nearby_cols if c in neighbours.columns]].rename(
+                columns={'distance_m': tm.t('map.nearby.distance')}
+            ),
+            use_container_width=True,
+            hide_index=True,
+            height=200
+        )
+    else:
+        st.info(tm.t('map.nearby.none_found'))
+    
+    nearest = nearest_house(houses_df, geo_index, position, mask=~get_assessed_mask(houses_df))
+    if nearest is not None:
+        nearest_row, nearest_dist = nearest
+        display_field(
+            tm.t('map.nearby.nearest_unassessed'),
+            f"{nearest_row.get('الاسم الكامل', '')} - {nearest_row.get('القرية', '')} ({nearest_dist:,.0f} m)",
+            "🎯"
+        )
+
+
+def create_house_info_tab(record):
+    """تبويب معلومات المنزل - تخطيط محسّن بـ 3 أعمدة متوازنة لجميع الأقسام"""
+    # 1-2. معلومات أساسية ووثائق الملكية
+    display_info_part('house', record)
     
     # 3. صورة وثيقة الملكية (عرض كامل)
-    ownership_url = row.get('صورة وثيقة الملكية_URL')
-    if pd.notna(ownership_url) and ownership_url:
+    ownership_url = record.ownership_photo
+    if ownership_url:
         st.markdown(f"**📸 {tm.t('modal.ownership_document')}**")
         try:
-            st.image(ownership_url, use_container_width=True)
-        except:
+            st.image(image_src(ownership_url, 1200), use_container_width=True)
+        except Exception:
             st.info(f"🔗 {ownership_url}")
     
-    # 4. حالة المنزل (6 حقول / 3 أعمدة = 2، 2، 2)
-    st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>🔍 {tm.t('modal.house_condition')}</h4>", unsafe_allow_html=True)
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        display_field(tm.t('fields.external_walls'), row.get('هل يملك المنزل أو الشقة جدرانًا خارجية سليمة ولا يحتاج إلى أعمال بناء (بلوك) خارجية؟'), "🧱")
-        display_field(tm.t('fields.internal_walls'), row.get('هل يملك المنزل أو الشقة جدرانًا داخلية مكتملة ولا يحتاج إلى أعمال بناء (بلوك) داخلية؟'), "🏗️")
-    
-    with col2:
-        display_field(tm.t('fields.roof'), row.get('هل يملك المنزل أو الشقة سقفًا وسلالم (أدراج) سليمة؟'), "🏚️")
-        display_field(tm.t('fields.building_damage'), row.get('هل توجد أية أضرار إنشائية في المنزل أو الشقة؟'), "⚠️")
-    
-    with col3:
-        display_field(tm.t('fields.facilities'), row.get('هل المرافق (المياه والصرف) عاملة أم مجرد بناء؟'), "🚰")
-        display_field(tm.t('fields.sewerage'), row.get('هل المنزل موصول بنظام صرف صحي أو حفرة فنية؟'), "🚽")
-    
-    # 5. وصف الضرر (عرض كامل)
-    st.markdown("---")
-    st.markdown(f"<h4 style='{direction}'>📝 {tm.t('modal.damage_description')}</h4>", unsafe_allow_html=True)
-    damage_desc = row.get('وصف حالة الضرر من وجهة نظرك كمالك للمنزل')
-    if pd.notna(damage_desc) and str(damage_desc).strip():
-        st.info(damage_desc)
-    else:
-        st.info(tm.t('messages.no_data'))
+    # 4-5. حالة المنزل ووصف الضرر
+    display_info_part('house_condition', record)
 
 
-def create_photos_tab(row):
-    """تبويب صور المنزل - تصميم محسن مع خيارات عرض متعددة"""
-    direction = get_direction_style()
-    
-    # 1. تجميع كل الصور المتاحة
-    images = []
-    
+def get_record_images(record) -> List[Dict]:
+    """
+    صور المنزل المتوفرة للمستفيد بترتيب المعرض
+
+    Args:
+        record: سجل المستفيد
+
+    Returns:
+        قائمة قواميس بالمفاتيح label و url و icon و key
+    """
     fields_config = [
-        (tm.t('fields.front_view'), 'صورة الواجهة الأمامية للمنزل_URL', "🏠"),
-        (tm.t('fields.inside_view'), 'صورة من داخل المنزل_URL', "🪟"),
-        (tm.t('fields.walls'), 'صورة توضح حالة الجدران_URL', "🧱"),
-        (tm.t('fields.columns'), 'صورة توضح حالة الأعمدة_URL', "🏛️"),
-        (tm.t('fields.roof'), 'صورة توضح حالة السقف_URL', "🏠"),
-        (tm.t('fields.kitchen'), 'صورة توضح حالة المرافق (المطبخ)_URL', "🍳"),
-        (tm.t('fields.bathroom'), 'صورة توضح حالة المرافق (الحمام)_URL', "🚿"),
-        (tm.t('fields.toilet'), 'صورة توضح حالة المرافق (التواليت)_URL', "🚽")
+        (tm.t('fields.front_view'), 'front_image', "🏠"),
+        (tm.t('fields.inside_view'), 'inside_image', "🪟"),
+        (tm.t('fields.walls'), 'walls_image', "🧱"),
+        (tm.t('fields.columns'), 'columns_image', "🏛️"),
+        (tm.t('fields.roof'), 'roof_image', "🏠"),
+        (tm.t('fields.kitchen'), 'kitchen_image', "🍳"),
+        (tm.t('fields.bathroom'), 'bathroom_image', "🚿"),
+        (tm.t('fields.toilet'), 'toilet_image', "🚽")
     ]
 
+    images = []
     for label, key, icon in fields_config:
-        url = row.get(key)
-        if pd.notna(url) and url:
+        url = getattr(record, key)
+        if url:
             images.append({'label': label, 'url': url, 'icon': icon, 'key': key})
+    return images
+
+
+def create_photos_tab(record):
+    """تبويب صور المنزل - معرض (سلايدر/شبكي) يعمل في المتصفح"""
+    # 1. تجميع كل الصور المتاحة
+    images = get_record_images(record)
 
     if not images:
         st.warning(tm.t('messages.no_data'))
         return
 
-    # 2. CSS المحسن
-    st.markdown("""
-        <style>
-        /* حاوية الصورة في السلايدر - متوسطة */
-        .slider-image-container {
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            background: #1a1a2e;
-            border-radius: 12px;
-            padding: 15px;
-            min-height: 350px;
-            max-height: 550px;
-            overflow: hidden;
-        }
-        
-        .slider-image-container img {
-            max-height: 550px !important;
-            width: auto !important;
-            max-width: 100% !important;
-            object-fit: contain !important;
-            border-radius: 8px;
-        }
-        
-        /* حاوية الصورة في الشبكي - كامل العرض */
-        .grid-image-container {
-            background: #2d2d44;
-            border-radius: 12px;
-            padding: 10px;
-            margin-bottom: 5px;
-        }
-        
-        .grid-image-container img {
-            width: 100% !important;
-            height: auto !important;
-            border-radius: 8px;
-            display: block;
-        }
-        
-        /* عنوان الصورة في الشبكي */
-        .grid-image-title {
-            text-align: center;
-            font-weight: bold;
-            margin-bottom: 8px;
-            font-size: 14px;
-        }
-        
-        /* شريط التحكم */
-        .photo-control-bar {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 8px 15px;
-            border-radius: 10px;
-            text-align: center;
-            margin-bottom: 10px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    # 2. المعرض يعمل في المتصفح: التنقل والتكبير والتدوير دون إعادة تشغيل
+    with st.spinner(tm.t('messages.loading')):
+        render_carousel(images)
 
-    # 3. تهيئة حالة العرض
-    if 'photo_view_mode' not in st.session_state:
-        st.session_state.photo_view_mode = 'slider'
-    
-    if 'photo_idx' not in st.session_state:
-        st.session_state.photo_idx = 0
-    
-    if 'expanded_image' not in st.session_state:
-        st.session_state.expanded_image = None
-    
-    total = len(images)
-    if st.session_state.photo_idx >= total:
-        st.session_state.photo_idx = 0
 
-    # 4. دوال التنقل
-    def go_prev():
-        st.session_state.photo_idx = (st.session_state.photo_idx - 1) % total
-    
-    def go_next():
-        st.session_state.photo_idx = (st.session_state.photo_idx + 1) % total
-    
-    def toggle_view():
-        st.session_state.photo_view_mode = 'grid' if st.session_state.photo_view_mode == 'slider' else 'slider'
-    
-    def expand_image(url, label):
-        st.session_state.expanded_image = {'url': url, 'label': label}
-    
-    def close_expanded():
-        st.session_state.expanded_image = None
+def build_costs_payload(sub_items_df: pd.DataFrame, beneficiary_index) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, float, str, str]]:
+    """
+    بيانات تبويب التكاليف لمستفيد: بنوده، وجدول العرض المترجم، والإجمالي
 
-    # 5. عرض الصورة المكبرة
-    if st.session_state.expanded_image:
-        st.markdown(f"""
-            <div style='background: #1a1a2e; padding: 15px; border-radius: 12px; text-align: center;'>
-                <p style='color: white; font-size: 16px; margin-bottom: 10px;'>
-                    🔍 {st.session_state.expanded_image['label']}
-                </p>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        try:
-            st.image(st.session_state.expanded_image['url'], use_container_width=True)
-        except:
-            st.error("❌ خطأ في تحميل الصورة")
-        
-        st.button("✖️ إغلاق العرض المكبر", on_click=close_expanded, use_container_width=True, type="primary")
-        return
+    Args:
+        sub_items_df: DataFrame البنود الفرعية
+        beneficiary_index: قيمة _index للمستفيد
 
-    # 6. شريط التحكم العلوي
-    if st.session_state.photo_view_mode == 'slider':
-        # === وضع السلايدر ===
-        current = images[st.session_state.photo_idx]
-        
-        col_mode, col_prev, col_info, col_next, col_expand = st.columns([1.2, 0.7, 3.5, 0.7, 1])
-        
-        with col_mode:
-            st.button("🔲 شبكي", on_click=toggle_view, use_container_width=True, key="to_grid")
-        
-        with col_prev:
-            st.button("◀", on_click=go_prev, use_container_width=True, key="prev_btn")
-        
-        with col_info:
-            st.markdown(f"""
-                <div class='photo-control-bar'>
-                    <span style='font-weight: bold;'>{current['icon']} {current['label']}</span>
-                    <span style='opacity: 0.8; font-size: 12px;'> ({st.session_state.photo_idx + 1}/{total})</span>
-                </div>
-            """, unsafe_allow_html=True)
-        
-        with col_next:
-            st.button("▶", on_click=go_next, use_container_width=True, key="next_btn")
-        
-        with col_expand:
-            if st.button("🔍", use_container_width=True, key="expand_btn", help="تكبير الصورة"):
-                expand_image(current['url'], f"{current['icon']} {current['label']}")
-        
-        # عرض الصورة في المنتصف (حجم محدود)
-        st.markdown(f"""
-            <div class='slider-image-container'>
-                <img src='{current['url']}' alt='{current['label']}' 
-                     onerror="this.onerror=null; this.src='https://via.placeholder.com/400x300?text=Error';">
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # شريط التقدم
-        st.progress((st.session_state.photo_idx + 1) / total)
-        
-        # أزرار التنقل السريع
-        if total > 1:
-            st.markdown("##### التنقل السريع:")
-            thumb_cols = st.columns(min(total, 8))
-            
-            for i, img in enumerate(images[:8]):
-                with thumb_cols[i]:
-                    def select_image(idx=i):
-                        st.session_state.photo_idx = idx
-                    
-                    st.button(
-                        img['icon'],
-                        key=f"thumb_{i}",
-                        help=img['label'],
-                        on_click=select_image,
-                        use_container_width=True,
-                        type="primary" if i == st.session_state.photo_idx else "secondary"
-                    )
-    
-    else:
-        # === وضع العرض الشبكي - الصور بكامل الحجم ===
-        col_mode, col_info = st.columns([1.2, 5])
-        
-        with col_mode:
-            st.button("▶️ سلايدر", on_click=toggle_view, use_container_width=True, key="to_slider")
-        
-        with col_info:
-            st.markdown(f"""
-                <div class='photo-control-bar'>
-                    <span style='font-weight: bold;'>📷 جميع الصور ({total})</span>
-                </div>
-            """, unsafe_allow_html=True)
-        
-        # عرض الصور في شبكة (2 بجانب بعض) - بكامل العرض
-        for i in range(0, len(images), 2):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                img1 = images[i]
-                st.markdown(f"<div class='grid-image-title'>{img1['icon']} {img1['label']}</div>", unsafe_allow_html=True)
-                
-                # الصورة بكامل العرض باستخدام st.image
-                try:
-                    st.image(img1['url'], use_container_width=True)
-                except:
-                    st.error("❌ خطأ في التحميل")
-                
-                if st.button(f"🔍 تكبير", key=f"exp_grid_{i}", use_container_width=True):
-                    expand_image(img1['url'], f"{img1['icon']} {img1['label']}")
-            
-            with col2:
-                if i + 1 < len(images):
-                    img2 = images[i + 1]
-                    st.markdown(f"<div class='grid-image-title'>{img2['icon']} {img2['label']}</div>", unsafe_allow_html=True)
-                    
-                    try:
-                        st.image(img2['url'], use_container_width=True)
-                    except:
-                        st.error("❌ خطأ في التحميل")
-                    
-                    if st.button(f"🔍 تكبير", key=f"exp_grid_{i+1}", use_container_width=True):
-                        expand_image(img2['url'], f"{img2['icon']} {img2['label']}")
-            
-            st.markdown("---")
+    Returns:
+        (البنود، جدول العرض، الإجمالي، عمود البند الرئيسي، عمود البند الفرعي)
+        أو None إن لم توجد بنود
+    """
+    if sub_items_df is None or sub_items_df.empty or '_parent_index' not in sub_items_df.columns:
+        return None
+
+    # فلترة البنود الخاصة بهذا المستفيد
+    house_items = sub_items_df[sub_items_df['_parent_index'] == beneficiary_index].reset_index(drop=True)
+    if house_items.empty:
+        return None
+
+    # حساب الإجمالي
+    total_cost = 0
+    if 'الإجمالي' in house_items.columns:
+        total_cost = house_items['الإجمالي'].sum()
+    elif 'Total' in house_items.columns:
+        total_cost = house_items['Total'].sum()
+
+    # تحديد أسماء الحقول حسب اللغة
+    is_english = tm.get_current_language() == 'en'
+    main_item_col = 'البند الرئيسي EN' if is_english else 'البند الرئيسي'
+    sub_item_col = 'البند الفرعي EN' if is_english else 'البند الفرعي'
+
+    # التحقق من وجود الأعمدة الإنجليزية، وإلا استخدام العربية
+    if main_item_col not in house_items.columns:
+        main_item_col = 'البند الرئيسي'
+    if sub_item_col not in house_items.columns:
+        sub_item_col = 'البند الفرعي'
 
+    # إنشاء DataFrame جديد بالأعمدة المطلوبة فقط (لتجنب التكرار)
+    display_data = []
+    for _, item in house_items.iterrows():
+        display_data.append({
+            tm.t('modal.main_item'): item.get(main_item_col, ''),
+            tm.t('modal.sub_item'): item.get(sub_item_col, ''),
+            tm.t('modal.quantity'): item.get('الكمية', 0),
+            tm.t('modal.unit_price'): f"${item.get('السعر الافرادي', 0):,.2f}" if pd.notna(item.get('السعر الافرادي')) else "-",
+            tm.t('modal.total'): f"${item.get('الإجمالي', 0):,.2f}" if pd.notna(item.get('الإجمالي')) else "-"
+        })
 
-def create_costs_tab(row, sub_items_df):
+    return house_items, pd.DataFrame(display_data), float(total_cost), main_item_col, sub_item_col
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_costs_payload(data_version: str, beneficiary_index, language: str, _sub_items_df: pd.DataFrame):
+    """
+    build_costs_payload محسوبة مرة واحدة لكل (إصدار البيانات، المستفيد، اللغة)
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        beneficiary_index: قيمة _index للمستفيد
+        language: اللغة الحالية (أسماء الأعمدة والبنود مترجمة)
+        _sub_items_df: DataFrame البنود الفرعية (لا يدخل في مفتاح التخزين)
+
+    Returns:
+        ناتج build_costs_payload
+    """
+    return build_costs_payload(_sub_items_df, beneficiary_index)
+
+
+def create_costs_tab(record, sub_items_df, data_version: Optional[str] = None):
     """تبويب التكاليف مع جدول تفاعلي وصور ديناميكية"""
     direction = get_direction_style()
     
     st.markdown(f"<h3 style='{direction}'>💰 {tm.t('modal.costs_and_items')}</h3>", unsafe_allow_html=True)
     
-    if sub_items_df is None or sub_items_df.empty:
-        st.warning(tm.t('messages.no_data'))
-        return
-    
     # الحصول على index المستفيد
-    beneficiary_index = row.get('_index')
-    
-    # فلترة البنود الخاصة بهذا المستفيد
-    if '_parent_index' in sub_items_df.columns:
-        house_items = sub_items_df[sub_items_df['_parent_index'] == beneficiary_index].copy()
+    beneficiary_index = record.index
+    if data_version is not None:
+        payload = get_costs_payload(data_version, beneficiary_index, tm.get_current_language(), sub_items_df)
     else:
-        st.warning(tm.t('messages.no_data'))
-        return
+        payload = build_costs_payload(sub_items_df, beneficiary_index)
     
-    if house_items.empty:
+    if payload is None:
         st.info(tm.t('messages.no_data'))
         return
-    
-    # حساب الإجمالي
-    total_cost = 0
-    if 'الإجمالي' in house_items.columns:
-        total_cost = house_items['الإجمالي'].sum()
-    elif 'Total' in house_items.columns:
-        total_cost = house_items['Total'].sum()
+    house_items, display_df, total_cost, main_item_col, sub_item_col = payload
     
     # 1. بطاقة التكلفة الإجمالية (حجم مدمج جداً)
     st.markdown(f"""
@@ -600,37 +327,32 @@ def create_costs_tab(row, sub_items_df):
         </div>
     """, unsafe_allow_html=True)
     
-    # 2. تحديد أسماء الحقول حسب اللغة
-    is_english = tm.get_current_language() == 'en'
-    main_item_col = 'البند الرئيسي EN' if is_english else 'البند الرئيسي'
-    sub_item_col = 'البند الفرعي EN' if is_english else 'البند الفرعي'
-    
-    # التحقق من وجود الأعمدة الإنجليزية، وإلا استخدام العربية
-    if main_item_col not in house_items.columns:
-        main_item_col = 'البند الرئيسي'
-    if sub_item_col not in house_items.columns:
-        sub_item_col = 'البند الفرعي'
-    
-    # 3. تقسيم العرض: جدول (يمين) وصورة (يسار)
+    # 2. الجدول وصورة البند في fragment: تحديد صف يعيد رسمهما فقط
+    display_costs_items(house_items, display_df, main_item_col, sub_item_col)
+
+
+@st.fragment
+def display_costs_items(house_items: pd.DataFrame, display_df: pd.DataFrame, main_item_col: str, sub_item_col: str):
+    """
+    جدول بنود المستفيد مع صورة البند المحدد
+
+    الدالة fragment: تحديد صف في الجدول يعيد رسم الجدول والصورة فقط، لا
+    الصفحة (تحميل البيانات والفلاتر وجدول النتائج) ولا باقي النافذة.
+
+    Args:
+        house_items: بنود المستفيد (build_costs_payload)
+        display_df: جدول العرض المترجم
+        main_item_col: عمود البند الرئيسي حسب اللغة
+        sub_item_col: عمود البند الفرعي حسب اللغة
+    """
+    direction = get_direction_style()
+
+    # تقسيم العرض: جدول (يمين) وصورة (يسار)
     col_table, col_image = st.columns([1.5, 1])
     
     with col_table:
         st.markdown(f"<h4 style='{direction}'>📊 {tm.t('modal.items_details')} ({len(house_items)} {tm.t('modal.items')})</h4>", unsafe_allow_html=True)
         
-        # إنشاء DataFrame جديد بالأعمدة المطلوبة فقط (لتجنب التكرار)
-        display_data = []
-        for idx, row in house_items.iterrows():
-            row_data = {
-                tm.t('modal.main_item'): row.get(main_item_col, ''),
-                tm.t('modal.sub_item'): row.get(sub_item_col, ''),
-                tm.t('modal.quantity'): row.get('الكمية', 0),
-                tm.t('modal.unit_price'): f"${row.get('السعر الافرادي', 0):,.2f}" if pd.notna(row.get('السعر الافرادي')) else "-",
-                tm.t('modal.total'): f"${row.get('الإجمالي', 0):,.2f}" if pd.notna(row.get('الإجمالي')) else "-"
-            }
-            display_data.append(row_data)
-        
-        display_df = pd.DataFrame(display_data)
-        
         # الأعمدة المطلوب عرضها
         display_cols = [
             tm.t('modal.main_item'), 
@@ -664,9 +386,8 @@ def create_costs_tab(row, sub_items_df):
             selected_idx = selected_rows.selection.rows[0]
         
         # عرض صورة البند المحدد فقط
-        house_items_reset = house_items.reset_index(drop=True)
-        if selected_idx < len(house_items_reset):
-            selected_item = house_items_reset.iloc[selected_idx]
+        if selected_idx < len(house_items):
+            selected_item = house_items.iloc[selected_idx]
             
             # عرض صورة البند
             item_photo_url = selected_item.get('صورة توضيحية للبند_URL', '')
@@ -678,15 +399,15 @@ def create_costs_tab(row, sub_items_df):
                 
                 st.markdown(f"**📸 {main_item} - {sub_item}**")
                 try:
-                    st.image(item_photo_url, use_container_width=True)
-                except:
+                    st.image(image_src(item_photo_url, 400), use_container_width=True)
+                except Exception:
                     st.info(f"🔗 {item_photo_url}")
             else:
                 st.info(f"📷 {tm.t('messages.no_data')}")
                 st.markdown(f"*{tm.t('modal.item_photo')}*")
 
 
-def create_assessment_tab(row):
+def create_assessment_tab(record):
     """تبويب التقييم"""
     direction = get_direction_style()
     
@@ -694,7 +415,7 @@ def create_assessment_tab(row):
     
     # الوصول الآمن
     st.markdown(f"#### 🚧 {tm.t('modal.safe_access')}")
-    safe_access = row.get('هل يتوفر وصول آمن إلى المنزل؟')
+    safe_access = record.safe_access
     if safe_access == "نعم":
         st.success(f"✅ {tm.t('modal.safe_access')}: {tm.t('modal.yes')}")
     else:
@@ -702,15 +423,15 @@ def create_assessment_tab(row):
         
         # أسباب عدم الوصول الآمن
         reasons = []
-        if row.get('في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/مخلفات حرب (ألغام، ذخائر غير منفجرة)'):
+        if record.unsafe_war_remnants:
             reasons.append(f"🎯 {tm.t('assessment.war_remnants')}")
-        if row.get('في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/نزاع ملكية أو خلاف قانوني'):
+        if record.unsafe_ownership_dispute:
             reasons.append(f"⚖️ {tm.t('assessment.ownership_dispute')}")
-        if row.get('في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/طريق مسدود بالأنقاض أو الركام'):
+        if record.unsafe_blocked_road:
             reasons.append(f"🚧 {tm.t('assessment.blocked_road')}")
-        if row.get('في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/انهيار مبانٍ مجاورة تعيق الوصول'):
+        if record.unsafe_collapsed_buildings:
             reasons.append(f"🏚️ {tm.t('assessment.collapsed_buildings')}")
-        if row.get('في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/مبانٍ غير مستقرة أو مهددة بالانهيار في الطريق'):
+        if record.unsafe_unstable_buildings:
             reasons.append(f"⚠️ {tm.t('assessment.unstable_buildings')}")
         
         if reasons:
@@ -724,59 +445,225 @@ def create_assessment_tab(row):
     st.markdown(f"#### 📝 {tm.t('modal.additional_info')}")
     col1, col2 = st.columns(2)
     with col1:
-        other_apps = row.get('هل لدى مالك المنزل طلبات استفادة أخرى ضمن مشاريع مشابهة؟')
-        if pd.notna(other_apps) and str(other_apps).strip():
+        other_apps = record.other_applications
+        if other_apps is not None:
             st.info(f"**{tm.t('modal.other_applications')}:** {other_apps}")
     
     with col2:
-        notes = row.get('ملاحظات إضافية أو تعليقات عامة (اختياري)')
-        if pd.notna(notes) and str(notes).strip():
+        notes = record.notes
+        if notes is not None:
             st.info(f"**{tm.t('modal.notes')}:** {notes}")
     
     # المقاول
-    contractor = row.get('Contractor')
-    if pd.notna(contractor) and str(contractor).strip():
+    contractor = record.contractor
+    if contractor is not None:
         st.markdown("---")
         st.success(f"👷 **{tm.t('modal.contractor')}:** {contractor}")
 
 
-def create_beneficiary_modal(row, main_items_df=None, sub_items_df=None):
-    """إنشاء نافذة منبثقة شاملة لعرض تفاصيل المستفيد"""
-    direction = get_direction_style()
-    
-    # العنوان
-    beneficiary_name = f"{row.get('الاسم الأول', '')} {row.get('اسم الأب', '')} {row.get('الكنية', '')}"
-    # st.markdown(f"<h1 style='{direction}'>👤 {beneficiary_name}</h1>", unsafe_allow_html=True)
+# التحميل المسبق للمستفيدين المجاورين في الخلفية (مشترك بين الجلسات)
+_prefetch_pool = ThreadPoolExecutor(max_workers=MODAL_PREFETCH_WORKERS, thread_name_prefix='modal-prefetch')
+_prefetch_pending = set()
+_prefetch_lock = threading.Lock()
+
+
+def warm_beneficiary(record: BeneficiaryRecord, sub_items_df: pd.DataFrame, data_version: Optional[str]):
+    """
+    تجهيز ما تعرضه النافذة لمستفيد دون عرضه
+
+    تُحسب أجزاء HTML لتبويبات المعلومات، وبنود التكاليف، ومعرض الصور
+    (مع توليد نسخه المصغرة)، والنسخ المصغرة لصورتي الوثيقة، كلٌّ في مخزنه
+    المعتاد، فيُعرض المستفيد عند الانتقال إليه من المخازن مباشرة.
+
+    Args:
+        record: سجل المستفيد
+        sub_items_df: DataFrame البنود الفرعية
+        data_version: إصدار ملف البيانات
+    """
+    language = tm.get_current_language()
+    for part in INFO_PARTS:
+        get_info_part_html(part, record, language)
+    if data_version is not None:
+        get_costs_payload(data_version, record.index, language, sub_items_df)
+    images = get_record_images(record)
+    if images:
+        get_carousel_payload(tuple((img['label'], img['url'], img['icon']) for img in images))
+    get_variant_urls([record.id_photo_front, record.id_photo_back], pick_variant(ID_PHOTO_WIDTH))
+
+
+def _run_prefetch(task: Tuple, ctx, record: BeneficiaryRecord, sub_items_df: pd.DataFrame, data_version: Optional[str]):
+    """تنفيذ warm_beneficiary في خيط الخلفية بسياق جلسة المستخدم (اللغة في session_state)"""
+    add_script_run_ctx(threading.current_thread(), ctx)
+    try:
+        warm_beneficiary(record, sub_items_df, data_version)
+    except Exception:
+        pass  # التحميل المسبق تحسين فقط؛ ما فشل يُحسب عند العرض
+    finally:
+        with _prefetch_lock:
+            _prefetch_pending.discard(task)
+
+
+def prefetch_neighbours(
+    records: Dict,
+    order: Sequence,
+    position: int,
+    sub_items_df: pd.DataFrame,
+    data_version: Optional[str],
+    radius: int = MODAL_PREFETCH_RADIUS
+):
+    """
+    تجهيز المستفيدين السابقين والتاليين في الخلفية دون انتظار
+
+    المستفيد المجهز حالياً (نفس الإصدار واللغة) لا يُضاف مرة أخرى.
+
+    Args:
+        records: سجلات المستفيدين {_index: BeneficiaryRecord}
+        order: قيم _index بترتيب النتائج المفلترة
+        position: موضع المستفيد الحالي في order
+        sub_items_df: DataFrame البنود الفرعية
+        data_version: إصدار ملف البيانات
+        radius: عدد المستفيدين المجهزين في كل اتجاه
+    """
+    ctx = get_script_run_ctx()
+    language = tm.get_current_language()
+    for offset in range(1, radius + 1):
+        for neighbour in (position + offset, position - offset):
+            if not 0 <= neighbour < len(order):
+                continue
+            record = records.get(order[neighbour])
+            if record is None:
+                continue
+            task = (data_version, record.index, language)
+            with _prefetch_lock:
+                if task in _prefetch_pending:
+                    continue
+                _prefetch_pending.add(task)
+            _prefetch_pool.submit(_run_prefetch, task, ctx, record, sub_items_df, data_version)
+
+
+def create_beneficiary_navigation(records: Dict, order: Sequence, key: str = 'modal_position') -> int:
+    """
+    شريط التنقل بين المستفيدين (السابق / التالي) بترتيب النتائج المفلترة
+
+    الأزرار تغير الموضع في session_state عبر callback، فتعيد النافذة (وهي
+    fragment) رسم نفسها بالمستفيد الجديد دون إغلاقها أو إعادة تشغيل الصفحة.
+
+    Args:
+        records: سجلات المستفيدين {_index: BeneficiaryRecord}
+        order: قيم _index بترتيب النتائج المفلترة
+        key: مفتاح موضع المستفيد الحالي في session_state
+
+    Returns:
+        موضع المستفيد الحالي في order
+    """
+    last = len(order) - 1
+    position = min(max(st.session_state.get(key, 0), 0), last)
+    st.session_state[key] = position
+
+    def move(step: int):
+        st.session_state[key] = min(max(st.session_state[key] + step, 0), last)
+
+    record = records[order[position]]
+    name = ' '.join(part for part in (record.first_name, record.father_name, record.last_name) if part) or record.full_name or ''
+    counter = tm.t('modal.beneficiary_x_of_y').format(x=position + 1, y=len(order))
+
+    # زر "السابق" على يمين الشريط بالعربية وعلى يساره بالإنجليزية
+    cols = st.columns([1, 4, 1], vertical_alignment="center")
+    prev_col, next_col = (cols[2], cols[0]) if tm.is_rtl() else (cols[0], cols[2])
+    with prev_col:
+        st.button(
+            f"{'▶' if tm.is_rtl() else '◀'} {tm.t('buttons.previous')}",
+            key=f"{key}_prev",
+            disabled=position == 0,
+            on_click=move,
+            args=(-1,),
+            use_container_width=True
+        )
+    with next_col:
+        st.button(
+            f"{tm.t('buttons.next')} {'◀' if tm.is_rtl() else '▶'}",
+            key=f"{key}_next",
+            disabled=position == last,
+            on_click=move,
+            args=(1,),
+            use_container_width=True
+        )
+    with cols[1]:
+        st.markdown(
+            f"<div style='text-align: center;'><strong>{escape(str(name))}</strong><br><small>{counter}</small></div>",
+            unsafe_allow_html=True
+        )
+    return position
+
+
+# تبويبات النافذة: (المفتاح، الأيقونة، مفتاح الترجمة)
+MODAL_TABS = [
+    ('personal', '👤', 'modal.personal_info'),
+    ('family', '👨‍👩‍👧‍👦', 'modal.family_info'),
+    ('address', '📍', 'modal.address_info'),
+    ('house', '🏠', 'modal.house_info'),
+    ('photos', '📸', 'modal.photos'),
+    ('costs', '💰', 'modal.costs'),
+    ('assessment', '🔍', 'modal.assessment'),
+]
+
+
+def create_beneficiary_modal(row, main_items_df=None, sub_items_df=None, houses_df=None, geo_index=None, data_version=None, order: Optional[Sequence] = None):
+    """
+    إنشاء نافذة منبثقة شاملة لعرض تفاصيل المستفيد
+
+    يُبنى محتوى التبويب المختار فقط (بدلاً من st.tabs التي تنفذ جميع
+    التبويبات مع كل فتح أو إعادة تشغيل)، وبيانات التبويبات الثقيلة (الصور
+    والتكاليف) مخزنة لكل مستفيد ولغة.
+
+    عند تمرير order يظهر شريط السابق / التالي، ويُجهز المستفيدان المجاوران
+    في الخلفية بعد عرض التبويب فيكون الانتقال إليهما قراءة من المخازن.
+
+    Args:
+        row: صف المستفيد (يُستبدل بسجله المُطبّع BeneficiaryRecord المشترك بين التبويبات؛
+            مع order يُقرأ المستفيد من موضعه في session_state['modal_position'])
+        main_items_df: DataFrame البنود الرئيسية
+        sub_items_df: DataFrame البنود الفرعية
+        houses_df: DataFrame جميع المنازل (للمنازل القريبة)
+        geo_index: الفهرس المكاني للمنازل
+        data_version: إصدار ملف البيانات (مفتاح تخزين السجلات وبيانات التكاليف)
+        order: قيم _index للنتائج المفلترة بترتيب عرضها (للتنقل بين المستفيدين)
+    """
+    records = None
+    if order and houses_df is not None and data_version is not None:
+        records = get_beneficiary_records(data_version, houses_df)
+        position = create_beneficiary_navigation(records, order)
+        record = records[order[position]]
+    else:
+        record = get_record(row, houses_df, data_version)
     st.markdown("---")
-    
-    # التبويبات
-    tabs = st.tabs([
-        f"👤 {tm.t('modal.personal_info')}",
-        f"👨‍👩‍👧‍👦 {tm.t('modal.family_info')}",
-        f"📍 {tm.t('modal.address_info')}",
-        f"🏠 {tm.t('modal.house_info')}",
-        f"📸 {tm.t('modal.photos')}",
-        f"💰 {tm.t('modal.costs')}",
-        f"🔍 {tm.t('modal.assessment')}"
-    ])
-    
-    with tabs[0]:
-        create_personal_info_tab(row)
-    
-    with tabs[1]:
-        create_family_info_tab(row)
-    
-    with tabs[2]:
-        create_address_tab(row)
-    
-    with tabs[3]:
-        create_house_info_tab(row)
-    
-    with tabs[4]:
-        create_photos_tab(row)
-    
-    with tabs[5]:
-        create_costs_tab(row, sub_items_df)
-    
-    with tabs[6]:
-        create_assessment_tab(row)
+
+    # التبويبات: المفاتيح ثابتة فيبقى التبويب المختار عند تغيير اللغة
+    labels = {key: f"{icon} {tm.t(label_key)}" for key, icon, label_key in MODAL_TABS}
+    active = st.segmented_control(
+        tm.t('modal.section'),
+        list(labels),
+        format_func=labels.get,
+        default=MODAL_TABS[0][0],
+        key='modal_tab',
+        label_visibility='collapsed'
+    ) or MODAL_TABS[0][0]
+
+    if active == 'personal':
+        create_personal_info_tab(record)
+    elif active == 'family':
+        create_family_info_tab(record)
+    elif active == 'address':
+        create_address_tab(record, houses_df, geo_index)
+    elif active == 'house':
+        create_house_info_tab(record)
+    elif active == 'photos':
+        create_photos_tab(record)
+    elif active == 'costs':
+        create_costs_tab(record, sub_items_df, data_version)
+    elif active == 'assessment':
+        create_assessment_tab(record)
+
+    # تجهيز المستفيدين المجاورين بعد عرض التبويب الحالي
+    if records is not None:
+        prefetch_neighbours(records, order, position, sub_items_df, data_version)
@@ -0,0 +1,190 @@
+"""
+الحدود الإدارية (GeoJSON محلي) وربط المنازل بالمناطق بفحص نقطة-داخل-مضلع متجه
+"""
+import json
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config import BOUNDARIES_DIR, BOUNDARY_NAME_PROPERTIES
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def list_boundary_files() -> List[Path]:
+    """
+    ملفات الحدود الإدارية المتوفرة محلياً
+
+    Returns:
+        قائمة بمسارات ملفات GeoJSON
+    """
+    folder = PROJECT_ROOT / BOUNDARIES_DIR
+    if not folder.is_dir():
+        return []
+    return sorted(list(folder.glob('*.geojson')) + list(folder.glob('*.json')))
+
+
+def load_boundaries(path: str) -> dict:
+    """
+    تحميل ملف GeoJSON وإضافة معرّف واسم موحدين لكل منطقة
+
+    يُضاف لكل Feature الخاصيتان area_id (رقم تسلسلي) و area_name (أول خاصية
+    متوفرة من BOUNDARY_NAME_PROPERTIES).
+
+    Args:
+        path: مسار ملف GeoJSON
+
+    Returns:
+        FeatureCollection كقاموس
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+
+    features = [
+        feature for feature in geojson.get('features', [])
+        if (feature.get('geometry') or {}).get('type') in ('Polygon', 'MultiPolygon')
+    ]
+    for area_id, feature in enumerate(features):
+        props = feature.setdefault('properties', {}) or {}
+        feature['properties'] = props
+        name = next((props[key] for key in BOUNDARY_NAME_PROPERTIES if props.get(key)), None)
+        props['area_id'] = area_id
+        props['area_name'] = str(name) if name is not None else str(area_id)
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _polygons(geometry: dict) -> List[List[np.ndarray]]:
+    """تحويل Polygon/MultiPolygon إلى قائمة مضلعات، كل مضلع قائمة حلقات (lon, lat)"""
+    coords = geometry['coordinates']
+    if geometry['type'] == 'Polygon':
+        coords = [coords]
+    return [[np.asarray(ring, dtype=float)[:, :2] for ring in polygon] for polygon in coords]
+
+
+def points_in_ring(lons: np.ndarray, lats: np.ndarray, ring: np.ndarray) -> np.ndarray:
+    """
+    فحص وقوع النقاط داخل حلقة مضلع بخوارزمية تقاطع الأشعة (متجهة بالكامل)
+
+    تُقارن جميع النقاط مع جميع الأضلاع دفعة واحدة (بث NumPy).
+
+    Args:
+        lons: خطوط الطول للنقاط
+        lats: خطوط العرض للنقاط
+        ring: مصفوفة رؤوس الحلقة (lon, lat)
+
+    Returns:
+        مصفوفة منطقية
+    """
+    x1, y1 = ring[:-1, 0], ring[:-1, 1]
+    x2, y2 = ring[1:, 0], ring[1:, 1]
+
+    px = lons[:, None]
+    py = lats[:, None]
+    crosses = (y1 > py) != (y2 > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+    hits = crosses & (px < x_at)
+    return (hits.sum(axis=1) % 2) == 1
+
+
+def assign_areas(df: pd.DataFrame, geojson: dict, chunk_size: int = 2048) -> pd.Series:
+    """
+    ربط كل منزل بالمنطقة الإدارية التي تحتويه
+
+    يُفحص أولاً المستطيل المحيط بكل مضلع لاستبعاد معظم النقاط بسرعة، ثم
+    تُفحص النقاط المتبقية (على دفعات) بتقاطع الأشعة مع مراعاة الثقوب.
+
+    Args:
+        df: DataFrame المنازل (يحتوي latitude و longitude)
+        geojson: ناتج load_boundaries
+        chunk_size: عدد النقاط في كل دفعة (للحد من استهلاك الذاكرة)
+
+    Returns:
+        Series بمعرّف المنطقة (area_id) لكل منزل و -1 لغير المربوط
+    """
+    lats = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=float)
+    lons = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=float)
+    area = np.full(len(df), -1, dtype=int)
+    pending = ~(np.isnan(lats) | np.isnan(lons))
+
+    for feature in geojson['features']:
+        area_id = feature['properties']['area_id']
+        for polygon in _polygons(feature['geometry']):
+            outer = polygon[0]
+            in_box = (
+                pending
+                & (lons >= outer[:, 0].min()) & (lons <= outer[:, 0].max())
+                & (lats >= outer[:, 1].min()) & (lats <= outer[:, 1].max())
+            )
+            candidates = np.flatnonzero(in_box)
+            for start in range(0, len(candidates), chunk_size):
+                idx = candidates[start:start + chunk_size]
+                inside = points_in_ring(lons[idx], lats[idx], outer)
+                for hole in polygon[1:]:
+                    inside &= ~points_in_ring(lons[idx], lats[idx], hole)
+                area[idx[inside]] = area_id
+                pending[idx[inside]] = False
+
+    return pd.Series(area, index=df.index, name='area_id')
+
+
+def get_area_statistics(df: pd.DataFrame, area_ids: pd.Series, geojson: dict) -> pd.DataFrame:
+    """
+    مؤشرات كل منطقة: عدد المنازل، التكلفة الإجمالية، نسبة الضرر الشديد
+
+    Args:
+        df: DataFrame المنازل
+        area_ids: ناتج assign_areas (بنفس فهرس df)
+        geojson: ناتج load_boundaries
+
+    Returns:
+        DataFrame بفهرس area_id وأعمدة area_name, houses, cost, severe_share
+    """
+    cost = pd.to_numeric(df.get('Grand Total', pd.Series(0, index=df.index)), errors='coerce').fillna(0)
+    severe = df.get('حالة الضرر', pd.Series('', index=df.index)) == 'ضرر شديد'
+
+    grouped = pd.DataFrame({
+        'area_id': area_ids,
+        'cost': cost,
+        'severe': severe.astype(float),
+    })[area_ids >= 0].groupby('area_id').agg(
+        houses=('cost', 'size'),
+        cost=('cost', 'sum'),
+        severe_share=('severe', 'mean'),
+    )
+
+    names = pd.Series(
+        {f['properties']['area_id']: f['properties']['area_name'] for f in geojson['features']},
+        name='area_name'
+    )
+    stats = pd.DataFrame(names).join(grouped)
+    stats[['houses', 'cost', 'severe_share']] = stats[['houses', 'cost', 'severe_share']].fillna(0)
+    stats['houses'] = stats['houses'].astype(int)
+    return stats
+
+
+@st.cache_data(show_spinner=False)
+def get_area_assignment(data_version: str, boundary_path: str, boundary_version: float, _df: pd.DataFrame) -> pd.Series:
+    """
+    ربط المنازل بالمناطق مخزناً مؤقتاً لكل إصدار من البيانات وملف الحدود
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        boundary_path: مسار ملف الحدود
+        boundary_version: وقت تعديل ملف الحدود
+        _df: DataFrame المنازل الكامل (لا يدخل في مفتاح التخزين)
+
+    Returns:
+        Series بمعرّف المنطقة لكل منزل
+    """
+    return assign_areas(_df, load_boundaries(boundary_path))
+
+
+@st.cache_data(show_spinner=False)
+def get_boundaries(boundary_path: str, boundary_version: float) -> dict:
+    """تحميل ملف الحدود مخزناً مؤقتاً لكل إصدار من الملف"""
+    return load_boundaries(boundary_path)
@@ -0,0 +1,340 @@
+"""
+معرض صور يعمل في المتصفح: التنقل والتكبير والتدوير دون إعادة تشغيل الصفحة
+"""
+import json
+from typing import Dict, List, Tuple
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from config import PHOTO_CAROUSEL_HEIGHT
+from utils.i18n import tm
+from utils.thumbnails import get_variant_urls, pick_variant, variant_src
+
+# عروض أماكن الصور في المعرض بالبكسل
+SLIDE_SLOT_PX = 800
+GRID_SLOT_PX = 300
+THUMB_SLOT_PX = 80
+
+_CAROUSEL_HTML = """
+<!DOCTYPE html>
+<html dir="__DIR__">
+<head>
+<meta charset="utf-8">
+<style>
+  * { box-sizing: border-box; }
+  body { margin: 0; font-family: __FONT__, sans-serif; color: #fff; background: transparent; }
+  .bar { display: flex; align-items: center; gap: 6px; margin-bottom: 8px; }
+  .bar button { background: #2d2d44; color: #fff; border: 0; border-radius: 8px; padding: 6px 10px;
+                cursor: pointer; font-size: 15px; }
+  .bar button:hover { background: #3d3d5c; }
+  .bar .title { flex: 1; text-align: center; padding: 6px 12px; border-radius: 10px; font-weight: bold;
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
+  .bar .count { opacity: 0.8; font-size: 12px; font-weight: normal; }
+  .stage { position: relative; height: __STAGE__px; background: #1a1a2e; border-radius: 12px;
+           overflow: hidden; touch-action: none; user-select: none; }
+  .stage img { position: absolute; inset: 0; margin: auto; max-width: 100%; max-height: 100%;
+               transition: transform 0.25s ease; cursor: grab; }
+  .stage img.dragging { transition: none; cursor: grabbing; }
+  .stage .error { position: absolute; inset: 0; display: none; align-items: center; justify-content: center; }
+  .nav { position: absolute; top: 50%; transform: translateY(-50%); z-index: 2; background: rgba(0,0,0,0.45);
+         color: #fff; border: 0; border-radius: 50%; width: 40px; height: 40px; font-size: 18px; cursor: pointer; }
+  .nav.prev { inset-inline-start: 10px; }
+  .nav.next { inset-inline-end: 10px; }
+  .thumbs { display: flex; gap: 6px; margin-top: 8px; overflow-x: auto; }
+  .thumbs img { width: 72px; height: 54px; object-fit: cover; border-radius: 6px; cursor: pointer;
+                opacity: 0.6; border: 2px solid transparent; }
+  .thumbs img.active { opacity: 1; border-color: #667eea; }
+  .grid { display: none; grid-template-columns: repeat(auto-fill, minmax(220px, 1fr)); gap: 10px; }
+  .grid figure { margin: 0; background: #2d2d44; border-radius: 12px; padding: 8px; cursor: zoom-in; }
+  .grid img { width: 100%; border-radius: 8px; display: block; }
+  .grid figcaption { text-align: center; font-weight: bold; font-size: 13px; margin-top: 6px; }
+  .grid-mode .grid { display: grid; }
+  .grid-mode .slider { display: none; }
+</style>
+</head>
+<body>
+<div id="root">
+  <div class="bar">
+    <button id="mode" title="__T_GRID__">🔲</button>
+    <div class="title"><span id="label"></span> <span class="count" id="count"></span></div>
+    <span class="slider-tools">
+      <button id="zoom-out" title="__T_ZOOM_OUT__">➖</button>
+      <button id="zoom-in" title="__T_ZOOM_IN__">➕</button>
+      <button id="rotate" title="__T_ROTATE__">🔄</button>
+      <button id="reset" title="__T_RESET__">↺</button>
+      <button id="full" title="__T_FULL__">⛶</button>
+    </span>
+  </div>
+  <div class="slider">
+    <div class="stage" id="stage">
+      <button class="nav prev" id="prev" title="__T_PREV__">❮</button>
+      <img id="photo" alt="" draggable="false">
+      <div class="error" id="error">❌ __T_ERROR__</div>
+      <button class="nav next" id="next" title="__T_NEXT__">❯</button>
+    </div>
+    <div class="thumbs" id="thumbs"></div>
+  </div>
+  <div class="grid" id="grid"></div>
+</div>
+<script>
+(function () {
+  var images = __IMAGES__;
+  var labels = __LABELS__;
+  var rtl = document.documentElement.dir === 'rtl';
+  var root = document.getElementById('root');
+  var photo = document.getElementById('photo');
+  var stage = document.getElementById('stage');
+  var errorBox = document.getElementById('error');
+  var idx = 0, zoom = 1, rot = 0, panX = 0, panY = 0;
+  var preloaded = {};
+
+  function preload(i) {
+    i = (i + images.length) % images.length;
+    if (!preloaded[i]) {
+      preloaded[i] = new Image();
+      preloaded[i].src = images[i].src;
+    }
+  }
+
+  function apply() {
+    photo.style.transform = 'translate(' + panX + 'px,' + panY + 'px) rotate(' + rot + 'deg) scale(' + zoom + ')';
+  }
+
+  function resetView() {
+    zoom = 1; rot = 0; panX = 0; panY = 0;
+    apply();
+  }
+
+  // تمرير شريط المصغرات وحده (scrollIntoView قد يمرر الصفحة الأم أيضاً)
+  function scrollIntoStrip(el) {
+    var strip = el.parentNode.getBoundingClientRect(), box = el.getBoundingClientRect();
+    if (box.left < strip.left) { el.parentNode.scrollBy({left: box.left - strip.left}); }
+    else if (box.right > strip.right) { el.parentNode.scrollBy({left: box.right - strip.right}); }
+  }
+
+  function show(i) {
+    idx = (i + images.length) % images.length;
+    var image = images[idx];
+    errorBox.style.display = 'none';
+    photo.style.display = '';
+    photo.src = image.src;
+    photo.alt = image.label;
+    resetView();
+    document.getElementById('label').textContent = image.icon + ' ' + image.label;
+    document.getElementById('count').textContent =
+      '(' + labels.count.replace('{x}', idx + 1).replace('{y}', images.length) + ')';
+    Array.prototype.forEach.call(document.querySelectorAll('.thumbs img'), function (el, j) {
+      el.classList.toggle('active', j === idx);
+      if (j === idx) { scrollIntoStrip(el); }
+    });
+    // الصورتان المجاورتان تُحمّلان مسبقاً فيظهر التنقل فوراً
+    preload(idx + 1);
+    preload(idx - 1);
+  }
+
+  function setZoom(value) {
+    zoom = Math.min(5, Math.max(1, value));
+    if (zoom === 1) { panX = 0; panY = 0; }
+    apply();
+  }
+
+  function setMode(grid) {
+    root.classList.toggle('grid-mode', grid);
+    document.querySelector('.slider-tools').style.display = grid ? 'none' : '';
+    var button = document.getElementById('mode');
+    button.textContent = grid ? '▶️' : '🔲';
+    button.title = grid ? labels.gallery : labels.grid;
+    if (grid) {
+      document.getElementById('label').textContent = '📷';
+      document.getElementById('count').textContent = '(' + images.length + ')';
+    } else {
+      show(idx);
+    }
+  }
+
+  images.forEach(function (image, i) {
+    var thumb = document.createElement('img');
+    thumb.src = image.thumb;
+    thumb.alt = image.label;
+    thumb.title = image.label;
+    thumb.loading = 'lazy';
+    thumb.onclick = function () { show(i); };
+    document.getElementById('thumbs').appendChild(thumb);
+
+    var figure = document.createElement('figure');
+    var img = document.createElement('img');
+    img.src = image.grid;
+    img.alt = image.label;
+    img.loading = 'lazy';
+    var caption = document.createElement('figcaption');
+    caption.textContent = image.icon + ' ' + image.label;
+    figure.appendChild(img);
+    figure.appendChild(caption);
+    figure.onclick = function () { idx = i; setMode(false); };
+    document.getElementById('grid').appendChild(figure);
+  });
+
+  photo.onerror = function () {
+    photo.style.display = 'none';
+    errorBox.style.display = 'flex';
+  };
+
+  // الأسهم تتبع اتجاه الصفحة: "السابق" على اليمين في العربية
+  document.getElementById('prev').textContent = rtl ? '❯' : '❮';
+  document.getElementById('next').textContent = rtl ? '❮' : '❯';
+  document.getElementById('prev').onclick = function () { show(idx - 1); };
+  document.getElementById('next').onclick = function () { show(idx + 1); };
+  document.getElementById('zoom-in').onclick = function () { setZoom(zoom * 1.5); };
+  document.getElementById('zoom-out').onclick = function () { setZoom(zoom / 1.5); };
+  document.getElementById('rotate').onclick = function () { rot = (rot + 90) % 360; apply(); };
+  document.getElementById('reset').onclick = resetView;
+  document.getElementById('mode').onclick = function () { setMode(!root.classList.contains('grid-mode')); };
+
+  var full = document.getElementById('full');
+  if (document.fullscreenEnabled) {
+    full.onclick = function () {
+      if (document.fullscreenElement) { document.exitFullscreen(); } else { stage.requestFullscreen(); }
+    };
+  } else {
+    // الإطار لا يسمح بملء الشاشة: فتح الصورة بدقتها الأصلية في نافذة جديدة
+    full.onclick = function () { window.open(images[idx].original, '_blank', 'noopener'); };
+  }
+
+  stage.addEventListener('wheel', function (e) {
+    e.preventDefault();
+    setZoom(zoom * (e.deltaY < 0 ? 1.2 : 1 / 1.2));
+  }, {passive: false});
+  photo.addEventListener('dblclick', function () { setZoom(zoom > 1 ? 1 : 2.5); });
+
+  // السحب: تحريك الصورة المكبرة، أو السحب الأفقي للتنقل عند عدم التكبير
+  var drag = null;
+  stage.addEventListener('pointerdown', function (e) {
+    if (e.target !== photo) { return; }
+    drag = {x: e.clientX, y: e.clientY, panX: panX, panY: panY};
+    photo.classList.add('dragging');
+    stage.setPointerCapture(e.pointerId);
+  });
+  stage.addEventListener('pointermove', function (e) {
+    if (!drag || zoom === 1) { return; }
+    panX = drag.panX + e.clientX - drag.x;
+    panY = drag.panY + e.clientY - drag.y;
+    apply();
+  });
+  stage.addEventListener('pointerup', function (e) {
+    if (!drag) { return; }
+    var dx = e.clientX - drag.x;
+    photo.classList.remove('dragging');
+    drag = null;
+    if (zoom === 1 && Math.abs(dx) > 50) {
+      show(idx + ((dx < 0) !== rtl ? 1 : -1));
+    }
+  });
+
+  document.addEventListener('keydown', function (e) {
+    if (root.classList.contains('grid-mode')) { return; }
+    if (e.key === 'ArrowRight') { show(idx + (rtl ? -1 : 1)); }
+    else if (e.key === 'ArrowLeft') { show(idx + (rtl ? 1 : -1)); }
+    else if (e.key === '+' || e.key === '=') { setZoom(zoom * 1.5); }
+    else if (e.key === '-') { setZoom(zoom / 1.5); }
+    else if (e.key === 'r') { rot = (rot + 90) % 360; apply(); }
+    else if (e.key === '0') { resetView(); }
+  });
+
+  show(0);
+})();
+</script>
+</body>
+</html>
+"""
+
+
+def build_carousel_payload(images: List[Dict]) -> List[Dict]:
+    """
+    روابط الصور لكل استخدام في المعرض (شريحة، شبكة، مصغرة، أصلية)
+
+    تُولّد النسخ المصغرة لجميع الصور بالتوازي مرة واحدة، ثم تُرسل للمتصفح مع
+    المعرض فلا يحتاج التنقل أي طلب إلى الخادم.
+
+    Args:
+        images: قائمة قواميس بالمفاتيح label و url و icon
+
+    Returns:
+        قائمة قواميس قابلة للتسلسل JSON
+    """
+    urls = [img['url'] for img in images]
+    slide_urls = get_variant_urls(urls, pick_variant(SLIDE_SLOT_PX))
+    grid_urls = get_variant_urls(urls, pick_variant(GRID_SLOT_PX))
+    thumb_urls = get_variant_urls(urls, pick_variant(THUMB_SLOT_PX))
+    return [
+        {
+            'label': img['label'],
+            'icon': img['icon'],
+            'src': variant_src(img['url'], SLIDE_SLOT_PX, slide_urls),
+            'grid': variant_src(img['url'], GRID_SLOT_PX, grid_urls),
+            'thumb': variant_src(img['url'], THUMB_SLOT_PX, thumb_urls),
+            'original': img['url'],
+        }
+        for img in images
+    ]
+
+
+@st.cache_data(ttl=600, max_entries=256, show_spinner=False)
+def get_carousel_payload(images: Tuple[Tuple[str, str, str], ...]) -> List[Dict]:
+    """
+    build_carousel_payload مخزنة لكل مجموعة صور (مستفيد) ولغة
+
+    المفتاح يتضمن التسميات فيختلف حسب اللغة. المدة المحدودة تعيد المحاولة
+    للصور التي تعذر توليد نسخها المصغرة (أُرسل رابطها الأصلي).
+
+    Args:
+        images: tuple من (label، url، icon)
+
+    Returns:
+        ناتج build_carousel_payload
+    """
+    return build_carousel_payload([{'label': label, 'url': url, 'icon': icon} for label, url, icon in images])
+
+
+def _json(value) -> str:
+    """JSON آمن للتضمين داخل <script>"""
+    return json.dumps(value, ensure_ascii=False).replace('</', '<\\/')
+
+
+def render_carousel(images: List[Dict], height: int = PHOTO_CAROUSEL_HEIGHT):
+    """
+    عرض معرض الصور كمكون HTML يعمل بالكامل في المتصفح
+
+    التنقل (الأزرار، الأسهم، السحب)، والتكبير (العجلة، النقر المزدوج)،
+    والتدوير، والعرض الشبكي تتم في المتصفح، وتُحمّل الصورتان المجاورتان
+    مسبقاً، فلا يكلف تصفح صور المنزل أي إعادة تشغيل لـ Streamlit.
+
+    Args:
+        images: قائمة قواميس بالمفاتيح label و url و icon
+        height: ارتفاع المكون بالبكسل
+    """
+    labels = {
+        'count': tm.t('modal.image_x_of_y'),
+        'grid': tm.t('modal.view_grid'),
+        'gallery': tm.t('modal.view_gallery'),
+    }
+    replacements = {
+        '__DIR__': 'rtl' if tm.is_rtl() else 'ltr',
+        '__FONT__': tm.t('font_family'),
+        '__STAGE__': str(height - 150),
+        '__T_GRID__': tm.t('modal.view_grid'),
+        '__T_ZOOM_IN__': tm.t('modal.zoom_in'),
+        '__T_ZOOM_OUT__': tm.t('modal.zoom_out'),
+        '__T_ROTATE__': tm.t('buttons.rotate'),
+        '__T_RESET__': tm.t('modal.reset_view'),
+        '__T_FULL__': tm.t('modal.fullscreen'),
+        '__T_PREV__': tm.t('buttons.previous'),
+        '__T_NEXT__': tm.t('buttons.next'),
+        '__T_ERROR__': tm.t('modal.image_error'),
+        '__IMAGES__': _json(get_carousel_payload(tuple((img['label'], img['url'], img['icon']) for img in images))),
+        '__LABELS__': _json(labels),
+    }
+    html = _CAROUSEL_HTML
+    for placeholder, value in replacements.items():
+        html = html.replace(placeholder, value)
+    components.html(html, height=height, scrolling=True)
@@ -0,0 +1,245 @@
+"""
+تقسيم المنازل إلى حزم عمل جغرافية متقاربة ومتوازنة التكلفة
+"""
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.geo_index import EARTH_RADIUS_M
+
+
+def get_house_costs(houses_df: pd.DataFrame, sub_items_df: pd.DataFrame) -> pd.Series:
+    """
+    تكلفة كل منزل من مجموع بنوده الفرعية
+
+    Args:
+        houses_df: DataFrame المنازل
+        sub_items_df: DataFrame البنود الفرعية (load_sub_items)
+
+    Returns:
+        Series بنفس فهرس houses_df (0 للمنازل بلا بنود)
+    """
+    if sub_items_df is None or sub_items_df.empty or '_parent_index' not in sub_items_df.columns:
+        return pd.Series(0.0, index=houses_df.index, name='cost')
+    totals = sub_items_df.groupby('_parent_index')['الإجمالي'].sum()
+    return houses_df['_index'].map(totals).fillna(0.0).astype(float).rename('cost')
+
+
+def _project(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """إسقاط مستطيل متساوي المسافات حول مركز النقاط (بالمتر) - دقيق بما يكفي لمنطقة محلية"""
+    lat0 = np.radians(lats.mean())
+    x = np.radians(lons - lons.mean()) * np.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(lats - lats.mean()) * EARTH_RADIUS_M
+    return np.column_stack([x, y])
+
+
+def _init_centers(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """اختيار المراكز الأولية بطريقة k-means++"""
+    centers = [points[rng.integers(len(points))]]
+    closest = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            centers.append(points[rng.integers(len(points))])
+        else:
+            centers.append(points[rng.choice(len(points), p=closest / total)])
+        closest = np.minimum(closest, ((points - centers[-1]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def _capacitated_assign(dist: np.ndarray, weights: np.ndarray, capacity: float) -> np.ndarray:
+    """
+    إسناد النقاط إلى أقرب مركز لم تمتلئ سعته
+
+    تُعالج النقاط الأكثر "ندماً" أولاً (الفرق الأكبر بين أقرب مركزين) ثم
+    الأثقل تكلفة، كي لا تُدفع النقاط الحساسة إلى حزم بعيدة.
+    """
+    n, k = dist.shape
+    sorted_dist = np.sort(dist, axis=1)
+    regret = sorted_dist[:, 1] - sorted_dist[:, 0] if k > 1 else np.zeros(n)
+    order = np.lexsort((-weights, -regret))
+    preference = np.argsort(dist, axis=1)
+
+    labels = np.empty(n, dtype=int)
+    load = np.zeros(k)
+    for i in order:
+        w = weights[i]
+        fits = load[preference[i]] + w <= capacity
+        if fits.any():
+            c = preference[i][np.argmax(fits)]
+        else:
+            # لا توجد حزمة تتسع: الأقل تجاوزاً للسعة
+            c = int(np.argmin(load + w))
+        labels[i] = c
+        load[c] += w
+    return labels
+
+
+def balanced_kmeans(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    weights: np.ndarray,
+    k: int,
+    tolerance: float = 0.1,
+    max_iter: int = 30,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    k-means بسعة لكل مجموعة: مجموعات متقاربة جغرافياً بأوزان (تكاليف) متوازنة
+
+    في كل دورة تُسند النقاط إلى المراكز مع حد أعلى للوزن
+    (الإجمالي / k × (1 + tolerance))، وتُضاف لمسافة كل مركز إزاحة تكبر للحزم
+    المثقلة وتصغر للحزم الخفيفة (كي تجذب الحزم الخفيفة نقاطاً أكثر)، ثم تُحدّث
+    المراكز كمتوسط نقاطها. يُعاد أفضل إسناد توازناً.
+
+    Args:
+        lats: خطوط العرض
+        lons: خطوط الطول
+        weights: وزن (تكلفة) كل نقطة
+        k: عدد المجموعات
+        tolerance: التجاوز المسموح فوق الحصة المتساوية
+        max_iter: الحد الأقصى لعدد الدورات
+        seed: بذرة العشوائية (نتائج قابلة للتكرار)
+
+    Returns:
+        رقم المجموعة لكل نقطة (0..k-1)
+    """
+    points = _project(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+    weights = np.clip(np.asarray(weights, dtype=float), 0.0, None)
+    k = max(1, min(k, len(points)))
+    if k == 1:
+        return np.zeros(len(points), dtype=int)
+
+    # المنازل بلا تكلفة تحصل على وزن صغير كي تتوزع أيضاً
+    floor = weights[weights > 0].mean() * 0.01 if (weights > 0).any() else 1.0
+    weights = np.maximum(weights, floor)
+    share = weights.sum() / k
+    capacity = share * (1.0 + tolerance)
+
+    rng = np.random.default_rng(seed)
+    centers = _init_centers(points, k, rng)
+    bias = np.zeros(k)
+    best_labels, best_imbalance = None, np.inf
+    for _ in range(max_iter):
+        dist = np.sqrt(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        labels = _capacitated_assign(dist + bias, weights, capacity)
+
+        load = np.bincount(labels, weights, minlength=k)
+        imbalance = np.abs(load / share - 1.0).max()
+        if imbalance < best_imbalance:
+            best_labels, best_imbalance = labels, imbalance
+        if imbalance <= tolerance:
+            break
+
+        # الإزاحة بوحدة المسافة النموذجية بين النقاط ومراكزها
+        bias += 0.5 * np.median(dist.min(axis=1)) * (load / share - 1.0)
+
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, points[:, d], minlength=k) for d in range(2)], axis=1)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+    return best_labels
+
+
+def convex_hull(points: np.ndarray) -> np.ndarray:
+    """
+    الغلاف المحدب لمجموعة نقاط (خوارزمية السلسلة الرتيبة)
+
+    Args:
+        points: مصفوفة Nx2
+
+    Returns:
+        رؤوس الغلاف بعكس اتجاه عقارب الساعة
+    """
+    points = np.unique(np.asarray(points, dtype=float), axis=0)
+    if len(points) < 3:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in points[::-1]:
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+
+def plan_work_packages(df: pd.DataFrame, costs: pd.Series, n_packages: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    تقسيم المنازل ذات الإحداثيات إلى حزم عمل
+
+    Args:
+        df: DataFrame المنازل المحددة
+        costs: تكلفة كل منزل (get_house_costs)
+        n_packages: عدد الحزم
+
+    Returns:
+        (DataFrame المنازل مع عمودي package (1..N) و cost، ملخص الحزم)
+    """
+    valid = df['latitude'].notna() & df['longitude'].notna()
+    houses = df[valid].assign(cost=costs.reindex(df.index).fillna(0.0)[valid])
+    if houses.empty:
+        return houses.assign(package=[]), pd.DataFrame()
+
+    labels = balanced_kmeans(
+        houses['latitude'].to_numpy(dtype=float),
+        houses['longitude'].to_numpy(dtype=float),
+        houses['cost'].to_numpy(dtype=float),
+        n_packages
+    )
+    houses['package'] = labels + 1
+
+    summary = houses.groupby('package').agg(
+        houses=('cost', 'size'),
+        cost=('cost', 'sum'),
+        lat=('latitude', 'mean'),
+        lon=('longitude', 'mean'),
+    )
+    if 'القرية' in houses.columns:
+        summary['villages'] = houses.groupby('package')['القرية'].agg(
+            lambda v: '، '.join(sorted(v.dropna().astype(str).unique()))
+        )
+    total = summary['cost'].sum()
+    summary['cost_share'] = summary['cost'] / total if total > 0 else 0.0
+
+    # نصف قطر الحزمة: أبعد منزل عن مركزها
+    center = summary.loc[houses['package'], ['lat', 'lon']].to_numpy()
+    lat1, lon1 = np.radians(houses['latitude'].to_numpy(dtype=float)), np.radians(houses['longitude'].to_numpy(dtype=float))
+    lat2, lon2 = np.radians(center[:, 0]), np.radians(center[:, 1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    radius = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    summary['radius_m'] = pd.Series(radius, index=houses.index).groupby(houses['package']).max().round(0)
+
+    return houses, summary
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_work_packages(
+    data_version: str,
+    filters: tuple,
+    n_packages: int,
+    _df: pd.DataFrame,
+    _costs: pd.Series
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    حزم العمل محسوبة مرة واحدة لكل (إصدار البيانات، الفلاتر، عدد الحزم)
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        filters: tuple بقيم الفلاتر المطبقة
+        n_packages: عدد الحزم
+        _df: DataFrame المنازل المحددة (لا يدخل في مفتاح التخزين)
+        _costs: تكلفة كل منزل
+
+    Returns:
+        ناتج plan_work_packages
+    """
+    return plan_work_packages(_df, _costs, n_packages)
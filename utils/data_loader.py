@@ -1,10 +1,32 @@
 """
 وحدة تحميل ومعالجة البيانات من ملف Excel
 """
+import numpy as np
 import pandas as pd
 import streamlit as st
 from typing import Dict, List, Tuple
 import os
+from config import SYRIA_BBOX, GPS_FLAG_COLUMNS
+from utils.gazetteer import build_gazetteer, impute_missing_coordinates
+
+
+def get_data_version(file_path: str) -> str:
+    """
+    حساب معرّف إصدار ملف البيانات (يتغير عند تعديل الملف)
+    
+    يُستخدم كجزء من مفاتيح التخزين المؤقت للنتائج المشتقة من البيانات.
+    
+    Args:
+        file_path: مسار ملف Excel
+        
+    Returns:
+        نص يمثل الإصدار (وقت التعديل والحجم)
+    """
+    try:
+        stat = os.stat(file_path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    except OSError:
+        return "missing"
 
 
 @st.cache_data
@@ -86,6 +108,13 @@ def clean_houses_data(df: pd.DataFrame) -> pd.DataFrame:
             errors='coerce'
         )
     
+    # التحقق من جودة الإحداثيات
+    if 'latitude' in df.columns and 'longitude' in df.columns:
+        df = validate_gps(df)
+        
+        # موقع تقريبي (مركز القرية/الناحية) للمنازل بلا إحداثيات
+        df = impute_missing_coordinates(df, build_gazetteer(df))
+    
     # تحويل الأرقام
     numeric_cols = [
         'عدد أفراد الأسرة (بما فيهم مالك المنزل)',
@@ -110,12 +139,77 @@ def clean_houses_data(df: pd.DataFrame) -> pd.DataFrame:
     if 'وصف حالة الضرر من وجهة نظرك كمالك للمنزل' in df.columns and 'حالة الضرر' not in df.columns:
         df['حالة الضرر'] = df['وصف حالة الضرر من وجهة نظرك كمالك للمنزل']
     
-    # ملء القيم الفارغة
-    df = df.fillna('')
+    # ملء القيم الفارغة (مع إبقاء الإحداثيات رقمية ليمكن كشف القيم المفقودة)
+    df = df.fillna({col: '' for col in df.columns if col not in ('latitude', 'longitude')})
     
     return df
 
 
+def validate_gps(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    التحقق من جودة إحداثيات GPS وإضافة علامة منطقية لكل نوع مشكلة
+    
+    الأعمدة المضافة:
+        gps_missing: إحداثيات مفقودة
+        gps_zero: إحداثيات (0, 0)
+        gps_swapped: خط العرض والطول مقلوبان (تقع النقطة في سوريا بعد التبديل)
+        gps_outside: نقطة خارج حدود سوريا
+        gps_duplicate: نفس الإحداثيات بالضبط لأسر مختلفة
+        gps_suspect: أي مشكلة مما سبق عدا الفقدان
+    
+    Args:
+        df: DataFrame يحتوي latitude و longitude رقميين
+        
+    Returns:
+        DataFrame مع أعمدة العلامات
+    """
+    lat = df['latitude']
+    lon = df['longitude']
+    south, west, north, east = SYRIA_BBOX
+    
+    missing = lat.isna() | lon.isna()
+    zero = ~missing & ((lat == 0) | (lon == 0))
+    in_syria = lat.between(south, north) & lon.between(west, east)
+    swapped = ~missing & ~zero & ~in_syria & lon.between(south, north) & lat.between(west, east)
+    outside = ~missing & ~zero & ~in_syria & ~swapped
+    
+    # التكرار: نفس الزوج (lat, lon) مشترك بين أكثر من أسرة
+    household_col = 'رقم الوثيقة الشخصية (الرقم الوطني)'
+    if household_col in df.columns:
+        households = df[household_col].astype(str).where(df[household_col].notna(), df.index.astype(str))
+    else:
+        households = pd.Series(df.index.astype(str), index=df.index)
+    households_per_point = (
+        households[~missing]
+        .groupby([lat[~missing], lon[~missing]])
+        .transform('nunique')
+    )
+    duplicate = (households_per_point > 1).reindex(df.index, fill_value=False)
+    
+    df['gps_missing'] = missing
+    df['gps_zero'] = zero
+    df['gps_swapped'] = swapped
+    df['gps_outside'] = outside
+    df['gps_duplicate'] = duplicate
+    df['gps_suspect'] = zero | swapped | outside | duplicate
+    
+    return df
+
+
+def get_gps_quality_summary(df: pd.DataFrame) -> Dict[str, int]:
+    """
+    حساب إجمالي المنازل لكل نوع من مشاكل GPS
+    
+    Args:
+        df: DataFrame بيانات المنازل (بعد clean_houses_data)
+        
+    Returns:
+        قاموس {اسم العلامة: العدد} يتضمن gps_suspect
+    """
+    flags = [col for col in GPS_FLAG_COLUMNS + ['gps_suspect'] if col in df.columns]
+    return {col: int(df[col].sum()) for col in flags}
+
+
 @st.cache_data
 def load_main_items(file_path: str) -> pd.DataFrame:
     """
@@ -256,6 +350,22 @@ def get_demographic_stats(df: pd.DataFrame) -> Dict[str, int]:
     return stats
 
 
+def get_assessed_mask(df: pd.DataFrame):
+    """
+    تحديد المنازل التي تمت دراستها (لديها تكلفة تقديرية من جدول الكميات)
+    
+    Args:
+        df: DataFrame بيانات المنازل
+        
+    Returns:
+        مصفوفة منطقية بطول df
+    """
+    if 'Grand Total' not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    
+    return (pd.to_numeric(df['Grand Total'], errors='coerce').fillna(0) > 0).to_numpy()
+
+
 def filter_houses(
     df: pd.DataFrame,
     governorate: str = None,
@@ -293,6 +403,36 @@ def filter_houses(
     return filtered_df
 
 
+# الأعمدة التي يبحث فيها search_houses
+SEARCH_COLUMNS = [
+    'الاسم الكامل',
+    'رقم الوثيقة الشخصية (الرقم الوطني)',
+    'العنوان التفصيلي لمكان السكن الحالي',
+    'القرية',
+    'المحافظة',
+    'المنطقة',
+    'الناحية'
+]
+
+
+def search_mask(df: pd.DataFrame, search_term: str) -> np.ndarray:
+    """
+    الصفوف المطابقة لنص البحث في أي من SEARCH_COLUMNS
+
+    Args:
+        df: DataFrame بيانات المنازل
+        search_term: نص البحث
+
+    Returns:
+        مصفوفة منطقية بطول df
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    for col in SEARCH_COLUMNS:
+        if col in df.columns:
+            mask |= df[col].astype(str).str.contains(search_term, case=False, na=False).to_numpy()
+    return mask
+
+
 def search_houses(df: pd.DataFrame, search_term: str) -> pd.DataFrame:
     """
     البحث في بيانات المنازل
@@ -308,19 +448,62 @@ def search_houses(df: pd.DataFrame, search_term: str) -> pd.DataFrame:
         return df
     
     # البحث في عدة أعمدة
-    search_columns = [
-        'الاسم الكامل',
-        'رقم الوثيقة الشخصية (الرقم الوطني)',
-        'العنوان التفصيلي لمكان السكن الحالي',
-        'القرية',
-        'المحافظة',
-        'المنطقة',
-        'الناحية'
-    ]
-    
-    mask = False
-    for col in search_columns:
-        if col in df.columns:
-            mask |= df[col].astype(str).str.contains(search_term, case=False, na=False)
-    
-    return df[mask]
+    return df[search_mask(df, search_term)]
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_sort_positions(data_version: str, sort_column: str, _df: pd.DataFrame) -> np.ndarray:
+    """
+    ترتيب صفوف df حسب عمود، محسوب مرة واحدة لكل (إصدار البيانات، العمود)
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        sort_column: عمود الترتيب (None أو عمود غير موجود: ترتيب الملف)
+        _df: DataFrame المنازل (لا يدخل في مفتاح التخزين)
+
+    Returns:
+        مواضع الصفوف (iloc) مرتبة تصاعدياً، والقيم الفارغة في الآخر
+    """
+    if not sort_column or sort_column not in _df.columns:
+        return np.arange(len(_df))
+    values = _df[sort_column].astype('string').reset_index(drop=True)
+    return values.sort_values(kind='stable', na_position='last').index.to_numpy()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def get_filtered_positions(
+    data_version: str,
+    sort_column: str,
+    search_term: str,
+    governorate: str,
+    damage_status: str,
+    house_type: str,
+    _df: pd.DataFrame
+) -> np.ndarray:
+    """
+    مواضع المنازل المطابقة للبحث والفلاتر بترتيب العرض
+
+    نفس نتيجة search_houses ثم filter_houses لكن دون نسخ DataFrame: تُحسب
+    مصفوفة منطقية واحدة وتُطبق على الترتيب المحسوب مسبقاً (get_sort_positions).
+
+    Args:
+        data_version: إصدار ملف البيانات
+        sort_column: عمود الترتيب
+        search_term: نص البحث
+        governorate: المحافظة
+        damage_status: حالة الضرر
+        house_type: نوع المنزل
+        _df: DataFrame المنازل (لا يدخل في مفتاح التخزين)
+
+    Returns:
+        مواضع الصفوف (iloc) المطابقة مرتبة
+    """
+    mask = np.ones(len(_df), dtype=bool)
+    if search_term:
+        mask &= search_mask(_df, search_term)
+    for column, value in (('المحافظة', governorate), ('حالة الضرر', damage_status), ('نوع المنزل', house_type)):
+        if value and value != 'الكل':
+            mask &= (_df[column] == value).to_numpy()
+
+    order = get_sort_positions(data_version, sort_column, _df)
+    return order[mask[order]]
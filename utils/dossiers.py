@@ -0,0 +1,370 @@
+"""
+تصدير ملفات المستفيدين (dossiers) القابلة للطباعة دفعة واحدة في ملف ZIP
+
+لكل منزل صفحة HTML مستقلة (المعلومات الشخصية، الأسرة، العنوان، المنزل، الصور،
+التكاليف) بتنسيق مناسب للطباعة أو الحفظ كـ PDF من المتصفح، مع صفحة فهرس.
+تُبنى الصفحات بالتوازي في عمليات منفصلة (توليد النسخ المصغرة الناقصة عمل
+معالج)، وتُكتب في الأرشيف من العملية الرئيسية عند وصولها.
+"""
+import multiprocessing
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import streamlit as st
+from jinja2 import Environment
+from markupsafe import Markup
+
+from config import DOSSIER_EXPORT_WORKERS, DOSSIER_CHUNK_SIZE, DOSSIER_PHOTO_WIDTH, DOSSIER_TEMP_MAX_AGE
+from utils.i18n import tm
+from utils.image_store import ImageStore
+from utils.thumbnails import get_variant
+from utils.beneficiary_html import render_info_part
+from utils.beneficiary_modal import get_costs_payload, get_record_images
+from utils.records import BeneficiaryRecord
+
+# أجزاء المعلومات في الملف بترتيب عرضها (مفاتيح INFO_PARTS)
+DOSSIER_PARTS = ('personal', 'health', 'family', 'address', 'house', 'house_condition')
+
+# بيانات التكاليف المرسلة لكل منزل: (جدول العرض، الإجمالي) أو None
+CostsSlice = Optional[Tuple[pd.DataFrame, float]]
+
+_env = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+
+_STYLE = """\
+<style>
+body { font-family: Tajawal, 'Segoe UI', Arial, sans-serif; margin: 24px; color: #222; }
+h1 { margin: 0 0 4px; }
+.meta { color: #666; margin: 0 0 16px; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #ccc; padding: 4px 8px; text-align: start; }
+th { background: #f2f2f2; }
+.photos { display: grid; grid-template-columns: repeat(3, 1fr); gap: 12px; }
+.photos figure { margin: 0; break-inside: avoid; }
+.photos img { width: 100%; border-radius: 6px; }
+.total { font-weight: bold; font-size: 1.1em; }
+section { break-inside: avoid-page; }
+@page { size: A4; margin: 15mm; }
+@media print { body { margin: 0; } a { color: inherit; text-decoration: none; } }
+</style>
+"""
+
+DOSSIER_TEMPLATE = _env.from_string("""\
+<!DOCTYPE html>
+<html lang="{{ lang }}" dir="{{ dir }}">
+<head>
+<meta charset="utf-8">
+<title>{{ name }}</title>
+{{ style }}
+</head>
+<body>
+<h1>{{ name }}</h1>
+<p class="meta">#{{ index }}{% for item in meta %} · {{ item }}{% endfor %}</p>
+{% for part in parts %}
+<section>{{ part }}</section>
+{% endfor %}
+<section>
+<hr>
+<h3>📸 {{ labels.photos }}</h3>
+{% if photos %}
+<div class="photos">
+{% for photo in photos %}
+<figure>
+{% if photo.src %}
+<img src="{{ photo.src }}" alt="{{ photo.label }}">
+{% else %}
+<a href="{{ photo.url }}">{{ labels.image_error }}</a>
+{% endif %}
+<figcaption>{{ photo.icon }} {{ photo.label }}</figcaption>
+</figure>
+{% endfor %}
+</div>
+{% else %}
+<p>{{ labels.no_data }}</p>
+{% endif %}
+</section>
+<section>
+<hr>
+<h3>💰 {{ labels.costs }}</h3>
+{% if costs_table %}
+<p class="total">{{ labels.total_cost }}: ${{ '{:,.2f}'.format(total_cost) }}</p>
+{{ costs_table }}
+{% else %}
+<p>{{ labels.no_data }}</p>
+{% endif %}
+</section>
+</body>
+</html>
+""")
+
+INDEX_TEMPLATE = _env.from_string("""\
+<!DOCTYPE html>
+<html lang="{{ lang }}" dir="{{ dir }}">
+<head>
+<meta charset="utf-8">
+<title>{{ title }}</title>
+{{ style }}
+</head>
+<body>
+<h1>{{ title }}</h1>
+<p class="meta">{{ count }}</p>
+<table>
+<tr>{% for column in columns %}<th>{{ column }}</th>{% endfor %}</tr>
+{% for entry in entries %}
+<tr><td>{{ entry.index }}</td><td><a href="{{ entry.href }}">{{ entry.name }}</a></td><td>{{ entry.village }}</td><td>{{ entry.damage }}</td></tr>
+{% endfor %}
+</table>
+</body>
+</html>
+""")
+
+
+def _display_name(record: BeneficiaryRecord) -> str:
+    """اسم المستفيد كما يظهر في النافذة المنبثقة"""
+    return ' '.join(part for part in (record.first_name, record.father_name, record.last_name) if part) or record.full_name or str(record.index)
+
+
+def dossier_filename(record: BeneficiaryRecord) -> str:
+    """اسم ملف المستفيد داخل الأرشيف"""
+    return f"{record.index}.html"
+
+
+def render_dossier(record: BeneficiaryRecord, costs: CostsSlice, photo_width: int = DOSSIER_PHOTO_WIDTH) -> Tuple[str, Dict[str, bytes]]:
+    """
+    بناء صفحة HTML لمستفيد واحد مع صورها
+
+    الصور نسخ مصغرة من مخزن الصور (تُولّد إن لم تكن موجودة) تُحفظ في مجلد
+    media بجانب الصفحات، والصورة المتعذرة تُستبدل برابط الصورة الأصلية.
+
+    Args:
+        record: سجل المستفيد
+        costs: (جدول عرض التكاليف، الإجمالي) أو None
+        photo_width: عرض النسخة المصغرة (أحد THUMBNAIL_SIZES)
+
+    Returns:
+        (نص HTML، قاموس {مسار الصورة في الأرشيف: محتوى WebP})
+    """
+    media = {}
+    photos = []
+    for image in get_record_images(record):
+        data = get_variant(image['url'], photo_width)
+        src = None
+        if data is not None:
+            src = f"media/{ImageStore.key_for(image['url'])}_{photo_width}.webp"
+            media[src] = data
+        photos.append({**image, 'src': src})
+
+    costs_table = None
+    total_cost = 0.0
+    if costs is not None:
+        display_df, total_cost = costs
+        costs_table = Markup(display_df.to_html(index=False, border=0))
+
+    html = DOSSIER_TEMPLATE.render(
+        lang=tm.get_current_language(),
+        dir='rtl' if tm.is_rtl() else 'ltr',
+        style=Markup(_STYLE),
+        name=_display_name(record),
+        index=record.index,
+        meta=[value for value in (record.governorate, record.district, record.village, record.damage_status) if value],
+        parts=[Markup(render_info_part(part, record)) for part in DOSSIER_PARTS],
+        photos=photos,
+        costs_table=costs_table,
+        total_cost=total_cost,
+        labels={
+            'photos': tm.t('modal.photos'),
+            'costs': tm.t('modal.costs_and_items'),
+            'total_cost': tm.t('modal.total_cost'),
+            'image_error': tm.t('modal.image_error'),
+            'no_data': tm.t('messages.no_data'),
+        },
+    )
+    return html, media
+
+
+def render_index(records: Sequence[BeneficiaryRecord]) -> str:
+    """
+    صفحة فهرس الأرشيف بروابط لملفات جميع المستفيدين
+
+    Args:
+        records: سجلات المستفيدين المصدّرة
+
+    Returns:
+        نص HTML
+    """
+    return INDEX_TEMPLATE.render(
+        lang=tm.get_current_language(),
+        dir='rtl' if tm.is_rtl() else 'ltr',
+        style=Markup(_STYLE),
+        title=tm.t('dossiers.index_title'),
+        count=tm.t('dossiers.count').format(count=len(records)),
+        columns=['#', tm.t('fields.full_name'), tm.t('fields.village'), tm.t('fields.damage_status')],
+        entries=[
+            {
+                'index': record.index,
+                'href': dossier_filename(record),
+                'name': _display_name(record),
+                'village': record.village or '',
+                'damage': record.damage_status or '',
+            }
+            for record in records
+        ],
+    )
+
+
+def _init_worker(language: str):
+    """تهيئة عملية البناء: لغة الترجمة (لا توجد جلسة Streamlit في العملية الفرعية)"""
+    st.session_state['language'] = language
+
+
+def _render_batch(batch: List[Tuple[BeneficiaryRecord, CostsSlice]], photo_width: int) -> List[Tuple[str, str, Dict[str, bytes]]]:
+    """بناء مجموعة ملفات في عملية فرعية: [(اسم الملف، HTML، الصور)]"""
+    results = []
+    for record, costs in batch:
+        html, media = render_dossier(record, costs, photo_width)
+        results.append((dossier_filename(record), html, media))
+    return results
+
+
+def _costs_slice(payload) -> CostsSlice:
+    """(جدول العرض، الإجمالي) من ناتج get_costs_payload"""
+    if payload is None:
+        return None
+    _, display_df, total_cost, _, _ = payload
+    return display_df, total_cost
+
+
+def export_dossiers(
+    records: Sequence[BeneficiaryRecord],
+    sub_items_df: pd.DataFrame,
+    path: Path,
+    data_version: str,
+    workers: int = DOSSIER_EXPORT_WORKERS,
+    chunk_size: int = DOSSIER_CHUNK_SIZE,
+    photo_width: int = DOSSIER_PHOTO_WIDTH,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Path:
+    """
+    كتابة ملفات المستفيدين وصورها وصفحة الفهرس في أرشيف ZIP
+
+    بيانات التكاليف تُقرأ في العملية الرئيسية من get_costs_payload (المخزنة
+    لكل منزل ولغة ومشتركة مع النافذة المنبثقة) وتُرسل مع السجل، والصور من
+    مخزن الصور على القرص المشترك بين العمليات. الصور مخزنة في الأرشيف دون
+    ضغط إضافي (WebP مضغوطة أصلاً)، وكل صورة مشتركة تُكتب مرة واحدة.
+
+    Args:
+        records: سجلات المستفيدين بترتيب الفهرس
+        sub_items_df: DataFrame البنود الفرعية
+        path: مسار ملف ZIP
+        data_version: إصدار ملف البيانات (مفتاح تخزين التكاليف)
+        workers: عدد العمليات (1: البناء في العملية الحالية)
+        chunk_size: عدد الملفات في كل مهمة مرسلة لعملية
+        photo_width: عرض صور الملفات (أحد THUMBNAIL_SIZES)
+        progress: دالة اختيارية progress(done, total)
+
+    Returns:
+        مسار ملف ZIP
+    """
+    language = tm.get_current_language()
+    tasks = [
+        (record, _costs_slice(get_costs_payload(data_version, record.index, language, sub_items_df)))
+        for record in records
+    ]
+    batches = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    done = 0
+    written = set()
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('index.html', render_index(records))
+
+        def write(results):
+            nonlocal done
+            for filename, html, media in results:
+                archive.writestr(filename, html)
+                for name, data in media.items():
+                    if name not in written:
+                        written.add(name)
+                        archive.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+                done += 1
+            if progress:
+                progress(done, len(tasks))
+
+        if workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                write(_render_batch(batch, photo_width))
+        else:
+            # spawn: لا تُنسخ خيوط الخادم (fork لعملية متعددة الخيوط غير آمن)
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(batches)),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(language,)
+            ) as pool:
+                futures = [pool.submit(_render_batch, batch, photo_width) for batch in batches]
+                for future in as_completed(futures):
+                    write(future.result())
+    return path
+
+
+def _remove_stale_bundles(max_age: float = DOSSIER_TEMP_MAX_AGE):
+    """حذف ملفات ZIP المؤقتة التي لم تُنزّل خلال max_age (جلسات أُغلقت قبل التنزيل)"""
+    cutoff = time.time() - max_age
+    for path in Path(tempfile.gettempdir()).glob('dossiers_*.zip'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            continue
+
+
+def create_dossier_bundle(
+    records: Sequence[BeneficiaryRecord],
+    sub_items_df: pd.DataFrame,
+    data_version: str,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Path:
+    """
+    export_dossiers إلى ملف ZIP مؤقت يُقرأ ويُحذف عند التنزيل (read_dossier_bundle)
+
+    الملفات المؤقتة التي تجاوزت DOSSIER_TEMP_MAX_AGE دون تنزيل تُحذف أولاً.
+
+    Args:
+        records: سجلات المستفيدين بترتيب الفهرس
+        sub_items_df: DataFrame البنود الفرعية
+        data_version: إصدار ملف البيانات
+        progress: دالة اختيارية progress(done, total)
+
+    Returns:
+        مسار الملف المكتوب
+    """
+    _remove_stale_bundles()
+    with tempfile.NamedTemporaryFile(suffix='.zip', prefix='dossiers_', delete=False) as f:
+        path = Path(f.name)
+    try:
+        return export_dossiers(records, sub_items_df, path, data_version, progress=progress)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+
+
+def read_dossier_bundle(path: str) -> bytes:
+    """
+    محتوى ملف ZIP لزر التنزيل (يُحذف الملف المؤقت بعد قراءته)
+
+    Args:
+        path: ناتج create_dossier_bundle
+
+    Returns:
+        محتوى الملف (فارغ إن حُذف الملف)
+    """
+    path = Path(path)
+    try:
+        return path.read_bytes()
+    except OSError:
+        return b''
+    finally:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,309 @@
+"""
+تصدير بيانات المنازل المفلترة إلى Excel و CSV و Parquet بكتابة متدفقة
+
+الصفوف تُقرأ من DataFrame الأصلي بمواضعها (ناتج get_filtered_positions) على
+دفعات من EXPORT_CHUNK_ROWS صف، وتُكتب كل دفعة ثم تُترك، فلا تُنشأ نسخة كاملة
+ثانية من البيانات المفلترة في الذاكرة. Excel عبر xlsxwriter بوضع
+constant_memory (كل صف يُكتب للقرص فور اكتماله)، و Parquet يتطلب pyarrow.
+"""
+import datetime
+import functools
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import xlsxwriter
+
+from config import EXPORT_CHUNK_ROWS
+from utils.i18n import tm
+from utils.records import normalize_value
+
+# الصيغ المتاحة: (امتداد الملف، نوع MIME)
+DATA_EXPORT_FORMATS = {
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def available_formats() -> List[str]:
+    """
+    الصيغ التي تتوفر مكتباتها (Parquet فقط مع pyarrow)
+
+    Returns:
+        مفاتيح من DATA_EXPORT_FORMATS
+    """
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return [fmt for fmt in DATA_EXPORT_FORMATS if fmt != 'parquet']
+    return list(DATA_EXPORT_FORMATS)
+
+
+def iter_frames(
+    df: pd.DataFrame,
+    positions: Optional[np.ndarray] = None,
+    columns: Optional[Sequence[str]] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    الصفوف والأعمدة المصدّرة على دفعات
+
+    كل دفعة تُقتطع بـ iloc للصفوف والأعمدة معاً، فلا يُنسخ إلا حجم الدفعة.
+
+    Args:
+        df: DataFrame المنازل (غير مفلتر)
+        positions: مواضع الصفوف المصدّرة بترتيبها (None: جميع الصفوف)
+        columns: الأعمدة المصدّرة بترتيبها (None: جميع الأعمدة)
+        chunk_rows: عدد الصفوف في كل دفعة
+
+    Yields:
+        DataFrame لكل دفعة
+    """
+    if positions is None:
+        positions = np.arange(len(df))
+    column_positions = df.columns.get_indexer(list(columns)) if columns else np.arange(len(df.columns))
+    for start in range(0, len(positions), chunk_rows):
+        yield df.iloc[positions[start:start + chunk_rows], column_positions]
+
+
+def _export_columns(df: pd.DataFrame, columns: Optional[Sequence[str]]) -> List[str]:
+    """أسماء الأعمدة المصدّرة"""
+    return list(columns) if columns else list(df.columns)
+
+
+def write_xlsx(
+    df: pd.DataFrame,
+    path: Path,
+    positions: Optional[np.ndarray] = None,
+    columns: Optional[Sequence[str]] = None,
+    right_to_left: bool = False
+):
+    """
+    كتابة ملف Excel صفاً صفاً بوضع constant_memory
+
+    النصوص تُكتب كنصوص دائماً (لا تُفسر "=..." كمعادلة ولا الروابط كارتباطات)،
+    والتواريخ بتنسيق تاريخ، والقيم الفارغة خلايا فارغة.
+
+    Args:
+        df: DataFrame المنازل
+        path: مسار الملف
+        positions: مواضع الصفوف المصدّرة
+        columns: الأعمدة المصدّرة
+        right_to_left: اتجاه الورقة من اليمين لليسار (العربية)
+    """
+    workbook = xlsxwriter.Workbook(str(path), {'constant_memory': True, 'strings_to_urls': False})
+    try:
+        worksheet = workbook.add_worksheet('data')
+        if right_to_left:
+            worksheet.right_to_left()
+        header_format = workbook.add_format({'bold': True, 'bg_color': '#F2F2F2'})
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm'})
+
+        worksheet.write_row(0, 0, _export_columns(df, columns), header_format)
+        worksheet.freeze_panes(1, 0)
+
+        row = 1
+        for chunk in iter_frames(df, positions, columns):
+            for values in chunk.itertuples(index=False, name=None):
+                for col, value in enumerate(values):
+                    value = normalize_value(value)
+                    if value is None:
+                        continue
+                    if isinstance(value, str):
+                        worksheet.write_string(row, col, value)
+                    elif isinstance(value, bool):
+                        worksheet.write_boolean(row, col, value)
+                    elif isinstance(value, datetime.datetime):
+                        worksheet.write_datetime(row, col, value.replace(tzinfo=None), datetime_format)
+                    elif isinstance(value, datetime.date):
+                        worksheet.write_datetime(row, col, value, date_format)
+                    elif isinstance(value, (int, float)):
+                        worksheet.write_number(row, col, value)
+                    else:
+                        worksheet.write_string(row, col, str(value))
+                row += 1
+    finally:
+        workbook.close()
+
+
+def write_csv(
+    df: pd.DataFrame,
+    path: Path,
+    positions: Optional[np.ndarray] = None,
+    columns: Optional[Sequence[str]] = None,
+    right_to_left: bool = False
+):
+    """
+    كتابة ملف CSV دفعة دفعة (BOM كي يقرأ Excel النص العربي بشكل صحيح)
+
+    Args:
+        df: DataFrame المنازل
+        path: مسار الملف
+        positions: مواضع الصفوف المصدّرة
+        columns: الأعمدة المصدّرة
+        right_to_left: غير مستخدم (للتوافق مع باقي الكُتّاب)
+    """
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        header = True
+        for chunk in iter_frames(df, positions, columns):
+            chunk.to_csv(f, header=header, index=False)
+            header = False
+        if header:
+            # الترويسة وحدها إن لم توجد صفوف
+            df.iloc[:0, df.columns.get_indexer(_export_columns(df, columns))].to_csv(f, index=False)
+
+
+def _parquet_ready(chunk: pd.DataFrame) -> pd.DataFrame:
+    """أعمدة object (نصوص مختلطة الأنواع) كنص، كي يبقى مخطط Parquet واحداً لكل الدفعات"""
+    objects = [column for column, dtype in chunk.dtypes.items() if dtype == object]
+    if not objects:
+        return chunk
+    return chunk.astype({column: 'string' for column in objects})
+
+
+def write_parquet(
+    df: pd.DataFrame,
+    path: Path,
+    positions: Optional[np.ndarray] = None,
+    columns: Optional[Sequence[str]] = None,
+    right_to_left: bool = False
+):
+    """
+    كتابة ملف Parquet بمجموعة صفوف (row group) لكل دفعة (يتطلب pyarrow)
+
+    Args:
+        df: DataFrame المنازل
+        path: مسار الملف
+        positions: مواضع الصفوف المصدّرة
+        columns: الأعمدة المصدّرة
+        right_to_left: غير مستخدم (للتوافق مع باقي الكُتّاب)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_frames(df, positions, columns):
+            table = pa.Table.from_pandas(_parquet_ready(chunk), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(str(path), table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is None:
+            # ملف بالمخطط فقط إن لم توجد صفوف
+            empty = df.iloc[:0, df.columns.get_indexer(_export_columns(df, columns))]
+            pq.write_table(pa.Table.from_pandas(_parquet_ready(empty), preserve_index=False), str(path))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+DATA_EXPORT_WRITERS = {
+    'xlsx': write_xlsx,
+    'csv': write_csv,
+    'parquet': write_parquet,
+}
+
+
+def write_data_export(
+    df: pd.DataFrame,
+    fmt: str,
+    positions: Optional[np.ndarray] = None,
+    columns: Optional[Sequence[str]] = None,
+    right_to_left: bool = False
+) -> Path:
+    """
+    كتابة التصدير إلى ملف مؤقت
+
+    Args:
+        df: DataFrame المنازل
+        fmt: الصيغة (xlsx، csv، parquet)
+        positions: مواضع الصفوف المصدّرة (None: جميع الصفوف)
+        columns: الأعمدة المصدّرة (None: جميع الأعمدة)
+        right_to_left: اتجاه ورقة Excel من اليمين لليسار
+
+    Returns:
+        مسار الملف المكتوب
+    """
+    extension, _ = DATA_EXPORT_FORMATS[fmt]
+    with tempfile.NamedTemporaryFile(suffix=f'.{extension}', prefix='houses_data_', delete=False) as f:
+        path = Path(f.name)
+    try:
+        DATA_EXPORT_WRITERS[fmt](df, path, positions, columns, right_to_left)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def read_data_export(
+    df: pd.DataFrame,
+    fmt: str,
+    positions: Optional[np.ndarray] = None,
+    columns: Optional[Sequence[str]] = None,
+    right_to_left: bool = False
+) -> bytes:
+    """
+    محتوى ملف التصدير لزر التنزيل (يُحذف الملف المؤقت بعد قراءته)
+
+    Args:
+        df: DataFrame المنازل
+        fmt: الصيغة (xlsx، csv، parquet)
+        positions: مواضع الصفوف المصدّرة
+        columns: الأعمدة المصدّرة
+        right_to_left: اتجاه ورقة Excel من اليمين لليسار
+
+    Returns:
+        محتوى الملف
+    """
+    path = write_data_export(df, fmt, positions, columns, right_to_left)
+    try:
+        return path.read_bytes()
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def create_data_export(df: pd.DataFrame, key: str, positions: Optional[np.ndarray] = None, file_stem: str = 'houses'):
+    """
+    أدوات تصدير النتائج الحالية: الصيغة، والأعمدة (اختياري)، وزر التنزيل
+
+    الملف يُكتب عند الضغط على زر التنزيل فقط (في خيط منفصل عن إعادة تشغيل
+    الصفحة)، لا مع كل تغيير في الفلاتر.
+
+    Args:
+        df: DataFrame المنازل
+        key: بادئة مفاتيح الأدوات
+        positions: مواضع الصفوف المصدّرة (None: جميع صفوف df)
+        file_stem: اسم الملف دون امتداد
+    """
+    count = len(df) if positions is None else len(positions)
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        fmt = st.selectbox(
+            tm.t('export.format'),
+            available_formats(),
+            format_func=lambda fmt: tm.t(f'export.format_{fmt}'),
+            key=f"{key}_format"
+        )
+    with col2:
+        columns = st.multiselect(
+            tm.t('export.columns'),
+            list(df.columns),
+            placeholder=tm.t('export.all_columns'),
+            key=f"{key}_columns"
+        )
+
+    extension, mime = DATA_EXPORT_FORMATS[fmt]
+    st.download_button(
+        f"⬇️ {tm.t('export.download')} ({count})",
+        data=functools.partial(read_data_export, df, fmt, positions, tuple(columns), tm.is_rtl()),
+        file_name=f"{file_stem}.{extension}",
+        mime=mime,
+        on_click='ignore',
+        use_container_width=True,
+        key=f"{key}_download"
+    )
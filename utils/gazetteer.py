@@ -0,0 +1,141 @@
+"""
+دليل جغرافي (Gazetteer) للقرى والنواحي مبني من إحداثيات المنازل
+"""
+from typing import List, Optional
+
+import pandas as pd
+import streamlit as st
+
+# مستويات الدليل بالترتيب من الأدق إلى الأعم: (عمود البيانات، اسم المستوى)
+GAZETTEER_LEVELS = [('القرية', 'village'), ('الناحية', 'subdistrict')]
+
+
+def build_gazetteer(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    حساب مركز ومستطيل كل قرية وناحية من المنازل ذات الإحداثيات الصحيحة
+
+    تُجمع المستويات في جدول طويل واحد ثم تُحسب جميع القيم بعملية groupby واحدة.
+    النقاط المفقودة أو المشكوك بها (gps_suspect) لا تدخل في الحساب.
+
+    Args:
+        df: DataFrame بيانات المنازل (بعد validate_gps)
+
+    Returns:
+        DataFrame بفهرس (level, name) وأعمدة lat, lon, south, west, north, east, count
+    """
+    valid = df['latitude'].notna() & df['longitude'].notna()
+    if 'gps_suspect' in df.columns:
+        valid &= ~df['gps_suspect'].astype(bool)
+    if 'gps_imputed' in df.columns:
+        valid &= df['gps_imputed'] == ''
+
+    frames = []
+    for column, level in GAZETTEER_LEVELS:
+        if column not in df.columns:
+            continue
+        values = df.loc[valid, column]
+        names = values.where(values.notna(), '').astype(str).str.strip()
+        frames.append(pd.DataFrame({
+            'level': level,
+            'name': names,
+            'lat': df.loc[valid, 'latitude'],
+            'lon': df.loc[valid, 'longitude'],
+        })[names != ''])
+
+    if not frames:
+        return pd.DataFrame(columns=['lat', 'lon', 'south', 'west', 'north', 'east', 'count'])
+
+    long_df = pd.concat(frames, ignore_index=True)
+    gazetteer = long_df.groupby(['level', 'name']).agg(
+        lat=('lat', 'mean'),
+        lon=('lon', 'mean'),
+        south=('lat', 'min'),
+        west=('lon', 'min'),
+        north=('lat', 'max'),
+        east=('lon', 'max'),
+        count=('lat', 'size'),
+    )
+    return gazetteer
+
+
+def impute_missing_coordinates(df: pd.DataFrame, gazetteer: pd.DataFrame) -> pd.DataFrame:
+    """
+    إعطاء المنازل بلا إحداثيات موقعاً تقريبياً من مركز قريتها (أو ناحيتها)
+
+    يُضاف العمود gps_imputed بقيمة 'village' أو 'subdistrict' للمواقع التقريبية
+    و'' للمواقع الحقيقية، ولا تُمس أعمدة GPS الأصلية.
+
+    Args:
+        df: DataFrame بيانات المنازل (بعد validate_gps)
+        gazetteer: ناتج build_gazetteer
+
+    Returns:
+        DataFrame مع الإحداثيات المستكملة
+    """
+    df['gps_imputed'] = ''
+    missing = df['latitude'].isna() | df['longitude'].isna()
+    if not missing.any() or gazetteer.empty:
+        return df
+
+    for column, level in GAZETTEER_LEVELS:
+        if column not in df.columns or level not in gazetteer.index.get_level_values('level'):
+            continue
+        todo = missing & (df['gps_imputed'] == '')
+        if not todo.any():
+            break
+
+        centroids = gazetteer.xs(level, level='level')
+        names = df.loc[todo, column].astype(str).str.strip()
+        lat = names.map(centroids['lat'])
+        lon = names.map(centroids['lon'])
+        found = lat.notna() & lon.notna()
+
+        rows = found[found].index
+        df.loc[rows, 'latitude'] = lat[found]
+        df.loc[rows, 'longitude'] = lon[found]
+        df.loc[rows, 'gps_imputed'] = level
+
+    return df
+
+
+def get_bounds_for(gazetteer: pd.DataFrame, df: pd.DataFrame, pad_deg: float = 0.002) -> Optional[List[List[float]]]:
+    """
+    المستطيل المحيط بقرى المنازل المعروضة من الدليل مباشرة (دون حساب من النقاط)
+
+    Args:
+        gazetteer: ناتج build_gazetteer
+        df: DataFrame المنازل المعروضة
+        pad_deg: هامش بالدرجات (يمنع التقريب الزائد لقرية بمنزل واحد)
+
+    Returns:
+        [[south, west], [north, east]] أو None
+    """
+    column, level = GAZETTEER_LEVELS[0]
+    if gazetteer.empty or column not in df.columns or level not in gazetteer.index.get_level_values('level'):
+        return None
+
+    villages = gazetteer.xs(level, level='level')
+    names = df[column].astype(str).str.strip().unique()
+    boxes = villages.loc[villages.index.intersection(names)]
+    if boxes.empty:
+        return None
+
+    return [
+        [float(boxes['south'].min()) - pad_deg, float(boxes['west'].min()) - pad_deg],
+        [float(boxes['north'].max()) + pad_deg, float(boxes['east'].max()) + pad_deg],
+    ]
+
+
+@st.cache_data(show_spinner=False)
+def get_gazetteer(data_version: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """
+    الدليل الجغرافي محسوباً مرة واحدة لكل إصدار من البيانات
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        _df: DataFrame المنازل الكامل (لا يدخل في مفتاح التخزين)
+
+    Returns:
+        ناتج build_gazetteer
+    """
+    return build_gazetteer(_df)
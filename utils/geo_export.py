@@ -0,0 +1,197 @@
+"""
+تصدير المنازل لأنظمة المعلومات الجغرافية (GeoJSON، KML، CSV) بكتابة متدفقة
+"""
+import csv
+import io
+import json
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+# حقول النافذة المنبثقة المصدّرة: (عمود البيانات، اسم الحقل في الملف)
+EXPORT_FIELDS: List[Tuple[str, str]] = [
+    ('_index', 'id'),
+    ('الاسم الكامل', 'name'),
+    ('المحافظة', 'governorate'),
+    ('المنطقة', 'area'),
+    ('القرية', 'village'),
+    ('حالة الضرر', 'damage_status'),
+    ('نوع المنزل', 'house_type'),
+    ('عدد أفراد الأسرة (بما فيهم مالك المنزل)', 'family_size'),
+    ('Grand Total', 'total_cost'),
+    ('Contractor', 'contractor'),
+    ('صورة الواجهة الأمامية للمنزل_URL', 'front_image'),
+    ('gps_imputed', 'gps_imputed'),
+    ('gps_suspect', 'gps_suspect'),
+    ('package', 'work_package'),
+    ('cost', 'sub_items_cost'),
+]
+
+# صيغ التصدير: (امتداد الملف، نوع MIME)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    'geojson': ('geojson', 'application/geo+json'),
+    'kml': ('kml', 'application/vnd.google-earth.kml+xml'),
+    'csv': ('csv', 'text/csv'),
+}
+
+
+def _clean(value):
+    """تحويل القيم إلى أنواع بايثون قابلة للتسلسل (NaN تصبح None)"""
+    if value is None:
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def iter_records(df: pd.DataFrame) -> Iterator[Tuple[float, float, Dict]]:
+    """
+    المرور على المنازل ذات الإحداثيات صفاً صفاً دون نسخ الجدول
+
+    Args:
+        df: DataFrame المنازل (ناتج filter_houses)
+
+    Yields:
+        (lat, lon, properties)
+    """
+    fields = [(column, key) for column, key in EXPORT_FIELDS if column in df.columns]
+    columns = ['latitude', 'longitude'] + [column for column, _ in fields]
+    for values in df[columns].itertuples(index=False, name=None):
+        lat, lon = values[0], values[1]
+        if pd.isna(lat) or pd.isna(lon):
+            continue
+        properties = {key: _clean(value) for (_, key), value in zip(fields, values[2:])}
+        yield float(lat), float(lon), properties
+
+
+def iter_geojson(df: pd.DataFrame) -> Iterator[str]:
+    """
+    كتابة FeatureCollection على أجزاء (Feature واحدة في كل جزء)
+
+    Args:
+        df: DataFrame المنازل
+
+    Yields:
+        أجزاء نص GeoJSON
+    """
+    yield '{"type": "FeatureCollection", "features": [\n'
+    separator = ''
+    for lat, lon, properties in iter_records(df):
+        feature = {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': properties,
+        }
+        yield separator + json.dumps(feature, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]}\n'
+
+
+def iter_kml(df: pd.DataFrame, document_name: str = 'Houses') -> Iterator[str]:
+    """
+    كتابة مستند KML على أجزاء (Placemark واحد في كل جزء)
+
+    Args:
+        df: DataFrame المنازل
+        document_name: اسم المستند
+
+    Yields:
+        أجزاء نص KML
+    """
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+        f'<Document><name>{escape(document_name)}</name>\n'
+    )
+    for lat, lon, properties in iter_records(df):
+        data = ''.join(
+            f'<Data name="{escape(key)}"><value>{escape("" if value is None else str(value))}</value></Data>'
+            for key, value in properties.items()
+        )
+        yield (
+            f'<Placemark><name>{escape(str(properties.get("name") or ""))}</name>'
+            f'<ExtendedData>{data}</ExtendedData>'
+            f'<Point><coordinates>{lon},{lat}</coordinates></Point></Placemark>\n'
+        )
+    yield '</Document>\n</kml>\n'
+
+
+def iter_csv(df: pd.DataFrame) -> Iterator[str]:
+    """
+    كتابة ملف CSV للنقاط على أجزاء (سطر واحد في كل جزء)
+
+    Args:
+        df: DataFrame المنازل
+
+    Yields:
+        أسطر CSV
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = ['latitude', 'longitude'] + [key for column, key in EXPORT_FIELDS if column in df.columns]
+    writer.writerow(header)
+    for lat, lon, properties in iter_records(df):
+        writer.writerow([lat, lon] + ['' if value is None else value for value in properties.values()])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # الترويسة وحدها إن لم توجد نقاط
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+EXPORT_WRITERS = {
+    'geojson': iter_geojson,
+    'kml': iter_kml,
+    'csv': iter_csv,
+}
+
+
+def write_export(df: pd.DataFrame, fmt: str) -> Path:
+    """
+    كتابة التصدير إلى ملف مؤقت جزءاً جزءاً
+
+    Args:
+        df: DataFrame المنازل
+        fmt: الصيغة (geojson، kml، csv)
+
+    Returns:
+        مسار الملف المكتوب
+    """
+    extension, _ = EXPORT_FORMATS[fmt]
+    # BOM لملفات CSV كي يقرأ Excel النص العربي بشكل صحيح
+    encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+    with tempfile.NamedTemporaryFile(
+        'w', encoding=encoding, newline='', suffix=f'.{extension}', prefix='houses_', delete=False
+    ) as f:
+        for chunk in EXPORT_WRITERS[fmt](df):
+            f.write(chunk)
+    return Path(f.name)
+
+
+def read_export(df: pd.DataFrame, fmt: str) -> bytes:
+    """
+    محتوى ملف التصدير لزر التنزيل (يُحذف الملف المؤقت بعد قراءته)
+
+    يُستدعى عند الضغط على زر التنزيل فقط (data قابلة للاستدعاء)، فلا تبقى
+    ملفات مؤقتة على القرص ولا يُكتب التصدير مع كل تغيير في الفلاتر.
+
+    Args:
+        df: DataFrame المنازل المفلترة
+        fmt: الصيغة (geojson، kml، csv)
+
+    Returns:
+        محتوى الملف
+    """
+    path = write_export(df, fmt)
+    try:
+        return path.read_bytes()
+    finally:
+        path.unlink(missing_ok=True)
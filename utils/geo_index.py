@@ -0,0 +1,348 @@
+"""
+فهرس جغرافي (Ball Tree بمسافة haversine) لاستعلامات القرب بين المنازل
+"""
+import heapq
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    حساب مسافة الدائرة العظمى بالمتر (تعمل على مصفوفات NumPy)
+
+    Args:
+        lat1, lon1: إحداثيات النقطة/النقاط الأولى بالدرجات
+        lat2, lon2: إحداثيات النقطة/النقاط الثانية بالدرجات
+
+    Returns:
+        المسافة بالمتر (رقم أو مصفوفة)
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def to_unit_vectors(lats, lons) -> np.ndarray:
+    """
+    تحويل إحداثيات (بالدرجات) إلى متجهات وحدة ثلاثية الأبعاد على الكرة
+
+    الزاوية بين متجهين هي مسافة الدائرة العظمى بالراديان، فيمكن حساب
+    المسافات بجداء نقطي واحد بدلاً من صيغة haversine الكاملة.
+    """
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_angles(points: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    الزوايا (بالراديان) بين متجهات الوحدة ومتجه الاستعلام
+
+    تُحسب من طول الوتر بدلاً من arccos(الجداء النقطي) للحفاظ على الدقة
+    في المسافات الصغيرة (بضعة أمتار).
+    """
+    chord = np.sqrt(((points - q) ** 2).sum(axis=1))
+    return 2.0 * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+class HouseBallTree:
+    """
+    شجرة Ball Tree فوق إحداثيات المنازل تُبنى مرة واحدة
+
+    كل عقدة تحمل مركزاً ونصف قطر زاوي يحيطان بجميع نقاطها، فيمكن استبعاد
+    العقدة كاملة عندما تكون (الزاوية إلى المركز - نصف القطر) أكبر من المطلوب.
+    النتائج تُعاد كمواقع صفوف (positions) في DataFrame المستخدم للبناء.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, positions: np.ndarray, leaf_size: int = 32):
+        """
+        Args:
+            lats: خطوط العرض بالدرجات
+            lons: خطوط الطول بالدرجات
+            positions: مواقع الصفوف المقابلة في DataFrame الأصلي
+            leaf_size: الحد الأقصى لعدد النقاط في الورقة
+        """
+        self.leaf_size = leaf_size
+        points = to_unit_vectors(lats, lons)
+        self._order = np.arange(len(points))
+
+        centers, radius, start, end, left, right = [], [], [], [], [], []
+
+        def build(lo: int, hi: int) -> int:
+            idx = self._order[lo:hi]
+            pts = points[idx]
+            center = pts.mean(axis=0)
+            center /= np.linalg.norm(center)
+            node = len(start)
+            centers.append(center)
+            radius.append(float(chord_angles(pts, center).max()))
+            start.append(lo)
+            end.append(hi)
+            left.append(-1)
+            right.append(-1)
+
+            if hi - lo <= leaf_size:
+                return node
+
+            # التقسيم على البعد الأكثر انتشاراً
+            axis = int(np.argmax(np.ptp(pts, axis=0)))
+            half = (hi - lo) // 2
+            self._order[lo:hi] = idx[np.argpartition(pts[:, axis], half)]
+            left[node] = build(lo, lo + half)
+            right[node] = build(lo + half, hi)
+            return node
+
+        if len(points):
+            build(0, len(points))
+
+        # إعادة ترتيب النقاط حسب ترتيب الشجرة لتكون كل ورقة شريحة متصلة
+        self._points = points[self._order]
+        self._positions = np.asarray(positions)[self._order]
+        self._centers = np.array(centers).reshape(-1, 3)
+        self._radius = radius
+        self._start = start
+        self._end = end
+        self._left = left
+        self._right = right
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _node_angles(self, q: np.ndarray) -> list:
+        """الزوايا من نقطة الاستعلام إلى مراكز جميع العقد (عملية متجهة واحدة)"""
+        return chord_angles(self._centers, q).tolist()
+
+    def query_radius(
+        self,
+        lat: float,
+        lon: float,
+        radius_m: float,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        إيجاد جميع المنازل ضمن نصف قطر محدد
+
+        Args:
+            lat, lon: نقطة الاستعلام بالدرجات
+            radius_m: نصف القطر بالمتر
+            mask: مصفوفة منطقية اختيارية (بترتيب الصفوف الأصلي) لتقييد النتائج
+
+        Returns:
+            (مواقع الصفوف، المسافات بالمتر) مرتبة تصاعدياً حسب المسافة
+        """
+        if not len(self):
+            return np.array([], dtype=int), np.array([])
+
+        q = to_unit_vectors([lat], [lon])[0]
+        angle = radius_m / EARTH_RADIUS_M
+        node_angles = self._node_angles(q)
+
+        hits_pos, hits_ang = [], []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if node_angles[node] - self._radius[node] > angle:
+                continue
+
+            left = self._left[node]
+            if left != -1:
+                stack.append(left)
+                stack.append(self._right[node])
+                continue
+
+            s, e = self._start[node], self._end[node]
+            angles = chord_angles(self._points[s:e], q)
+            keep = angles <= angle
+            if mask is not None:
+                keep &= mask[self._positions[s:e]]
+            if keep.any():
+                hits_pos.append(self._positions[s:e][keep])
+                hits_ang.append(angles[keep])
+
+        if not hits_pos:
+            return np.array([], dtype=int), np.array([])
+
+        positions = np.concatenate(hits_pos)
+        distances = np.concatenate(hits_ang) * EARTH_RADIUS_M
+        order = np.argsort(distances, kind='stable')
+        return positions[order], distances[order]
+
+    def query_nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 1,
+        mask: Optional[np.ndarray] = None,
+        exclude: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        إيجاد أقرب k منازل إلى نقطة
+
+        Args:
+            lat, lon: نقطة الاستعلام بالدرجات
+            k: عدد النتائج المطلوبة
+            mask: مصفوفة منطقية اختيارية (بترتيب الصفوف الأصلي) لتقييد النتائج
+            exclude: موقع صف يُستبعد من النتائج (مثل المنزل نفسه)
+
+        Returns:
+            (مواقع الصفوف، المسافات بالمتر) مرتبة تصاعدياً حسب المسافة
+        """
+        if not len(self) or k <= 0:
+            return np.array([], dtype=int), np.array([])
+
+        q = to_unit_vectors([lat], [lon])[0]
+        node_angles = self._node_angles(q)
+
+        # best: كومة عظمى (بإشارة سالبة) لأفضل k نتائج حتى الآن
+        best: List[Tuple[float, int]] = []
+        frontier = [(0.0, 0)]
+        while frontier:
+            bound, node = heapq.heappop(frontier)
+            if len(best) == k and bound > -best[0][0]:
+                break
+
+            left = self._left[node]
+            if left != -1:
+                for child in (left, self._right[node]):
+                    heapq.heappush(frontier, (max(node_angles[child] - self._radius[child], 0.0), child))
+                continue
+
+            s, e = self._start[node], self._end[node]
+            positions = self._positions[s:e]
+            valid = np.ones(e - s, dtype=bool)
+            if mask is not None:
+                valid &= mask[positions]
+            if exclude is not None:
+                valid &= positions != exclude
+            if not valid.any():
+                continue
+
+            angles = chord_angles(self._points[s:e][valid], q)
+            for a, pos in zip(angles.tolist(), positions[valid].tolist()):
+                if len(best) < k:
+                    heapq.heappush(best, (-a, pos))
+                elif a < -best[0][0]:
+                    heapq.heapreplace(best, (-a, pos))
+
+        best.sort(key=lambda item: -item[0])
+        return (
+            np.array([pos for _, pos in best], dtype=int),
+            np.array([-a * EARTH_RADIUS_M for a, _ in best])
+        )
+
+
+def build_house_index(df: pd.DataFrame) -> HouseBallTree:
+    """
+    بناء الفهرس الجغرافي من DataFrame المنازل (يتجاهل المنازل بلا إحداثيات حقيقية)
+
+    Args:
+        df: DataFrame بيانات المنازل (يحتوي latitude و longitude)
+
+    Returns:
+        HouseBallTree
+    """
+    lats = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=float)
+    lons = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=float)
+    valid = ~(np.isnan(lats) | np.isnan(lons))
+    # المواقع التقريبية (مراكز القرى) لا تصلح لاستعلامات المسافة
+    if 'gps_imputed' in df.columns:
+        valid &= (df['gps_imputed'] == '').to_numpy()
+    positions = np.flatnonzero(valid)
+    return HouseBallTree(lats[valid], lons[valid], positions)
+
+
+@st.cache_resource(show_spinner=False)
+def get_house_index(data_version: str, _df: pd.DataFrame) -> HouseBallTree:
+    """
+    الفهرس الجغرافي للمنازل مبنياً مرة واحدة لكل إصدار من البيانات
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        _df: DataFrame المنازل الكامل (لا يدخل في مفتاح التخزين)
+
+    Returns:
+        HouseBallTree
+    """
+    return build_house_index(_df)
+
+
+def nearby_houses(
+    df: pd.DataFrame,
+    index: HouseBallTree,
+    position: int,
+    radius_m: float,
+    mask: Optional[np.ndarray] = None
+) -> pd.DataFrame:
+    """
+    المنازل الواقعة ضمن نصف قطر حول منزل معين (باستثنائه)
+
+    Args:
+        df: DataFrame المنازل المستخدم لبناء الفهرس
+        index: الفهرس الجغرافي
+        position: موقع صف المنزل المرجعي في df
+        radius_m: نصف القطر بالمتر
+        mask: مصفوفة منطقية اختيارية لتقييد النتائج
+
+    Returns:
+        DataFrame بالمنازل القريبة مع عمود distance_m مرتبة حسب المسافة
+    """
+    row = df.iloc[position]
+    lat, lon = get_row_coordinates(row)
+    if lat is None or row.get('gps_imputed', ''):
+        return df.iloc[0:0].assign(distance_m=[])
+
+    positions, distances = index.query_radius(lat, lon, radius_m, mask=mask)
+    keep = positions != position
+    return df.iloc[positions[keep]].assign(distance_m=distances[keep].round(0))
+
+
+def nearest_house(
+    df: pd.DataFrame,
+    index: HouseBallTree,
+    position: int,
+    mask: Optional[np.ndarray] = None
+) -> Optional[Tuple[pd.Series, float]]:
+    """
+    أقرب منزل إلى منزل معين (باستثنائه)
+
+    Args:
+        df: DataFrame المنازل المستخدم لبناء الفهرس
+        index: الفهرس الجغرافي
+        position: موقع صف المنزل المرجعي في df
+        mask: مصفوفة منطقية اختيارية لتقييد المرشحين
+
+    Returns:
+        (صف المنزل، المسافة بالمتر) أو None
+    """
+    row = df.iloc[position]
+    lat, lon = get_row_coordinates(row)
+    if lat is None or row.get('gps_imputed', ''):
+        return None
+
+    positions, distances = index.query_nearest(lat, lon, k=1, mask=mask, exclude=position)
+    if not len(positions):
+        return None
+    return df.iloc[positions[0]], float(distances[0])
+
+
+def get_row_coordinates(row: pd.Series) -> Tuple[Optional[float], Optional[float]]:
+    """
+    استخراج الإحداثيات الرقمية من صف منزل
+
+    Returns:
+        (lat, lon) أو (None, None) إذا لم تكن متوفرة
+    """
+    lat = pd.to_numeric(row.get('latitude'), errors='coerce')
+    lon = pd.to_numeric(row.get('longitude'), errors='coerce')
+    if pd.isna(lat) or pd.isna(lon):
+        return None, None
+    return float(lat), float(lon)
@@ -0,0 +1,110 @@
+"""
+عميل HTTP مشترك: اتصالات دائمة (keep-alive) مع إعادة المحاولة والتراجع
+"""
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+from urllib3.exceptions import ReadTimeoutError
+
+from config import HTTP_POOL_SIZE, HTTP_RETRY_ATTEMPTS, HTTP_RETRY_BACKOFF, HTTP_USER_AGENT, HTTP_HOST_COOLDOWN
+
+# حالات الخادم المؤقتة التي تستحق إعادة المحاولة
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# الخوادم التي تعذر الوصول إليها: {host: وقت انتهاء فترة التوقف}
+_unreachable_hosts: Dict[str, float] = {}
+_hosts_lock = threading.Lock()
+
+
+class RetryableHTTPError(requests.HTTPError):
+    """استجابة بحالة مؤقتة (RETRY_STATUSES) تُعاد محاولتها"""
+
+
+class HostUnreachableError(requests.ConnectionError):
+    """الخادم في فترة توقف بعد فشل الاتصال به (لا يُرسل الطلب)"""
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session() -> requests.Session:
+    """
+    جلسة requests مشتركة بين جميع الجلسات والخيوط
+
+    مجمّع الاتصالات يعيد استخدام اتصالات TCP/TLS المفتوحة لكل خادم بدلاً من
+    مصافحة جديدة مع كل صورة. الجلسة آمنة للاستخدام المتزامن في طلبات GET.
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = HTTP_USER_AGENT
+    return session
+
+
+@retry(
+    retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, RetryableHTTPError)),
+    stop=stop_after_attempt(HTTP_RETRY_ATTEMPTS),
+    wait=wait_exponential(multiplier=HTTP_RETRY_BACKOFF, max=10),
+    reraise=True,
+)
+def _get_with_retry(url: str, timeout: float, headers: Optional[Dict[str, str]]) -> requests.Response:
+    response = get_http_session().get(url, timeout=timeout, headers=headers)
+    if response.status_code in RETRY_STATUSES:
+        raise RetryableHTTPError(f"{response.status_code} for {url}", response=response)
+    return response
+
+
+def _is_connect_failure(exc: requests.RequestException) -> bool:
+    """
+    التحقق من أن الخطأ فشل في الوصول إلى الخادم، لا بطء في استجابة بدأت
+
+    مهلة القراءة (ReadTimeout، أو ConnectionError تلف ReadTimeoutError عند
+    قراءة المحتوى) تخص الطلب نفسه، مثل صورة كبيرة على اتصال بطيء.
+    """
+    if isinstance(exc, requests.ReadTimeout):
+        return False
+    if not isinstance(exc, requests.ConnectionError):
+        return False
+    return not (exc.args and isinstance(exc.args[0], ReadTimeoutError))
+
+
+def http_get(url: str, timeout: float, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    """
+    طلب GET عبر الجلسة المشتركة مع إعادة المحاولة عند أخطاء الشبكة والحالات المؤقتة
+
+    إذا فشل الاتصال بخادم بعد جميع المحاولات يُعلّم متوقفاً لمدة
+    HTTP_HOST_COOLDOWN، وتفشل طلباته خلالها فوراً (HostUnreachableError)
+    بدلاً من انتظار المهلة لكل صورة عند انقطاع الشبكة. مهلة القراءة لا تُوقف
+    الخادم، فصورة كبيرة بطيئة لا تُفشل باقي صوره.
+    لا تُرفع أخطاء الحالات الأخرى (مثل 304 أو 404)؛ يقرر المستدعي ما يفعله بها.
+
+    Args:
+        url: الرابط
+        timeout: المهلة بالثواني
+        headers: ترويسات إضافية (مثل If-None-Match)
+
+    Returns:
+        الاستجابة
+    """
+    host = urlsplit(url).netloc
+    with _hosts_lock:
+        down_until = _unreachable_hosts.get(host, 0)
+    if time.time() < down_until:
+        raise HostUnreachableError(f"{host} unreachable, retrying after cooldown")
+
+    try:
+        return _get_with_retry(url, timeout, headers)
+    except (requests.ConnectionError, requests.Timeout) as exc:
+        if _is_connect_failure(exc):
+            with _hosts_lock:
+                _unreachable_hosts[host] = time.time() + HTTP_HOST_COOLDOWN
+        raise
@@ -0,0 +1,395 @@
+"""
+مخزن الصور على القرص: عنونة بالمحتوى (بصمة الرابط) مع حد للحجم وإزالة LRU
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import requests
+import streamlit as st
+
+from config import (
+    IMAGE_CACHE_DIR,
+    IMAGE_VARIANTS_DIR,
+    MEDIA_URL_PREFIX,
+    IMAGE_CACHE_MAX_BYTES,
+    IMAGE_FETCH_TIMEOUT,
+    IMAGE_PREFETCH_WORKERS,
+    IMAGE_REVALIDATE_AFTER,
+)
+from utils.http_client import http_get
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+class ImageStore:
+    """
+    مخزن صور على القرص مفتاحه بصمة SHA-256 للرابط ({root}/ab/abcdef...).
+
+    يُستخدم وقت التعديل (mtime) كوقت آخر استخدام، وعند تجاوز الحجم الأقصى
+    تُحذف الصور الأقدم استخداماً. يُحسب الحجم الإجمالي مرة واحدة عند أول
+    استخدام ثم يُحدّث مع كل إضافة، فلا يُمسح المجلد إلا عند الإزالة.
+
+    بجانب كل صورة ملف {key}.meta بترويسات ETag و Last-Modified ووقت آخر تحقق؛
+    بعد revalidate_after ثانية يُرسل طلب شرطي فلا يكلف التحقق إلا استجابة 304.
+
+    الصور الأصلية وملفات .meta في root خارج static/ (لا يصل إليها إلا التطبيق)،
+    والنسخ المصغرة (.webp) وحدها في variants_root داخل static/ فتُخدَّم مباشرة
+    من Streamlit (Tornado StaticFileHandler): ETag واستجابة 304، و Cache-Control
+    لعشر سنوات عند وجود المعامل ?v= في الرابط (بصمة محتوى الصورة الأصلية).
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        variants_root: Optional[str] = None,
+        max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+        revalidate_after: float = IMAGE_REVALIDATE_AFTER
+    ):
+        """
+        Args:
+            root: مجلد الصور الأصلية (افتراضياً IMAGE_CACHE_DIR داخل المشروع)
+            variants_root: مجلد النسخ المصغرة المخدومة (افتراضياً IMAGE_VARIANTS_DIR)
+            max_bytes: الحجم الأقصى للمخزن بالبايت
+            revalidate_after: ثوانٍ قبل إعادة التحقق من الصورة لدى الخادم
+        """
+        self.root = Path(root) if root else PROJECT_ROOT / IMAGE_CACHE_DIR
+        self.variants_root = Path(variants_root) if variants_root else PROJECT_ROOT / IMAGE_VARIANTS_DIR
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.url_prefix = MEDIA_URL_PREFIX
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        """مفتاح الصورة: بصمة SHA-256 للرابط"""
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        """مسار ملف الصورة (مجلد فرعي بأول حرفين لتجنب المجلدات الضخمة)"""
+        return self.root / key[:2] / key
+
+    def has(self, url: str) -> bool:
+        """التحقق من وجود الصورة في المخزن"""
+        return self.path_for(self.key_for(url)).is_file()
+
+    def get(self, url: str) -> Optional[bytes]:
+        """قراءة صورة وتحديث وقت استخدامها"""
+        path = self.path_for(self.key_for(url))
+        try:
+            data = path.read_bytes()
+            os.utime(path, None)
+        except OSError:
+            return None
+        return data
+
+    def variant_path(self, url: str, width: int) -> Path:
+        """مسار نسخة مصغرة من الصورة بعرض width ({key}_{width}.webp)"""
+        key = self.key_for(url)
+        return self.variants_root / key[:2] / f"{key}_{width}.webp"
+
+    def touch_variant(self, url: str, width: int):
+        """
+        تحديث وقت استخدام نسخة مصغرة دون قراءتها
+
+        طلبات المتصفح للنسخ المخدومة من static/ لا تمر ببايثون، لذلك يُحدّث
+        الوقت عند تسليم رابط النسخة أو مسارها للصفحة.
+        """
+        try:
+            os.utime(self.variant_path(url, width), None)
+        except OSError:
+            pass
+
+    def variant_url(self, url: str, width: int) -> str:
+        """
+        رابط النسخة المصغرة عبر خادم الملفات الثابتة (ويُحدّث وقت استخدامها)
+
+        المعامل v بصمة محتوى الصورة الأصلية، فيتغير الرابط عند تغير الصورة
+        ويبقى ثابتاً (قابلاً للتخزين الطويل في المتصفح) ما دامت كما هي.
+        """
+        self.touch_variant(url, width)
+        key = self.key_for(url)
+        version = self.read_meta(url).get('sha', '0')
+        return f"{self.url_prefix}/{key[:2]}/{key}_{width}.webp?v={version}"
+
+    def get_variant(self, url: str, width: int) -> Optional[bytes]:
+        """قراءة نسخة مصغرة وتحديث وقت استخدامها"""
+        path = self.variant_path(url, width)
+        try:
+            data = path.read_bytes()
+            os.utime(path, None)
+        except OSError:
+            return None
+        return data
+
+    def put_variant(self, url: str, width: int, data: bytes):
+        """حفظ نسخة مصغرة بشكل ذري"""
+        path = self.variant_path(url, width)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - replaced
+
+    def meta_path(self, key: str) -> Path:
+        """مسار ملف بيانات التحقق للصورة"""
+        return self.path_for(key).with_suffix('.meta')
+
+    def read_meta(self, url: str) -> Dict:
+        """بيانات التحقق (etag، last_modified، checked) أو قاموس فارغ"""
+        try:
+            return json.loads(self.meta_path(self.key_for(url)).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def write_meta(self, url: str, meta: Dict):
+        """حفظ بيانات التحقق للصورة بشكل ذري"""
+        path = self.meta_path(self.key_for(url))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(tmp, path)
+
+    def is_fresh(self, url: str) -> bool:
+        """التحقق من أن الصورة فُحصت لدى الخادم خلال revalidate_after"""
+        return time.time() - self.read_meta(url).get('checked', 0) < self.revalidate_after
+
+    def put(self, url: str, data: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        حفظ صورة بشكل ذري (كتابة ملف مؤقت ثم إعادة تسمية) ثم الإزالة عند تجاوز الحجم
+
+        Args:
+            url: رابط الصورة
+            data: محتوى الصورة كما نُزّل
+            etag: ترويسة ETag من الخادم
+            last_modified: ترويسة Last-Modified من الخادم
+        """
+        path = self.path_for(self.key_for(url))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        # حجم النسخة السابقة (عند الاستبدال) يُطرح من الحجم الإجمالي
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        self.write_meta(url, {
+            'etag': etag,
+            'last_modified': last_modified,
+            'checked': time.time(),
+            'sha': hashlib.sha256(data).hexdigest()[:12],
+        })
+        # النسخ المصغرة للمحتوى السابق لم تعد صالحة
+        for variant in (self.variants_root / path.parent.name).glob(f"{path.name}_*.webp"):
+            try:
+                replaced += variant.stat().st_size
+                variant.unlink()
+            except OSError:
+                continue
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def fetch(self, url: str, timeout: float = IMAGE_FETCH_TIMEOUT) -> bytes:
+        """
+        محتوى الصورة من المخزن، أو تنزيلها وحفظها إن لم تكن موجودة
+
+        الصورة المخزنة التي مضى على آخر تحقق منها revalidate_after تُفحص بطلب
+        شرطي (If-None-Match / If-Modified-Since): 304 يجدد وقت التحقق فقط، و200
+        يستبدل الصورة. إن تعذر الاتصال بالخادم تُعاد النسخة المخزنة.
+        الطلبات المتزامنة للرابط نفسه تنتظر تنزيلاً واحداً. أخطاء التنزيل
+        (requests) لصورة غير مخزنة تُمرر للمستدعي.
+
+        Args:
+            url: رابط الصورة
+            timeout: مهلة التنزيل بالثواني
+
+        Returns:
+            محتوى الصورة
+        """
+        data = self.get(url)
+        if data is not None and self.is_fresh(url):
+            return data
+
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        try:
+            with url_lock:
+                data = self.get(url)
+                if data is not None and self.is_fresh(url):
+                    return data
+                return self._download(url, data, timeout)
+        finally:
+            with self._lock:
+                self._url_locks.pop(url, None)
+
+    def _download(self, url: str, cached: Optional[bytes], timeout: float) -> bytes:
+        """تنزيل الصورة (أو التحقق الشرطي من النسخة المخزنة cached)"""
+        meta = self.read_meta(url) if cached is not None else {}
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = http_get(url, timeout=timeout, headers=headers or None)
+            if response.status_code == 304 and cached is not None:
+                self.write_meta(url, {**meta, 'checked': time.time()})
+                return cached
+            response.raise_for_status()
+        except requests.RequestException:
+            if cached is not None:
+                return cached
+            raise
+
+        data = response.content
+        self.put(url, data, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return data
+
+    def _entries(self):
+        """(mtime, size, path) لكل صورة أصلية ونسخة مصغرة مخزنة"""
+        entries = []
+        for root in (self.root, self.variants_root):
+            if not root.is_dir():
+                continue
+            for p in root.glob('??/*'):
+                if p.suffix in ('.tmp', '.meta'):
+                    continue
+                try:
+                    st_ = p.stat()
+                except OSError:
+                    continue
+                entries.append((st_.st_mtime, st_.st_size, p))
+        return entries
+
+    def _has_variants(self, path: Path) -> bool:
+        """التحقق من وجود نسخ مصغرة للصورة الأصلية في path"""
+        return next((self.variants_root / path.parent.name).glob(f"{path.name}_*.webp"), None) is not None
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def size_bytes(self) -> int:
+        """الحجم الإجمالي للصور المخزنة"""
+        with self._lock:
+            self._size = self._scan_size()
+            return self._size
+
+    def evict(self) -> int:
+        """
+        حذف الصور الأقدم استخداماً حتى يعود الحجم إلى 90% من الحد الأقصى
+
+        الهامش يمنع تكرار المسح مع كل صورة جديدة بعد امتلاء المخزن.
+        الصورة الأصلية وملف .meta الخاص بها يبقيان ما دامت لها نسخ مصغرة
+        (بصمة ?v= في روابط النسخ تُقرأ من .meta)، فوقت استخدامها هو أحدث
+        وقت بينها وبين نسخها، وتأتي بعد نسخها في ترتيب الحذف.
+
+        Returns:
+            عدد الصور المحذوفة
+        """
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+
+            # أحدث استخدام لنسخ كل صورة ({key}_{width}.webp)
+            variants_used: Dict[str, float] = {}
+            for mtime, _, p in entries:
+                if p.parent.parent == self.variants_root:
+                    key = p.name.split('_', 1)[0]
+                    variants_used[key] = max(mtime, variants_used.get(key, 0))
+
+            def order(entry):
+                mtime, _, p = entry
+                if p.parent.parent == self.variants_root:
+                    return (mtime, 0)
+                return (max(mtime, variants_used.get(p.name, 0)), 1)
+
+            removed = 0
+            entries.sort(key=order)
+            for _, size, p in entries:
+                if total <= target:
+                    break
+                original = p.parent.parent == self.root
+                if original and self._has_variants(p):
+                    continue
+                try:
+                    p.unlink()
+                    if original:
+                        self.meta_path(p.name).unlink(missing_ok=True)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._size = total
+        return removed
+
+
+@st.cache_resource(show_spinner=False)
+def get_image_store() -> ImageStore:
+    """مخزن الصور المشترك بين جميع الجلسات"""
+    return ImageStore()
+
+
+def prefetch_images(
+    urls: Iterable[str],
+    max_workers: int = IMAGE_PREFETCH_WORKERS,
+    timeout: float = IMAGE_FETCH_TIMEOUT
+) -> Dict[str, Optional[bytes]]:
+    """
+    تحميل مجموعة صور (معرض أو صور منزل) بالتوازي عبر مخزن الصور
+
+    الصور الموجودة في المخزن (والمتحقق منها حديثاً) تُقرأ مباشرة، والباقي يُنزّل بخيوط متوازية بحد
+    أقصى max_workers، فيصبح زمن المعرض زمن أبطأ صورة واحدة.
+
+    Args:
+        urls: روابط الصور (تُتجاهل القيم الفارغة والمكررة)
+        max_workers: الحد الأقصى للتنزيلات المتزامنة
+        timeout: مهلة تنزيل كل صورة بالثواني
+
+    Returns:
+        قاموس {الرابط: المحتوى أو None عند الفشل}
+    """
+    store = get_image_store()
+    unique = list(dict.fromkeys(url for url in urls if url))
+    results = {}
+    missing = []
+    for url in unique:
+        data = store.get(url)
+        if data is None or not store.is_fresh(url):
+            missing.append(url)
+        else:
+            results[url] = data
+
+    if missing:
+        def fetch(url):
+            try:
+                return store.fetch(url, timeout)
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            results.update(zip(missing, pool.map(fetch, missing)))
+
+    return results
@@ -3,16 +3,19 @@
 """
 import streamlit as st
 from PIL import Image
-import requests
 from io import BytesIO
 from typing import Optional
 
+from utils.image_store import get_image_store, prefetch_images
+
 
-@st.cache_data(show_spinner=False)
 def load_image_from_url(url: str, max_width: int = 800) -> Optional[Image.Image]:
     """
     تحميل صورة من URL مع تصغير تلقائي
     
+    الصورة الأصلية تُحفظ في مخزن الصور على القرص (get_image_store) فلا تُنزّل
+    إلا مرة واحدة، ويُفك ترميزها عند كل طلب بدلاً من إبقاء الصور في الذاكرة.
+    
     Args:
         url: رابط الصورة
         max_width: العرض الأقصى بالبكسل
@@ -21,12 +24,11 @@ def load_image_from_url(url: str, max_width: int = 800) -> Optional[Image.Image]
         كائن PIL Image أو None عند الفشل
     """
     try:
-        # تحميل الصورة
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        # تحميل الصورة (من المخزن أو من الرابط)
+        data = get_image_store().fetch(url)
         
         # فتح الصورة
-        img = Image.open(BytesIO(response.content))
+        img = Image.open(BytesIO(data))
         
         # تصغير الصورة إذا كانت أكبر من الحد الأقصى
         if img.width > max_width:
@@ -82,6 +84,10 @@ def create_image_gallery(image_urls: list, captions: list = None, columns: int =
     if captions is None:
         captions = [f"صورة {i+1}" for i in range(len(image_urls))]
     
+    # تحميل جميع صور المعرض بالتوازي قبل العرض (العرض بعدها يقرأ من المخزن)
+    with st.spinner("جاري تحميل الصور..."):
+        prefetch_images(image_urls)
+    
     # إنشاء صفوف من الأعمدة
     for i in range(0, len(image_urls), columns):
         cols = st.columns(columns)
@@ -98,7 +104,6 @@ def create_image_gallery(image_urls: list, captions: list = None, columns: int =
                     )
 
 
-@st.cache_data(show_spinner=False)
 def get_image_thumbnail(url: str, size: tuple = (200, 200)) -> Optional[Image.Image]:
     """
     الحصول على صورة مصغرة (thumbnail)
@@ -111,10 +116,9 @@ def get_image_thumbnail(url: str, size: tuple = (200, 200)) -> Optional[Image.Im
         كائن PIL Image أو None
     """
     try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
+        data = get_image_store().fetch(url, timeout=5)
         
-        img = Image.open(BytesIO(response.content))
+        img = Image.open(BytesIO(data))
         img.thumbnail(size, Image.Resampling.LANCZOS)
         
         return img
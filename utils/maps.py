@@ -1,13 +1,23 @@
 """
 وحدة الخرائط التفاعلية
 """
+import json
+
+import branca
+from branca.element import MacroElement, Template
 import folium
 from folium import plugins
 import pandas as pd
-from config import DAMAGE_STATUS, SUCCESS_GREEN, WARNING_YELLOW, DANGER_RED
+import streamlit as st
+from config import DAMAGE_STATUS, SUCCESS_GREEN, WARNING_YELLOW, DANGER_RED, MAP_CACHE_MAX_ENTRIES, MAP_CACHE_TTL
+from utils.tiles import get_basemap
+from utils.boundaries import get_boundaries, get_area_statistics
+from utils.clustering import convex_hull
+from utils.thumbnails import get_variant_urls, pick_variant, variant_src
+from utils.records import build_records
 
 
-def create_houses_map(df, tm=None, center=None, zoom=11):
+def create_houses_map(df, tm=None, center=None, zoom=11, bounds=None, show_markers=True):
     """
     إنشاء خريطة تفاعلية لمواقع المنازل
     
@@ -16,11 +26,19 @@ def create_houses_map(df, tm=None, center=None, zoom=11):
         tm: Translation Manager للترجمات
         center: مركز الخريطة [lat, lon]
         zoom: مستوى التقريب
+        bounds: المستطيل المحيط [[south, west], [north, east]] للتقريب التلقائي (من الدليل الجغرافي)
+        show_markers: رسم نقاط المنازل (تُعطّل عند عرض الخط الزمني)
         
     Returns:
         Folium map object
     """
     # تحديد المركز التلقائي إذا لم يتم تحديده
+    if center is None and bounds is not None:
+        center = [
+            (bounds[0][0] + bounds[1][0]) / 2,
+            (bounds[0][1] + bounds[1][1]) / 2
+        ]
+    
     if center is None:
         valid_coords = df[df['latitude'].notna() & df['longitude'].notna()]
         if len(valid_coords) > 0:
@@ -31,41 +49,78 @@ def create_houses_map(df, tm=None, center=None, zoom=11):
         else:
             center = [33.5138, 36.2765]  # دمشق
     
-    # إنشاء الخريطة
+    # منطقة الخريطة: تُحدّث أوقات استخدام البلاطات المحلية داخلها
+    if bounds is not None:
+        view_bbox = (bounds[0][0], bounds[0][1], bounds[1][0], bounds[1][1])
+    else:
+        lats = pd.to_numeric(df['latitude'], errors='coerce').dropna()
+        lons = pd.to_numeric(df['longitude'], errors='coerce').dropna()
+        view_bbox = (lats.min(), lons.min(), lats.max(), lons.max()) if len(lats) and len(lons) else None
+    
+    # إنشاء الخريطة (بلاطات محلية إن توفرت)
+    basemap = get_basemap(view_bbox)
+    fallback_url = basemap.pop('fallback_url', None)
     m = folium.Map(
         location=center,
         zoom_start=zoom,
-        tiles='OpenStreetMap'
+        **basemap
     )
+    if fallback_url:
+        TileFallback(fallback_url).add_to(m)
     
-    # إضافة النقاط
-    for idx, row in df.iterrows():
-        lat = row.get('latitude')
-        lon = row.get('longitude')
+    # روابط الصور المصغرة للنوافذ المنبثقة (مولدة بالتوازي مرة واحدة لكل بناء خريطة)
+    front_thumbs = {}
+    if show_markers and 'صورة الواجهة الأمامية للمنزل_URL' in df.columns:
+        front_thumbs = get_variant_urls(df['صورة الواجهة الأمامية للمنزل_URL'], pick_variant(POPUP_IMAGE_WIDTH))
+    
+    # إضافة النقاط (سجلات مُطبّعة بمرور واحد بدلاً من iterrows)
+    for record in (build_records(df).values() if show_markers else ()):
+        lat = record.latitude
+        lon = record.longitude
         
-        if pd.notna(lat) and pd.notna(lon):
+        if lat is not None and lon is not None:
             # تحديد اللون حسب حالة الضرر
-            damage_status = row.get('حالة الضرر', 'غير محدد')
+            damage_status = record.damage_status or 'غير محدد'
             color = get_marker_color(damage_status)
             
             # إنشاء النافذة المنبثقة
-            popup_html = create_popup_html(row, tm)
+            popup_html = create_popup_html(record, tm, front_thumbs)
+            
+            # النقاط المشكوك بإحداثياتها تُرسم بإطار أسود متقطع
+            suspect = bool(record.gps_suspect)
+            # المواقع التقريبية (مركز القرية) تُرسم مفرغة بإطار متقطع
+            imputed = bool(record.gps_imputed)
             
             # إضافة العلامة
             folium.CircleMarker(
                 location=[lat, lon],
                 radius=8,
                 popup=folium.Popup(popup_html, max_width=300),
-                color=color,
+                color='#000000' if suspect else color,
+                dash_array='4' if suspect or imputed else None,
                 fill=True,
                 fillColor=color,
-                fillOpacity=0.7,
+                fillOpacity=0.15 if imputed else 0.7,
                 weight=2
             ).add_to(m)
     
+    # التقريب التلقائي على قرى المنازل المعروضة
+    if bounds is not None:
+        m.fit_bounds(bounds)
+    
     return m
 
 
+# عرض صورة الواجهة في النافذة المنبثقة
+POPUP_IMAGE_WIDTH = 250
+
+# ألوان حزم العمل (تتكرر بعد نفادها)
+PACKAGE_COLORS = [
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+]
+
+
 def get_marker_color(damage_status):
     """
     تحديد لون العلامة حسب حالة الضرر
@@ -80,26 +135,28 @@ def get_marker_color(damage_status):
     return status_config.get('color', '#2196F3')
 
 
-def create_popup_html(row, tm=None):
+def create_popup_html(record, tm=None, thumbnails=None):
     """
     إنشاء محتوى HTML للنافذة المنبثقة
     
     Args:
-        row: صف من DataFrame
+        record: سجل المستفيد (BeneficiaryRecord)
         tm: Translation Manager للترجمات
+        thumbnails: قاموس {رابط الصورة: رابط النسخة المصغرة} محسوب مسبقاً (get_variant_urls)
         
     Returns:
         HTML string
     """
-    name = row.get('الاسم الكامل', 'غير محدد')
-    area = row.get('المنطقة', 'غير محدد')
-    damage = row.get('حالة الضرر', 'غير محدد')
-    house_type = row.get('نوع المنزل', 'غير محدد')
-    family_size = row.get('عدد أفراد الأسرة (بما فيهم مالك المنزل)', 'غير محدد')
-    total = row.get('Grand Total', 'غير محدد')
+    not_specified = 'غير محدد'
+    name = record.full_name or not_specified
+    area = record.district or not_specified
+    damage = record.damage_status or not_specified
+    house_type = record.house_type or not_specified
+    family_size = not_specified if record.family_size is None else record.family_size
+    total = not_specified if record.grand_total is None else record.grand_total
     
     # الصورة الأمامية
-    front_image = row.get('صورة الواجهة الأمامية للمنزل_URL', '')
+    front_image = record.front_image
     
     # تحديد الاتجاه والتسميات حسب اللغة
     if tm and tm.get_current_language() == 'en':
@@ -129,9 +186,19 @@ def create_popup_html(row, tm=None):
         <p style='margin: 5px 0;'><b>{label_total}:</b>{total}💲</p>
     """
     
+    if record.gps_imputed:
+        html += f"""
+        <p style='margin: 5px 0; color: #F57C00;'>📍 {tm.t('map.gps.imputed_' + record.gps_imputed)}</p>
+        """
+    
+    if record.gps_suspect:
+        html += f"""
+        <p style='margin: 5px 0; color: #F44336;'>⚠️ {tm.t('map.gps.suspect_point')}</p>
+        """
+    
     if front_image:
         html += f"""
-        <img src='{front_image}' style='width: 100%; max-width: 250px; margin-top: 10px; border-radius: 5px;'>
+        <img src='{variant_src(front_image, POPUP_IMAGE_WIDTH, thumbnails)}' style='width: 100%; max-width: {POPUP_IMAGE_WIDTH}px; margin-top: 10px; border-radius: 5px;' loading='lazy'>
         """
     
     html += "</div>"
@@ -194,3 +261,359 @@ def add_map_legend(m, tm=None):
     
     return m
 
+
+def add_route_layer(m, route_df, tm=None, color='#6A1B9A'):
+    """
+    إضافة مسار الزيارات كخط متصل مع أرقام ترتيب الزيارة
+    
+    Args:
+        m: Folium map object
+        route_df: DataFrame المنازل مرتبة حسب الزيارة (من plan_route)
+        tm: Translation Manager للترجمات
+        color: لون المسار
+        
+    Returns:
+        Folium map مع المسار
+    """
+    if route_df is None or len(route_df) == 0:
+        return m
+    
+    points = route_df[['latitude', 'longitude']].astype(float).values.tolist()
+    
+    layer = folium.FeatureGroup(name=tm.t('map.route.title') if tm else 'Route')
+    folium.PolyLine(points, color=color, weight=4, opacity=0.8).add_to(layer)
+    
+    for (lat, lon), order, name in zip(points, route_df['visit_order'], route_df.get('الاسم الكامل', [''] * len(points))):
+        folium.Marker(
+            location=[lat, lon],
+            tooltip=f"{order}. {name}",
+            icon=folium.DivIcon(
+                icon_size=(22, 22),
+                icon_anchor=(11, 11),
+                html=f"""<div style="background: {color}; color: white; border-radius: 50%;
+                            width: 22px; height: 22px; line-height: 22px; text-align: center;
+                            font-size: 11px; font-weight: bold;">{order}</div>"""
+            )
+        ).add_to(layer)
+    
+    layer.add_to(m)
+    m.fit_bounds(points)
+    
+    return m
+
+
+def add_choropleth_layer(m, geojson, stats, metric='houses', tm=None):
+    """
+    تلوين المناطق الإدارية حسب مؤشر (عدد المنازل، التكلفة، نسبة الضرر الشديد)
+    
+    Args:
+        m: Folium map object
+        geojson: ناتج load_boundaries
+        stats: ناتج get_area_statistics
+        metric: عمود المؤشر في stats
+        tm: Translation Manager للترجمات
+        
+    Returns:
+        Folium map مع طبقة المناطق
+    """
+    if not geojson['features'] or stats.empty:
+        return m
+    
+    values = stats[metric].astype(float)
+    vmin, vmax = float(values.min()), float(values.max())
+    if vmax <= vmin:
+        vmax = vmin + 1
+    colormap = branca.colormap.LinearColormap(
+        ['#FFF5EB', '#FD8D3C', '#A63603'], vmin=vmin, vmax=vmax,
+        caption=tm.t(f'map.choropleth.metric_{metric}') if tm else metric
+    )
+    
+    # نسخة خفيفة من الحدود مع المؤشرات كخصائص لعرضها في التلميح
+    features = []
+    for feature in geojson['features']:
+        area_id = feature['properties']['area_id']
+        row = stats.loc[area_id]
+        features.append({
+            'type': 'Feature',
+            'geometry': feature['geometry'],
+            'properties': {
+                'area_name': row['area_name'],
+                'houses': int(row['houses']),
+                'cost': f"${row['cost']:,.0f}",
+                'severe_share': f"{row['severe_share']:.0%}",
+                'fill': colormap(float(row[metric])) if row['houses'] > 0 else '#BDBDBD',
+            }
+        })
+    
+    # طبقة أسفل طبقة النقاط (overlayPane = 400) كي تبقى النقاط قابلة للنقر
+    folium.map.CustomPane('choropleth', z_index=350, pointer_events=True).add_to(m)
+    
+    fields = ['area_name', 'houses', 'cost', 'severe_share']
+    aliases = [tm.t(f'map.choropleth.field_{field}') for field in fields] if tm else fields
+    
+    folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        name=tm.t('map.choropleth.title') if tm else 'Areas',
+        style_function=lambda feature: {
+            'fillColor': feature['properties']['fill'],
+            'color': '#555555',
+            'weight': 1,
+            'fillOpacity': 0.55,
+        },
+        highlight_function=lambda feature: {'weight': 3, 'fillOpacity': 0.75},
+        tooltip=folium.GeoJsonTooltip(fields=fields, aliases=aliases, sticky=True),
+        pane='choropleth',
+    ).add_to(m)
+    colormap.add_to(m)
+    
+    return m
+
+
+class TileFallback(MacroElement):
+    """
+    جلب البلاطة من مصدر بديل عند فشل تحميلها من البلاطات المحلية
+    
+    البلاطات المحلية تغطي مناطق المشروع ومستويات التقريب المحملة فقط؛ خارجها
+    يعيد خادم الملفات الثابتة 404 فتُطلب البلاطة نفسها من fallback_url
+    (مرة واحدة لكل بلاطة) بدلاً من مساحة رمادية.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        {{ this._parent.get_name() }}.eachLayer(function(layer) {
+            if (!(layer instanceof L.TileLayer)) { return; }
+            layer.on('tileerror', function(e) {
+                var tile = e.tile;
+                tile.onerror = null;
+                tile.onload = function() { L.DomUtil.addClass(tile, 'leaflet-tile-loaded'); };
+                tile.src = L.Util.template({{ this.url }}, e.coords);
+            });
+        });
+        {% endmacro %}
+    """)
+    
+    def __init__(self, url):
+        super().__init__()
+        self._name = 'TileFallback'
+        self.url = json.dumps(url)
+
+
+class TimelineControl(MacroElement):
+    """
+    شريط زمني داخل الخريطة يعرض تراكم التقييمات يوماً بيوم
+    
+    تُرسل جميع النقاط مرتبة زمنياً مع إزاحات الأيام مرة واحدة، وعند تحريك
+    الشريط تُضاف (أو تُزال) النقاط بين الإزاحتين القديمة والجديدة فقط.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var points = {{ this.points }};
+            var offsets = {{ this.offsets }};
+            var days = {{ this.days }};
+            var layer = L.layerGroup().addTo(map);
+            var markers = points.map(function(p) {
+                return L.circleMarker([p[0], p[1]], {
+                    radius: 7, color: p[2], fillColor: p[2], fillOpacity: 0.75, weight: 2
+                }).bindTooltip(p[3]);
+            });
+            var shown = 0;
+            var control = L.control({position: 'bottomleft'});
+            control.onAdd = function() {
+                var div = L.DomUtil.create('div');
+                div.style.cssText = 'background: white; padding: 8px 12px; border-radius: 5px; '
+                    + 'box-shadow: 0 0 10px rgba(0,0,0,0.2); font-size: 13px; min-width: 260px;';
+                div.innerHTML = '<div style="font-weight: bold; margin-bottom: 4px;">{{ this.title }}</div>'
+                    + '<button type="button" style="margin-right: 6px;">&#9654;</button>'
+                    + '<input type="range" min="0" max="' + (days.length - 1) + '" value="' + (days.length - 1) + '" style="width: 170px; vertical-align: middle;">'
+                    + '<div class="timeline-label" style="margin-top: 4px;"></div>';
+                L.DomEvent.disableClickPropagation(div);
+                L.DomEvent.disableScrollPropagation(div);
+                return div;
+            };
+            control.addTo(map);
+            var container = control.getContainer();
+            var slider = container.querySelector('input');
+            var button = container.querySelector('button');
+            var label = container.querySelector('.timeline-label');
+            function showDay(day) {
+                var target = offsets[day];
+                for (var i = shown; i < target; i++) { layer.addLayer(markers[i]); }
+                for (var j = target; j < shown; j++) { layer.removeLayer(markers[j]); }
+                shown = target;
+                label.innerHTML = days[day] + ' &mdash; {{ this.count_label }}: ' + target;
+            }
+            slider.addEventListener('input', function() { showDay(parseInt(slider.value)); });
+            var timer = null;
+            button.addEventListener('click', function() {
+                if (timer) { clearInterval(timer); timer = null; button.innerHTML = '&#9654;'; return; }
+                if (parseInt(slider.value) >= days.length - 1) { slider.value = 0; showDay(0); }
+                button.innerHTML = '&#10073;&#10073;';
+                timer = setInterval(function() {
+                    var next = parseInt(slider.value) + 1;
+                    if (next >= days.length) { clearInterval(timer); timer = null; button.innerHTML = '&#9654;'; return; }
+                    slider.value = next;
+                    showDay(next);
+                }, {{ this.interval }});
+            });
+            showDay(days.length - 1);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, points, offsets, days, title='', count_label='', interval=800):
+        super().__init__()
+        self._name = 'TimelineControl'
+        self.points = json.dumps(points, ensure_ascii=False).replace('</', '<\\/')
+        self.offsets = json.dumps([int(o) for o in offsets])
+        self.days = json.dumps(list(days))
+        self.title = title
+        self.count_label = count_label
+        self.interval = int(interval)
+
+
+def add_timeline_layer(m, df, timeline, tm=None):
+    """
+    إضافة الخط الزمني لتقييمات المنازل إلى الخريطة
+    
+    Args:
+        m: Folium map object
+        df: DataFrame المنازل المعروضة
+        timeline: ناتج filter_timeline (أو build_timeline)
+        tm: Translation Manager للترجمات
+        
+    Returns:
+        Folium map مع الخط الزمني
+    """
+    if not timeline['days'] or len(timeline['index']) == 0:
+        return m
+    
+    rows = df.loc[timeline['index']]
+    names = rows.get('الاسم الكامل', pd.Series('', index=rows.index)).fillna('').astype(str)
+    points = [
+        [float(lat), float(lon), get_marker_color(status), f"{name} ({str(time)[:10]})"]
+        for lat, lon, status, name, time in zip(
+            rows['latitude'], rows['longitude'],
+            rows.get('حالة الضرر', pd.Series('غير محدد', index=rows.index)),
+            names, timeline['times']
+        )
+    ]
+    
+    TimelineControl(
+        points, timeline['offsets'], timeline['days'],
+        title=tm.t('map.timeline.title') if tm else 'Timeline',
+        count_label=tm.t('map.timeline.count') if tm else 'Houses'
+    ).add_to(m)
+    
+    return m
+
+
+def add_packages_layer(m, packages_df, summary, tm=None):
+    """
+    إضافة حزم العمل كمضلعات (الغلاف المحدب لمنازل كل حزمة) مع رقم الحزمة
+    
+    Args:
+        m: Folium map object
+        packages_df: DataFrame المنازل مع عمود package (من plan_work_packages)
+        summary: ملخص الحزم (من plan_work_packages)
+        tm: Translation Manager للترجمات
+        
+    Returns:
+        Folium map مع طبقة الحزم
+    """
+    if packages_df is None or len(packages_df) == 0:
+        return m
+    
+    layer = folium.FeatureGroup(name=tm.t('map.packages.title') if tm else 'Work packages')
+    label = tm.t('map.packages.package') if tm else 'Package'
+    
+    for package, group in packages_df.groupby('package'):
+        color = PACKAGE_COLORS[(int(package) - 1) % len(PACKAGE_COLORS)]
+        info = summary.loc[package]
+        tooltip = f"{label} {package}: {int(info['houses'])} / ${info['cost']:,.0f} ({info['cost_share']:.0%})"
+        
+        hull = convex_hull(group[['latitude', 'longitude']].to_numpy(dtype=float))
+        if len(hull) >= 3:
+            folium.Polygon(
+                hull.tolist(), color=color, weight=2, fill=True, fill_color=color,
+                fill_opacity=0.15, tooltip=tooltip
+            ).add_to(layer)
+        else:
+            for lat, lon in hull:
+                folium.Circle([lat, lon], radius=60, color=color, weight=2, fill=True,
+                              fill_opacity=0.15, tooltip=tooltip).add_to(layer)
+        
+        folium.Marker(
+            location=[float(info['lat']), float(info['lon'])],
+            tooltip=tooltip,
+            icon=folium.DivIcon(
+                icon_size=(28, 28),
+                icon_anchor=(14, 14),
+                html=f"""<div style="background: white; color: {color}; border: 3px solid {color};
+                            border-radius: 6px; width: 28px; height: 28px; line-height: 22px;
+                            text-align: center; font-size: 13px; font-weight: bold;">{package}</div>"""
+            )
+        ).add_to(layer)
+    
+    layer.add_to(m)
+    
+    return m
+
+
+@st.cache_data(ttl=MAP_CACHE_TTL, max_entries=MAP_CACHE_MAX_ENTRIES, show_spinner=False)
+def get_houses_map_html(
+    data_version: str,
+    filters: tuple,
+    lang: str,
+    _df,
+    _tm=None,
+    route: tuple = None,
+    _bounds=None,
+    choropleth: tuple = None,
+    _area_ids=None,
+    _timeline=None,
+    packages: tuple = None,
+    _packages=None
+) -> str:
+    """
+    بناء خريطة المنازل مع المفتاح وإرجاعها كـ HTML جاهز للعرض
+    
+    النتيجة محفوظة في ذاكرة مؤقتة محدودة (LRU) مشتركة بين جميع المستخدمين،
+    مفتاحها (إصدار البيانات، الفلاتر، اللغة)؛ لذلك تعود الفلاتر السابقة فوراً
+    ويتشارك المستخدمون ذوو الفلاتر نفسها بناءً واحداً. المدة المحدودة
+    (MAP_CACHE_TTL) تعيد توليد النسخ المصغرة للنوافذ المنبثقة إن أزيلت من
+    مخزن الصور، وتجدد وقت استخدامها فلا تُزال وهي معروضة.
+    
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        filters: tuple بقيم الفلاتر المطبقة (None تعني الكل)
+        lang: اللغة الحالية
+        _df: DataFrame المنازل المفلترة (لا يدخل في مفتاح التخزين)
+        _tm: Translation Manager للترجمات
+        route: tuple بفهارس المنازل مرتبة حسب الزيارة (اختياري)
+        _bounds: مستطيل التقريب التلقائي (مشتق من الفلاتر فلا يدخل في المفتاح)
+        choropleth: tuple (مسار ملف الحدود، إصداره، المؤشر) لتلوين المناطق (اختياري)
+        _area_ids: ناتج get_area_assignment لجميع المنازل
+        _timeline: الخط الزمني للمنازل المعروضة (filter_timeline)؛ يحل محل النقاط
+            الثابتة، ويجب أن تتضمن filters علامة تفعيله
+        packages: tuple بإعدادات حزم العمل (عدد الحزم) لمفتاح التخزين (اختياري)
+        _packages: ناتج get_work_packages (المنازل، الملخص)
+        
+    Returns:
+        HTML الخريطة
+    """
+    m = create_houses_map(_df, tm=_tm, bounds=_bounds, show_markers=_timeline is None)
+    if choropleth and _area_ids is not None:
+        boundary_path, boundary_version, metric = choropleth
+        geojson = get_boundaries(boundary_path, boundary_version)
+        stats = get_area_statistics(_df, _area_ids.reindex(_df.index, fill_value=-1), geojson)
+        m = add_choropleth_layer(m, geojson, stats, metric, tm=_tm)
+    m = add_map_legend(m, tm=_tm)
+    if _timeline is not None:
+        m = add_timeline_layer(m, _df, _timeline, tm=_tm)
+    if packages and _packages is not None:
+        m = add_packages_layer(m, _packages[0], _packages[1], tm=_tm)
+    if route:
+        route_df = _df.loc[list(route)].assign(visit_order=range(1, len(route) + 1))
+        m = add_route_layer(m, route_df, tm=_tm)
+    return m.get_root().render()
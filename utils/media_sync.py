@@ -0,0 +1,338 @@
+"""
+مزامنة جميع صور المشروع إلى مخزن الصور المحلي للعمل دون اتصال
+
+تُنزّل كل الروابط في أعمدة *_URL لجدول المنازل وصور البنود الفرعية مرة واحدة
+مع النسخ المصغرة، ويُسجل التقدم في ملف manifest فتُستأنف المزامنة المتوقفة
+من حيث انتهت. الاستخدام من سطر الأوامر:
+    python -m utils.media_sync
+    python -m utils.media_sync --workers 8 --rate 10 --verify
+    python -m utils.media_sync --mirror-prefix http://localhost:8000/
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import requests
+
+from config import (
+    IMAGE_FETCH_TIMEOUT,
+    IMAGE_CACHE_MAX_BYTES,
+    MEDIA_MANIFEST_PATH,
+    MEDIA_SYNC_WORKERS,
+    MEDIA_SYNC_RATE,
+    THUMBNAIL_SIZES,
+)
+from utils.http_client import http_get
+from utils.image_store import ImageStore
+from utils.thumbnails import make_variants
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# عمود صور البنود الفرعية (rehab_sub_rep)
+SUB_ITEM_IMAGE_COLUMN = 'صورة توضيحية للبند_URL'
+
+# عدد العناصر بين كل حفظ لملف manifest
+MANIFEST_SAVE_EVERY = 25
+
+
+class MediaSyncError(Exception):
+    """محتوى منزّل لا يطابق ما أعلنه الخادم (الحجم) أو ما سُجّل سابقاً (البصمة)"""
+
+
+class RateLimiter:
+    """
+    حد لمعدل بدء الطلبات مشترك بين الخيوط (فاصل أدنى بين كل طلبين)
+
+    كل خيط يحجز موعده التالي داخل القفل ثم ينتظر خارجه، فلا يتجاوز المعدل
+    الإجمالي rate طلب في الثانية مهما كان عدد الخيوط.
+    """
+
+    def __init__(self, rate: Optional[float]):
+        """
+        Args:
+            rate: الحد الأقصى للطلبات في الثانية (None أو 0 بلا حد)
+        """
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """الانتظار حتى موعد الطلب التالي المسموح"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def collect_media_urls(houses_df: pd.DataFrame, sub_items_df: Optional[pd.DataFrame] = None) -> List[str]:
+    """
+    جميع روابط الصور في البيانات دون تكرار
+
+    Args:
+        houses_df: DataFrame المنازل (جميع أعمدة *_URL)
+        sub_items_df: DataFrame البنود الفرعية (عمود SUB_ITEM_IMAGE_COLUMN)
+
+    Returns:
+        قائمة الروابط بترتيب ظهورها
+    """
+    frames = [houses_df[[c for c in houses_df.columns if str(c).endswith('_URL')]]]
+    if sub_items_df is not None and SUB_ITEM_IMAGE_COLUMN in sub_items_df.columns:
+        frames.append(sub_items_df[[SUB_ITEM_IMAGE_COLUMN]])
+
+    urls = []
+    for frame in frames:
+        for value in frame.to_numpy().ravel():
+            if isinstance(value, str) and value.strip().startswith(('http://', 'https://')):
+                urls.append(value.strip())
+    return list(dict.fromkeys(urls))
+
+
+def load_manifest(path: Path) -> Dict[str, Dict]:
+    """قراءة ملف manifest ({الرابط: حالة المزامنة}) أو قاموس فارغ"""
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: Path, manifest: Dict[str, Dict]):
+    """حفظ ملف manifest بشكل ذري كي لا يتلف عند إيقاف المزامنة"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _has_variants(store: ImageStore, url: str) -> bool:
+    return all(store.variant_path(url, width).is_file() for width in THUMBNAIL_SIZES)
+
+
+def _store_variants(store: ImageStore, url: str, data: bytes) -> bool:
+    """توليد النسخ المصغرة وحفظها (False للملفات التي ليست صوراً)"""
+    try:
+        variants = make_variants(data)
+    except Exception:
+        return False
+    for width, variant in variants.items():
+        store.put_variant(url, width, variant)
+    return True
+
+
+def is_synced(store: ImageStore, url: str, entry: Optional[Dict], verify: bool = False) -> bool:
+    """
+    التحقق من أن صورة مزامنة سابقاً ما زالت سليمة في المخزن
+
+    Args:
+        store: مخزن الصور
+        url: رابط الصورة
+        entry: سجل الصورة في manifest
+        verify: إعادة حساب بصمة SHA-256 للملف (أبطأ) بدلاً من مقارنة الحجم فقط
+
+    Returns:
+        True إذا لم تعد هناك حاجة لتنزيلها
+    """
+    if not entry or entry.get('status') != 'ok':
+        return False
+    path = store.path_for(store.key_for(url))
+    try:
+        if path.stat().st_size != entry.get('size'):
+            return False
+        if verify and hashlib.sha256(path.read_bytes()).hexdigest() != entry.get('sha256'):
+            return False
+    except OSError:
+        return False
+    return True
+
+
+def sync_one(
+    store: ImageStore,
+    url: str,
+    entry: Optional[Dict],
+    limiter: RateLimiter,
+    fetch_url: Optional[str] = None,
+    verify: bool = False,
+    timeout: float = IMAGE_FETCH_TIMEOUT
+) -> Dict:
+    """
+    مزامنة صورة واحدة: تخطيها إن كانت سليمة، وإلا تنزيلها والتحقق منها وتوليد نسخها المصغرة
+
+    Args:
+        store: مخزن الصور
+        url: رابط الصورة (مفتاح المخزن)
+        entry: سجلها السابق في manifest
+        limiter: حد معدل الطلبات المشترك
+        fetch_url: رابط التنزيل الفعلي إن اختلف عن url (خادم مرآة محلي)
+        verify: التحقق من بصمة الملفات المزامنة سابقاً
+        timeout: مهلة التنزيل بالثواني
+
+    Returns:
+        السجل الجديد للصورة في manifest (مع الحقل result: skipped أو downloaded أو failed)
+    """
+    if is_synced(store, url, entry, verify):
+        if entry.get('variants') and not _has_variants(store, url):
+            # حُذفت النسخ المصغرة وحدها: تُولّد من الأصل دون تنزيل
+            entry = {**entry, 'variants': _store_variants(store, url, store.get(url) or b'')}
+        return {**entry, 'result': 'skipped'}
+
+    key = store.key_for(url)
+    try:
+        limiter.wait()
+        response = http_get(fetch_url or url, timeout=timeout)
+        response.raise_for_status()
+        data = response.content
+
+        # Content-Length يصف الحجم المضغوط عند وجود Content-Encoding
+        expected = response.headers.get('Content-Length')
+        if expected and not response.headers.get('Content-Encoding') and int(expected) != len(data):
+            raise MediaSyncError(f"size mismatch: expected {expected}, got {len(data)}")
+
+        store.put(url, data, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        sha256 = hashlib.sha256(data).hexdigest()
+        if hashlib.sha256(store.path_for(key).read_bytes()).hexdigest() != sha256:
+            raise MediaSyncError("stored file does not match downloaded content")
+    except (requests.RequestException, MediaSyncError, OSError, ValueError) as e:
+        return {
+            'key': key,
+            'status': 'failed',
+            'error': str(e)[:200],
+            'synced_at': time.time(),
+            'result': 'failed',
+        }
+
+    return {
+        'key': key,
+        'status': 'ok',
+        'size': len(data),
+        'sha256': sha256,
+        'content_type': response.headers.get('Content-Type'),
+        'variants': _store_variants(store, url, data),
+        'synced_at': time.time(),
+        'result': 'downloaded',
+    }
+
+
+def sync_media(
+    urls: List[str],
+    store: Optional[ImageStore] = None,
+    manifest_path: Optional[Path] = None,
+    workers: int = MEDIA_SYNC_WORKERS,
+    rate: Optional[float] = MEDIA_SYNC_RATE,
+    verify: bool = False,
+    rewrite: Optional[Callable[[str], str]] = None,
+    progress=None,
+) -> Dict[str, int]:
+    """
+    مزامنة مجموعة روابط إلى مخزن الصور بتوازٍ محدود وحد لمعدل الطلبات
+
+    يُحفظ manifest كل MANIFEST_SAVE_EVERY عنصر وفي النهاية (وعند المقاطعة)،
+    فتتخطى المزامنة التالية ما اكتمل وتعيد محاولة الفاشل فقط.
+
+    Args:
+        urls: روابط الصور
+        store: مخزن الصور (افتراضياً بلا حد للحجم كي لا تُزال صور المزامنة نفسها)
+        manifest_path: مسار ملف manifest (افتراضياً MEDIA_MANIFEST_PATH)
+        workers: عدد التنزيلات المتزامنة
+        rate: الحد الأقصى للطلبات في الثانية
+        verify: التحقق من بصمة الملفات المزامنة سابقاً
+        rewrite: دالة اختيارية تحول الرابط الأصلي إلى رابط التنزيل الفعلي
+        progress: دالة اختيارية progress(done, total)
+
+    Returns:
+        قاموس بعدد الصور المنزّلة والمتخطاة والفاشلة
+    """
+    store = store or ImageStore(max_bytes=float('inf'))
+    manifest_path = manifest_path or PROJECT_ROOT / MEDIA_MANIFEST_PATH
+    manifest = load_manifest(manifest_path)
+    limiter = RateLimiter(rate)
+
+    stats = {'downloaded': 0, 'skipped': 0, 'failed': 0, 'total': len(urls)}
+    if not urls:
+        return stats
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        futures = {
+            pool.submit(
+                sync_one, store, url, manifest.get(url), limiter,
+                rewrite(url) if rewrite else None, verify
+            ): url
+            for url in urls
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                entry = future.result()
+                stats[entry.pop('result')] += 1
+                manifest[futures[future]] = entry
+                if done % MANIFEST_SAVE_EVERY == 0:
+                    save_manifest(manifest_path, manifest)
+                if progress:
+                    progress(done, len(urls))
+        finally:
+            for future in futures:
+                future.cancel()
+            save_manifest(manifest_path, manifest)
+    return stats
+
+
+def _rewrite_prefix(source_prefix: str, mirror_prefix: str, url: str) -> str:
+    """استبدال بادئة الرابط الأصلي ببادئة الخادم المرآة (الروابط الأخرى كما هي)"""
+    if url.startswith(source_prefix):
+        return mirror_prefix + url[len(source_prefix):]
+    return url
+
+
+def main(argv=None):
+    """نقطة الدخول لسطر الأوامر"""
+    parser = argparse.ArgumentParser(description="مزامنة جميع صور المشروع للعمل دون اتصال")
+    parser.add_argument('--workers', type=int, default=MEDIA_SYNC_WORKERS, help="عدد التنزيلات المتزامنة")
+    parser.add_argument('--rate', type=float, default=MEDIA_SYNC_RATE, help="الحد الأقصى للطلبات في الثانية (0 بلا حد)")
+    parser.add_argument('--verify', action='store_true', help="التحقق من بصمة الصور المزامنة سابقاً")
+    parser.add_argument('--limit', type=int, help="مزامنة أول N رابط فقط")
+    parser.add_argument('--manifest', default=str(PROJECT_ROOT / MEDIA_MANIFEST_PATH), help="مسار ملف manifest")
+    parser.add_argument('--source-prefix', default='https://eu.kobotoolbox.org/',
+                        help="بادئة الروابط الأصلية التي تُستبدل عند استخدام --mirror-prefix")
+    parser.add_argument('--mirror-prefix', help="تنزيل الصور من خادم مرآة (مثل خادم محلي للاختبار)")
+    args = parser.parse_args(argv)
+
+    from config import DATA_PATH
+    from utils.data_loader import load_houses_data, load_sub_items
+
+    data_path = str(PROJECT_ROOT / DATA_PATH)
+    urls = collect_media_urls(load_houses_data(data_path), load_sub_items(data_path))
+    if args.limit:
+        urls = urls[:args.limit]
+    if not urls:
+        print("لا توجد روابط صور في البيانات")
+        return
+
+    rewrite = functools.partial(_rewrite_prefix, args.source_prefix, args.mirror_prefix) if args.mirror_prefix else None
+
+    def report(done, total):
+        if done % 50 == 0 or done == total:
+            print(f"{done}/{total}")
+
+    store = ImageStore(max_bytes=float('inf'))
+    stats = sync_media(urls, store=store, manifest_path=Path(args.manifest), workers=args.workers,
+                       rate=args.rate, verify=args.verify, rewrite=rewrite, progress=report)
+    print(stats)
+
+    size = store.size_bytes()
+    print(f"حجم المخزن: {size / 2**20:.1f} MB")
+    if size > IMAGE_CACHE_MAX_BYTES:
+        print(f"تحذير: الحجم يتجاوز IMAGE_CACHE_MAX_BYTES ({IMAGE_CACHE_MAX_BYTES / 2**20:.0f} MB)؛ "
+              "ارفع الحد في config.py وإلا سيُزيل التطبيق الصور الأقدم استخداماً")
+
+
+if __name__ == '__main__':
+    main()
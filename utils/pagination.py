@@ -0,0 +1,56 @@
+"""
+ترقيم صفحات الجداول الكبيرة: يُرسل للمتصفح الصفحة المعروضة فقط
+"""
+from typing import Hashable, Sequence, Tuple
+
+import streamlit as st
+
+from config import TABLE_PAGE_SIZES
+from utils.i18n import tm
+
+
+def create_pager(total: int, key: str, reset_on: Hashable = None, page_sizes: Sequence[int] = TABLE_PAGE_SIZES) -> Tuple[int, int]:
+    """
+    أدوات التنقل بين صفحات جدول (حجم الصفحة ورقمها) وحدود الصفحة الحالية
+
+    رقم الصفحة يُقص إلى عدد الصفحات المتاح، ويعود إلى الأولى عند تغير
+    reset_on (مثل تغير البحث أو الفلاتر أو الترتيب).
+
+    Args:
+        total: عدد صفوف الجدول الكامل
+        key: بادئة مفاتيح الأدوات في session_state
+        reset_on: قيمة تعيد الترقيم إلى الصفحة الأولى عند تغيرها
+        page_sizes: أحجام الصفحة المتاحة (الأول هو الافتراضي)
+
+    Returns:
+        (بداية الصفحة، نهايتها) كمواضع في الجدول الكامل
+    """
+    page_key = f"{key}_page"
+    size_key = f"{key}_page_size"
+    reset_key = f"{key}_reset_on"
+
+    if st.session_state.get(reset_key) != reset_on:
+        st.session_state[reset_key] = reset_on
+        st.session_state[page_key] = 1
+
+    col_info, col_size, col_page = st.columns([2, 1, 1], vertical_alignment="bottom")
+    with col_size:
+        page_size = st.selectbox(tm.t('pagination.page_size'), list(page_sizes), key=size_key)
+
+    # قص رقم الصفحة قبل إنشاء الأداة (قيمة خارج الحدود في session_state خطأ)
+    pages = max(1, -(-total // page_size))
+    st.session_state[page_key] = min(max(st.session_state.get(page_key, 1), 1), pages)
+    with col_page:
+        page = st.number_input(
+            tm.t('pagination.page').format(pages=pages),
+            min_value=1,
+            max_value=pages,
+            step=1,
+            key=page_key
+        )
+
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    with col_info:
+        st.caption(tm.t('pagination.showing').format(start=start + 1 if total else 0, end=end, total=total))
+    return start, end
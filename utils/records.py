@@ -0,0 +1,219 @@
+"""
+سجل مستفيد مضغوط وثابت (namedtuple) بقيم مُطبّعة، يُبنى مرة واحدة لكل مستفيد
+
+تقرأ تبويبات النافذة والنافذة المنبثقة في الخريطة الحقول كسمات (record.family_size)
+بدلاً من row.get('<اسم العمود العربي الطويل>') على pandas Series مع فحص pd.notna.
+"""
+import datetime
+from collections import namedtuple
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# حقول السجل: (اسم السمة، عمود البيانات)
+RECORD_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ('index', '_index'),
+    ('full_name', 'الاسم الكامل'),
+    ('first_name', 'الاسم الأول'),
+    ('father_name', 'اسم الأب'),
+    ('last_name', 'الكنية'),
+    ('mother_name', 'اسم الأم كما هو مذكور في الهوية'),
+    ('gender', 'الجنس'),
+    ('birth_date', 'تاريخ الميلاد كما هو مذكور في الهوية'),
+    ('marital_status', 'الحالة الاجتماعية'),
+    ('spouse_name', 'الاسم الثلاثي للزوج أو الزوجة (إن وجد)'),
+    ('id_type', 'نوع الوثيقة الشخصية'),
+    ('id_number', 'رقم الوثيقة الشخصية (الرقم الوطني)'),
+    ('phone', 'رقم الهاتف الرئيسي (واتساب إن أمكن)'),
+    ('phone_alt', 'رقم هاتف بديل (إضافي)'),
+    ('disability', 'هل مالك المنزل من الأشخاص ذوي الإعاقة؟'),
+    ('chronic_diseases', 'هل تعاني من أمراض مزمنة؟'),
+    ('families_in_house', 'عدد العائلات المقيمة في نفس المنزل'),
+    ('family_size', 'عدد أفراد الأسرة (بما فيهم مالك المنزل)'),
+    ('family_type', 'نوع معيل الأسرة'),
+    ('men', 'عدد الرجال (العمر أكبر من 18 سنة)'),
+    ('women', 'عدد النساء (العمر أكبر من 18 سنة)'),
+    ('boys', 'عدد الشباب الذكور (من 12 إلى 17 سنة)'),
+    ('girls', 'عدد الفتيات الإناث (من 12 إلى 17 سنة)'),
+    ('child_boys', 'عدد الأطفال الذكور (دون سن 12 سنة)'),
+    ('child_girls', 'عدد الأطفال الإناث (دون سن 12 سنة)'),
+    ('elderly_count', 'عدد أفراد الأسرة من كبار السن (60 سنة فأكثر)'),
+    ('disabled_count', 'عدد أفراد الأسرة من ذوي الإعاقة'),
+    ('separated_children', 'عدد الأطفال المنفصلين عن ذويهم'),
+    ('nursing_mothers', 'عدد النساء المرضعات'),
+    ('pregnant_women', 'عدد النساء الحوامل'),
+    ('divorced_women', 'عدد النساء المطلقات'),
+    ('widowed_women', 'عدد النساء الأرامل'),
+    ('income_source', 'ما هو مصدر الدخل الرئيسي للأسرة؟'),
+    ('working_members', 'عدد الأفراد العاملين في الأسرة'),
+    ('governorate', 'المحافظة'),
+    ('district', 'المنطقة'),
+    ('subdistrict', 'الناحية'),
+    ('village', 'القرية'),
+    ('detailed_address', 'العنوان التفصيلي لمكان السكن الحالي'),
+    ('full_address', 'عنوان المنزل الكامل'),
+    ('residence_area_status', 'ما هي حالة إقامتك في المنطقة؟'),
+    ('residence_status', 'حالة الاقامة في المنزل'),
+    ('gps_latitude', '_إحداثيات الموقع الجغرافي للمنزل (GPS)_latitude'),
+    ('gps_longitude', '_إحداثيات الموقع الجغرافي للمنزل (GPS)_longitude'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('gps_imputed', 'gps_imputed'),
+    ('gps_suspect', 'gps_suspect'),
+    ('house_type', 'نوع المنزل'),
+    ('rooms', 'عدد الغرف (بما فيها الصالون)'),
+    ('floor', 'رقم الطابق الذي يقع فيه المنزل'),
+    ('area', 'مساحة المنزل بالمتر المربع'),
+    ('damage_status', 'حالة الضرر'),
+    ('ownership_document', 'هل لديك وثيقة اثبات ملكية حديث؟'),
+    ('ownership_type', 'نوع وثيقة الملكية'),
+    ('ownership_date', 'تاريخ إصدار وثيقة الملكية'),
+    ('external_walls', 'هل يملك المنزل أو الشقة جدرانًا خارجية سليمة ولا يحتاج إلى أعمال بناء (بلوك) خارجية؟'),
+    ('internal_walls', 'هل يملك المنزل أو الشقة جدرانًا داخلية مكتملة ولا يحتاج إلى أعمال بناء (بلوك) داخلية؟'),
+    ('roof', 'هل يملك المنزل أو الشقة سقفًا وسلالم (أدراج) سليمة؟'),
+    ('building_damage', 'هل توجد أية أضرار إنشائية في المنزل أو الشقة؟'),
+    ('facilities', 'هل المرافق (المياه والصرف) عاملة أم مجرد بناء؟'),
+    ('sewerage', 'هل المنزل موصول بنظام صرف صحي أو حفرة فنية؟'),
+    ('damage_description', 'وصف حالة الضرر من وجهة نظرك كمالك للمنزل'),
+    ('safe_access', 'هل يتوفر وصول آمن إلى المنزل؟'),
+    ('unsafe_war_remnants', 'في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/مخلفات حرب (ألغام، ذخائر غير منفجرة)'),
+    ('unsafe_ownership_dispute', 'في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/نزاع ملكية أو خلاف قانوني'),
+    ('unsafe_blocked_road', 'في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/طريق مسدود بالأنقاض أو الركام'),
+    ('unsafe_collapsed_buildings', 'في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/انهيار مبانٍ مجاورة تعيق الوصول'),
+    ('unsafe_unstable_buildings', 'في حال عدم توفر الوصول الآمن، يرجى توضيح الأسباب/مبانٍ غير مستقرة أو مهددة بالانهيار في الطريق'),
+    ('other_applications', 'هل لدى مالك المنزل طلبات استفادة أخرى ضمن مشاريع مشابهة؟'),
+    ('notes', 'ملاحظات إضافية أو تعليقات عامة (اختياري)'),
+    ('contractor', 'Contractor'),
+    ('grand_total', 'Grand Total'),
+    ('id_photo_front', 'صورة الوثيقة الشخصية (الوجه الأول)_URL'),
+    ('id_photo_back', 'صورة الوثيقة الشخصية (الوجه الثاني)_URL'),
+    ('ownership_photo', 'صورة وثيقة الملكية_URL'),
+    ('front_image', 'صورة الواجهة الأمامية للمنزل_URL'),
+    ('inside_image', 'صورة للمنزل من الداخل_URL'),
+    ('walls_image', 'صورة توضح حالة الجدران_URL'),
+    ('columns_image', 'صورة توضح حالة الأعمدة_URL'),
+    ('roof_image', 'صورة توضح حالة السقف_URL'),
+    ('kitchen_image', 'صورة توضح حالة المرافق (المطبخ)_URL'),
+    ('bathroom_image', 'صورة توضح حالة المرافق (الحمام)_URL'),
+    ('toilet_image', 'صورة توضح حالة المرافق (التواليت)_URL'),
+)
+
+# namedtuple: ثابت، بلا __dict__ لكل سجل (__slots__ فارغة)، وقراءة السمات بالفهرس
+BeneficiaryRecord = namedtuple('BeneficiaryRecord', ['label'] + [name for name, _ in RECORD_FIELDS])
+BeneficiaryRecord.__doc__ = "سجل مستفيد بقيم مُطبّعة (None للقيم الفارغة). label فهرس الصف في DataFrame"
+
+
+def normalize_value(value):
+    """
+    تطبيع قيمة خلية لمرة واحدة
+
+    الفارغ (NaN، NaT، نص فارغ أو مسافات) يصبح None، والنص يُقص، والأعداد
+    الصحيحة المخزنة كعشرية تصبح int، والتواريخ بلا وقت تصبح date.
+
+    Args:
+        value: قيمة من DataFrame
+
+    Returns:
+        قيمة بايثون عادية أو None
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        if pd.isna(value):
+            return None
+        value = pd.Timestamp(value).to_pydatetime()
+        return value.date() if value.time() == datetime.time() else value
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        if value != value:
+            return None
+        value = float(value)
+        return int(value) if value.is_integer() and abs(value) < 2 ** 53 else value
+    if pd.isna(value):
+        return None
+    return value
+
+
+def build_records(df: pd.DataFrame) -> Dict[int, BeneficiaryRecord]:
+    """
+    بناء سجلات جميع المستفيدين في DataFrame بمرور واحد
+
+    الأعمدة غير الموجودة تُملأ بـ None.
+
+    Args:
+        df: DataFrame المنازل
+
+    Returns:
+        قاموس {_index: BeneficiaryRecord} بترتيب df (فهرس الصف إن لم يوجد _index)
+    """
+    columns = [column for _, column in RECORD_FIELDS]
+    present = [column for column in columns if column in df.columns]
+    positions = {column: i for i, column in enumerate(present)}
+    slots = [positions.get(column) for column in columns]
+
+    records = {}
+    for label, values in zip(df.index, df[present].itertuples(index=False, name=None)):
+        record = BeneficiaryRecord._make(
+            [label] + [None if i is None else normalize_value(values[i]) for i in slots]
+        )
+        records[label if record.index is None else record.index] = record
+    return records
+
+
+def make_record(row: pd.Series) -> BeneficiaryRecord:
+    """
+    سجل مستفيد واحد من صف (عند عدم توفر السجلات المخزنة)
+
+    Args:
+        row: صف المستفيد
+
+    Returns:
+        BeneficiaryRecord
+    """
+    return BeneficiaryRecord._make(
+        [row.name] + [normalize_value(row.get(column)) for _, column in RECORD_FIELDS]
+    )
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_beneficiary_records(data_version: str, _df: pd.DataFrame) -> Dict[int, BeneficiaryRecord]:
+    """
+    سجلات جميع المستفيدين مبنية مرة واحدة لكل إصدار بيانات
+
+    cache_resource (بلا نسخ لكل استدعاء) آمن هنا لأن السجلات ثابتة.
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        _df: DataFrame جميع المنازل (غير مفلتر؛ لا يدخل في مفتاح التخزين)
+
+    Returns:
+        قاموس {_index: BeneficiaryRecord}
+    """
+    return build_records(_df)
+
+
+def get_record(row: pd.Series, houses_df: pd.DataFrame = None, data_version: str = None) -> BeneficiaryRecord:
+    """
+    سجل المستفيد من السجلات المخزنة إن توفرت، وإلا من الصف مباشرة
+
+    Args:
+        row: صف المستفيد
+        houses_df: DataFrame جميع المنازل
+        data_version: إصدار ملف البيانات
+
+    Returns:
+        BeneficiaryRecord
+    """
+    if houses_df is not None and data_version is not None:
+        record = get_beneficiary_records(data_version, houses_df).get(row.get('_index'))
+        if record is not None:
+            return record
+    return make_record(row)
@@ -0,0 +1,143 @@
+"""
+تخطيط مسار الزيارات الميدانية (أقرب جار + تحسين 2-opt)
+"""
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.geo_index import EARTH_RADIUS_M
+
+
+def distance_matrix(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    مصفوفة المسافات haversine بين جميع النقاط (عملية متجهة واحدة)
+
+    Args:
+        lats: خطوط العرض بالدرجات
+        lons: خطوط الطول بالدرجات
+
+    Returns:
+        مصفوفة NxN بالمتر
+    """
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour_route(dist: np.ndarray, start: int = 0) -> np.ndarray:
+    """
+    بناء مسار أولي بزيارة أقرب نقطة غير مزارة في كل خطوة
+
+    Args:
+        dist: مصفوفة المسافات
+        start: نقطة البداية
+
+    Returns:
+        ترتيب الزيارة (مصفوفة فهارس)
+    """
+    n = len(dist)
+    route = np.empty(n, dtype=int)
+    visited = np.zeros(n, dtype=bool)
+    current = start
+    for step in range(n):
+        route[step] = current
+        visited[current] = True
+        if step == n - 1:
+            break
+        candidates = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(candidates))
+    return route
+
+
+def two_opt(route: np.ndarray, dist: np.ndarray, max_passes: int = 50) -> np.ndarray:
+    """
+    تحسين مسار مفتوح بعكس المقاطع (2-opt) حتى لا يبقى تحسين
+
+    لكل نقطة i تُحسب مكاسب جميع المقاطع [i, j] دفعة واحدة بـ NumPy
+    ويُطبق أفضلها.
+
+    Args:
+        route: ترتيب الزيارة الأولي
+        dist: مصفوفة المسافات
+        max_passes: الحد الأقصى لعدد المرورات الكاملة
+
+    Returns:
+        ترتيب الزيارة المحسّن
+    """
+    route = route.copy()
+    n = len(route)
+    if n < 4:
+        return route
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = route[i - 1], route[i]
+            js = np.arange(i + 1, n)
+            c = route[js]
+            # المسار مفتوح: لا توجد حافة بعد آخر نقطة
+            has_next = js < n - 1
+            d = route[np.minimum(js + 1, n - 1)]
+
+            old = dist[a, b] + np.where(has_next, dist[c, d], 0.0)
+            new = dist[a, c] + np.where(has_next, dist[b, d], 0.0)
+            gain = old - new
+
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                j = js[best]
+                route[i:j + 1] = route[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def route_length(route: np.ndarray, dist: np.ndarray) -> float:
+    """الطول الإجمالي لمسار مفتوح بالمتر"""
+    if len(route) < 2:
+        return 0.0
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+def plan_route(df: pd.DataFrame) -> Tuple[pd.DataFrame, float]:
+    """
+    تخطيط ترتيب زيارة مجموعة منازل
+
+    يبدأ المسار من المنزل الأبعد عن مركز المجموعة (طرف المنطقة) ثم يُبنى
+    بأقرب جار ويُحسّن بـ 2-opt.
+
+    Args:
+        df: DataFrame المنازل (يحتوي latitude و longitude)
+
+    Returns:
+        (DataFrame مرتب حسب الزيارة مع عمودي visit_order و leg_m، الطول الإجمالي بالمتر)
+    """
+    lats = pd.to_numeric(df['latitude'], errors='coerce')
+    lons = pd.to_numeric(df['longitude'], errors='coerce')
+    valid = lats.notna() & lons.notna()
+    stops = df[valid]
+    if stops.empty:
+        return stops.assign(visit_order=[], leg_m=[]), 0.0
+
+    lat_arr = lats[valid].to_numpy(dtype=float)
+    lon_arr = lons[valid].to_numpy(dtype=float)
+    dist = distance_matrix(lat_arr, lon_arr)
+
+    centroid = distance_matrix(
+        np.append(lat_arr, lat_arr.mean()), np.append(lon_arr, lon_arr.mean())
+    )[-1, :-1]
+    start = int(np.argmax(centroid))
+
+    route = two_opt(nearest_neighbour_route(dist, start), dist)
+    legs = np.concatenate(([0.0], dist[route[:-1], route[1:]]))
+
+    ordered = stops.iloc[route].assign(
+        visit_order=np.arange(1, len(route) + 1),
+        leg_m=legs.round(0)
+    )
+    return ordered, route_length(route, dist)
@@ -0,0 +1,183 @@
+"""
+نسخ مصغرة متعددة الدقة (WebP) للصور تُولّد مرة واحدة لكل صورة
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+from PIL import Image, ImageOps
+
+from config import THUMBNAIL_SIZES, THUMBNAIL_QUALITY, IMAGE_PREFETCH_WORKERS
+from utils.image_store import get_image_store
+
+
+def pick_variant(slot_px: int) -> int:
+    """
+    أصغر عرض متوفر يغطي مساحة العرض
+
+    Args:
+        slot_px: عرض مكان الصورة في الصفحة بالبكسل
+
+    Returns:
+        أحد THUMBNAIL_SIZES (الأكبر إن لم يكفِ أي منها)
+    """
+    for width in THUMBNAIL_SIZES:
+        if width >= slot_px:
+            return width
+    return THUMBNAIL_SIZES[-1]
+
+
+def make_variants(data: bytes, sizes: Iterable[int] = THUMBNAIL_SIZES) -> Dict[int, bytes]:
+    """
+    توليد جميع النسخ المصغرة من الصورة الأصلية بفك ترميز واحد
+
+    صور JPEG تُفك بوضع المسودة (draft) فيقرأ فك الترميز مباشرة بدقة أقل
+    (1/2، 1/4، 1/8) تكفي لأكبر نسخة، وهو أسرع بكثير من فك صورة الهاتف كاملة.
+    تُصحح الاتجاه حسب EXIF ثم تُصغّر النسخ من الأكبر إلى الأصغر.
+
+    Args:
+        data: محتوى الصورة الأصلية
+        sizes: العروض المطلوبة بالبكسل
+
+    Returns:
+        قاموس {العرض: محتوى WebP}
+    """
+    sizes = sorted(sizes, reverse=True)
+    img = Image.open(BytesIO(data))
+    if img.format == 'JPEG':
+        # الأبعاد قبل تدوير EXIF قد تكون معكوسة، لذلك يُطلب ضلع أكبر مربع
+        img.draft('RGB', (sizes[0], sizes[0]))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+    variants = {}
+    for width in sizes:
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        img.save(buffer, format='WEBP', quality=THUMBNAIL_QUALITY, method=4)
+        variants[width] = buffer.getvalue()
+    return variants
+
+
+def ensure_variants(url: str) -> bool:
+    """
+    توليد النسخ المصغرة للصورة إن لم تكن موجودة (مرة واحدة لكل صورة)
+
+    Args:
+        url: رابط الصورة الأصلية
+
+    Returns:
+        True إذا كانت النسخ متوفرة
+    """
+    if not isinstance(url, str) or not url:
+        return False
+    store = get_image_store()
+    if all(store.variant_path(url, width).is_file() for width in THUMBNAIL_SIZES):
+        return True
+
+    try:
+        variants = make_variants(store.fetch(url))
+    except Exception:
+        return False
+    for width, variant in variants.items():
+        store.put_variant(url, width, variant)
+    return True
+
+
+def get_variant(url: str, width: int) -> Optional[bytes]:
+    """
+    محتوى نسخة مصغرة من صورة (للاستخدام داخل بايثون، مثل التصدير)
+
+    Args:
+        url: رابط الصورة الأصلية
+        width: أحد THUMBNAIL_SIZES
+
+    Returns:
+        محتوى WebP أو None عند الفشل
+    """
+    if not ensure_variants(url):
+        return None
+    return get_image_store().get_variant(url, width)
+
+
+def variant_url(url: str, width: int) -> Optional[str]:
+    """
+    رابط نسخة مصغرة عبر خادم الملفات الثابتة (تُولّد عند أول طلب)
+
+    Args:
+        url: رابط الصورة الأصلية
+        width: أحد THUMBNAIL_SIZES
+
+    Returns:
+        الرابط المحلي أو None عند الفشل
+    """
+    if not ensure_variants(url):
+        return None
+    return get_image_store().variant_url(url, width)
+
+
+def get_variant_urls(urls: Iterable[str], width: int, max_workers: int = IMAGE_PREFETCH_WORKERS) -> Dict[str, Optional[str]]:
+    """
+    روابط النسخ المصغرة لمجموعة صور (التوليد والتنزيل بالتوازي)
+
+    Args:
+        urls: روابط الصور (تُتجاهل القيم الفارغة والمكررة)
+        width: أحد THUMBNAIL_SIZES
+        max_workers: الحد الأقصى للتنزيلات المتزامنة
+
+    Returns:
+        قاموس {الرابط: الرابط المحلي أو None}
+    """
+    unique = list(dict.fromkeys(url for url in urls if isinstance(url, str) and url))
+    if not unique:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as pool:
+        return dict(zip(unique, pool.map(lambda url: variant_url(url, width), unique)))
+
+
+def variant_src(url: str, slot_px: int, variant_urls: Optional[Dict[str, Optional[str]]] = None) -> str:
+    """
+    مصدر <img src> لأصغر نسخة مناسبة لمكان العرض، أو الرابط الأصلي عند الفشل
+
+    الرابط المحلي نسبي (/app/static/media/...) فلا يصلح لـ st.image؛ استخدم image_src.
+
+    Args:
+        url: رابط الصورة الأصلية
+        slot_px: عرض مكان الصورة بالبكسل
+        variant_urls: روابط محسوبة مسبقاً (get_variant_urls)؛ عند تمريرها لا يُحمّل شيء جديد
+
+    Returns:
+        الرابط المحلي للنسخة المصغرة أو الرابط الأصلي
+    """
+    if variant_urls is not None:
+        local = variant_urls.get(url)
+    elif pd.notna(url) and url:
+        local = variant_url(url, pick_variant(slot_px))
+    else:
+        local = None
+    return local or url
+
+
+def image_src(url: str, slot_px: int) -> str:
+    """
+    مصدر st.image لأصغر نسخة مناسبة لمكان العرض، أو الرابط الأصلي عند الفشل
+
+    st.image يعامل النص بلا scheme كمسار ملف، لذلك يُعاد مسار النسخة المصغرة
+    على القرص لا رابطها عبر خادم الملفات الثابتة.
+
+    Args:
+        url: رابط الصورة الأصلية
+        slot_px: عرض مكان الصورة بالبكسل
+
+    Returns:
+        مسار ملف النسخة المصغرة أو الرابط الأصلي
+    """
+    if ensure_variants(url):
+        store = get_image_store()
+        width = pick_variant(slot_px)
+        store.touch_variant(url, width)
+        return str(store.variant_path(url, width))
+    return url
@@ -0,0 +1,486 @@
+"""
+مخزن بلاطات الخريطة المحلي (XYZ / MBTiles) للعمل دون اتصال
+
+الاستخدام من سطر الأوامر لتحميل البلاطات مسبقاً لمناطق المشروع:
+    python -m utils.tiles --zoom 10 16
+    python -m utils.tiles --mbtiles region.mbtiles
+"""
+import argparse
+import math
+import os
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+
+from config import (
+    MAP_TILES_MODE,
+    TILES_DIR,
+    LOCAL_TILES_URL,
+    LOCAL_TILES_ATTRIBUTION,
+    TILE_SOURCE_URL,
+    TILE_CACHE_MAX_BYTES,
+    TILE_PREFETCH_ZOOMS,
+    TILE_PREFETCH_DELAY,
+    TILE_USER_AGENT,
+)
+
+# (south, west, north, east)
+BBox = Tuple[float, float, float, float]
+Tile = Tuple[int, int, int]
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def lat_lon_to_tile(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
+    """
+    تحويل إحداثيات جغرافية إلى رقم بلاطة XYZ (Web Mercator)
+
+    Args:
+        lat: خط العرض
+        lon: خط الطول
+        zoom: مستوى التقريب
+
+    Returns:
+        (x, y) رقم البلاطة
+    """
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_to_lat_lon(x: int, y: int, zoom: int) -> Tuple[float, float]:
+    """
+    إحداثيات الركن الشمالي الغربي لبلاطة XYZ (عكس lat_lon_to_tile)
+
+    Args:
+        x, y: رقم البلاطة
+        zoom: مستوى التقريب
+
+    Returns:
+        (lat, lon)
+    """
+    n = 2 ** zoom
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat, x / n * 360.0 - 180.0
+
+
+def tiles_for_bbox(bbox: BBox, zoom: int) -> Iterable[Tile]:
+    """
+    توليد جميع البلاطات التي تغطي مستطيلاً جغرافياً عند مستوى تقريب محدد
+
+    Args:
+        bbox: (جنوب، غرب، شمال، شرق)
+        zoom: مستوى التقريب
+
+    Returns:
+        مولّد لثلاثيات (z, x, y)
+    """
+    south, west, north, east = bbox
+    x_min, y_min = lat_lon_to_tile(north, west, zoom)
+    x_max, y_max = lat_lon_to_tile(south, east, zoom)
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            yield zoom, x, y
+
+
+def get_project_bboxes(df, pad_deg: float = 0.01) -> List[BBox]:
+    """
+    حساب المستطيلات المحيطة بمنازل المشروع (مستطيل لكل قرية)
+
+    Args:
+        df: DataFrame بيانات المنازل (يحتوي latitude و longitude)
+        pad_deg: هامش إضافي بالدرجات حول كل مستطيل
+
+    Returns:
+        قائمة بالمستطيلات (جنوب، غرب، شمال، شرق)
+    """
+    import pandas as pd
+
+    coords = df.assign(
+        latitude=pd.to_numeric(df['latitude'], errors='coerce'),
+        longitude=pd.to_numeric(df['longitude'], errors='coerce'),
+    ).dropna(subset=['latitude', 'longitude'])
+    if coords.empty:
+        return []
+
+    group_col = 'القرية' if 'القرية' in coords.columns else None
+    if group_col is None:
+        groups = [coords]
+    else:
+        groups = [g for _, g in coords.groupby(group_col)]
+
+    bboxes = []
+    for g in groups:
+        bboxes.append((
+            g['latitude'].min() - pad_deg,
+            g['longitude'].min() - pad_deg,
+            g['latitude'].max() + pad_deg,
+            g['longitude'].max() + pad_deg,
+        ))
+    return bboxes
+
+
+class TileCache:
+    """
+    مخزن بلاطات على القرص بتنسيق XYZ ({z}/{x}/{y}.png) مع حد أقصى للحجم
+    وإزالة الأقل استخداماً (LRU) عند تجاوزه.
+
+    يُستخدم وقت التعديل (mtime) كوقت آخر استخدام. طلبات المتصفح للبلاطات
+    يخدمها خادم الملفات الثابتة مباشرة ولا تمر ببايثون، لذلك يُحدّث الوقت
+    عند بناء كل خريطة لجميع البلاطات المخزنة داخل منطقتها (touch_bbox)،
+    إضافة إلى التحميل المسبق والقراءة من بايثون (get).
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = TILE_CACHE_MAX_BYTES):
+        """
+        Args:
+            root: مجلد البلاطات (افتراضياً TILES_DIR داخل المشروع)
+            max_bytes: الحجم الأقصى للمخزن بالبايت
+        """
+        self.root = Path(root) if root else PROJECT_ROOT / TILES_DIR
+        self.max_bytes = max_bytes
+
+    def tile_path(self, z: int, x: int, y: int) -> Path:
+        """مسار ملف البلاطة"""
+        return self.root / str(z) / str(x) / f"{y}.png"
+
+    def has(self, z: int, x: int, y: int) -> bool:
+        """التحقق من وجود البلاطة في المخزن"""
+        return self.tile_path(z, x, y).is_file()
+
+    def get(self, z: int, x: int, y: int) -> Optional[bytes]:
+        """قراءة بلاطة وتحديث وقت استخدامها"""
+        path = self.tile_path(z, x, y)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        self.touch(z, x, y)
+        return data
+
+    def touch(self, z: int, x: int, y: int):
+        """تحديث وقت آخر استخدام للبلاطة"""
+        try:
+            os.utime(self.tile_path(z, x, y), None)
+        except OSError:
+            pass
+
+    def _cached_tiles(self, zoom: int, x_range: Optional[Tuple[int, int]] = None) -> Iterable[Tuple[int, Path]]:
+        """(x, مجلد العمود) لأعمدة البلاطات المخزنة عند مستوى تقريب (ضمن x_range إن حُدد)"""
+        try:
+            names = os.listdir(self.root / str(zoom))
+        except OSError:
+            return
+        for name in names:
+            if not name.isdigit():
+                continue
+            x = int(name)
+            if x_range is None or x_range[0] <= x <= x_range[1]:
+                yield x, self.root / str(zoom) / name
+
+    def _rows(self, column: Path) -> List[int]:
+        """أرقام y للبلاطات المخزنة في مجلد عمود"""
+        try:
+            names = os.listdir(column)
+        except OSError:
+            return []
+        return [int(name[:-4]) for name in names if name.endswith('.png') and name[:-4].isdigit()]
+
+    def zooms(self) -> List[int]:
+        """مستويات التقريب التي تحتوي بلاطات مخزنة (مرتبة)"""
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            int(p.name) for p in self.root.iterdir()
+            if p.name.isdigit() and next(p.glob('*/*.png'), None) is not None
+        )
+
+    def coverage(self) -> Optional[Tuple[Tuple[int, int], BBox]]:
+        """
+        مجال التقريب والمستطيل اللذان تغطيهما البلاطات المخزنة
+
+        المستطيل من بلاطات أعلى مستوى تقريب (الأدق)، فلا يُقرأ إلا أسماء الملفات.
+
+        Returns:
+            ((أدنى، أعلى) مستوى تقريب، (جنوب، غرب، شمال، شرق)) أو None إن كان المخزن فارغاً
+        """
+        zooms = self.zooms()
+        if not zooms:
+            return None
+        zoom = zooms[-1]
+        xs, ys = [], []
+        for x, column in self._cached_tiles(zoom):
+            rows = self._rows(column)
+            if rows:
+                xs.append(x)
+                ys.extend((min(rows), max(rows)))
+        north, west = tile_to_lat_lon(min(xs), min(ys), zoom)
+        south, east = tile_to_lat_lon(max(xs) + 1, max(ys) + 1, zoom)
+        return (zooms[0], zoom), (south, west, north, east)
+
+    def touch_bbox(self, bbox: BBox) -> int:
+        """
+        تحديث وقت استخدام جميع البلاطات المخزنة داخل مستطيل (في كل مستويات التقريب)
+
+        تُقرأ أسماء المجلدات الموجودة فقط، فالكلفة بحجم المخزن لا بمساحة المستطيل.
+
+        Args:
+            bbox: (جنوب، غرب، شمال، شرق)
+
+        Returns:
+            عدد البلاطات المحدّثة
+        """
+        south, west, north, east = bbox
+        touched = 0
+        for zoom in self.zooms():
+            x_min, y_min = lat_lon_to_tile(north, west, zoom)
+            x_max, y_max = lat_lon_to_tile(south, east, zoom)
+            for _, column in self._cached_tiles(zoom, (x_min, x_max)):
+                for y in self._rows(column):
+                    if y_min <= y <= y_max:
+                        try:
+                            os.utime(column / f"{y}.png", None)
+                        except OSError:
+                            continue
+                        touched += 1
+        return touched
+
+    def put(self, z: int, x: int, y: int, data: bytes):
+        """
+        حفظ بلاطة بشكل ذري (كتابة ملف مؤقت ثم إعادة تسمية)
+
+        Args:
+            z, x, y: رقم البلاطة
+            data: محتوى PNG
+        """
+        path = self.tile_path(z, x, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def is_empty(self) -> bool:
+        """التحقق من خلو المخزن من البلاطات"""
+        if not self.root.is_dir():
+            return True
+        return next(self.root.glob('*/*/*.png'), None) is None
+
+    def size_bytes(self) -> int:
+        """الحجم الإجمالي للبلاطات المخزنة"""
+        if not self.root.is_dir():
+            return 0
+        return sum(p.stat().st_size for p in self.root.glob('*/*/*.png'))
+
+    def evict(self, keep: Optional[Set[Tile]] = None) -> int:
+        """
+        حذف البلاطات الأقدم استخداماً (mtime) حتى يعود الحجم ضمن الحد الأقصى
+
+        Args:
+            keep: بلاطات لا يجوز حذفها (مثل بلاطات التحميل الجاري)
+
+        Returns:
+            عدد البلاطات المحذوفة
+        """
+        if not self.root.is_dir():
+            return 0
+
+        entries = []
+        total = 0
+        for p in self.root.glob('*/*/*.png'):
+            st_ = p.stat()
+            total += st_.st_size
+            entries.append((st_.st_mtime, st_.st_size, p))
+
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        entries.sort(key=lambda e: e[0])
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            if keep:
+                z, x, y = int(p.parent.parent.name), int(p.parent.name), int(p.stem)
+                if (z, x, y) in keep:
+                    continue
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def import_mbtiles(self, mbtiles_path: str) -> int:
+        """
+        استيراد بلاطات من ملف MBTiles إلى المخزن
+
+        ملفات MBTiles تستخدم ترقيم TMS (محور y معكوس) فيتم تحويله إلى XYZ.
+
+        Args:
+            mbtiles_path: مسار ملف MBTiles
+
+        Returns:
+            عدد البلاطات المستوردة
+        """
+        count = 0
+        # with على الاتصال نفسه ينهي المعاملة فقط ولا يغلقه
+        with closing(sqlite3.connect(mbtiles_path)) as conn:
+            cursor = conn.execute(
+                "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles"
+            )
+            for z, x, tms_y, data in cursor:
+                y = (2 ** z - 1) - tms_y
+                self.put(z, x, y, data)
+                count += 1
+        self.evict()
+        return count
+
+
+def prefetch_tiles(
+    bboxes: List[BBox],
+    zooms: Tuple[int, int] = TILE_PREFETCH_ZOOMS,
+    cache: Optional[TileCache] = None,
+    source_url: str = TILE_SOURCE_URL,
+    delay: float = TILE_PREFETCH_DELAY,
+    max_tiles: Optional[int] = None,
+    progress=None,
+) -> Dict[str, int]:
+    """
+    تحميل البلاطات مسبقاً للمستطيلات المحددة ومستويات التقريب المختارة
+
+    Args:
+        bboxes: قائمة المستطيلات (جنوب، غرب، شمال، شرق)
+        zooms: (أدنى، أعلى) مستوى تقريب شاملاً
+        cache: مخزن البلاطات
+        source_url: قالب رابط مصدر البلاطات
+        delay: فاصل زمني بين الطلبات بالثواني
+        max_tiles: حد أقصى لعدد البلاطات (للحماية من التحميل الزائد)
+        progress: دالة اختيارية progress(done, total)
+
+    Returns:
+        قاموس بعدد البلاطات المحملة والموجودة مسبقاً والفاشلة
+    """
+    cache = cache or TileCache()
+
+    wanted: Set[Tile] = set()
+    for zoom in range(zooms[0], zooms[1] + 1):
+        for bbox in bboxes:
+            wanted.update(tiles_for_bbox(bbox, zoom))
+
+    if max_tiles is not None and len(wanted) > max_tiles:
+        raise ValueError(
+            f"عدد البلاطات المطلوبة ({len(wanted)}) يتجاوز الحد الأقصى ({max_tiles})"
+        )
+
+    stats = {'downloaded': 0, 'cached': 0, 'failed': 0, 'total': len(wanted)}
+    session = requests.Session()
+    session.headers['User-Agent'] = TILE_USER_AGENT
+
+    for i, (z, x, y) in enumerate(sorted(wanted)):
+        if cache.has(z, x, y):
+            cache.touch(z, x, y)
+            stats['cached'] += 1
+        else:
+            try:
+                response = session.get(source_url.format(z=z, x=x, y=y), timeout=15)
+                response.raise_for_status()
+                cache.put(z, x, y, response.content)
+                stats['downloaded'] += 1
+            except requests.RequestException:
+                stats['failed'] += 1
+            if delay:
+                time.sleep(delay)
+
+        if progress:
+            progress(i + 1, len(wanted))
+
+    cache.evict(keep=wanted)
+    return stats
+
+
+def get_basemap(bbox: Optional[BBox] = None, cache: Optional[TileCache] = None) -> Dict:
+    """
+    تحديد مصدر البلاطات للخريطة حسب MAP_TILES_MODE
+
+    - online: بلاطات OpenStreetMap مباشرة.
+    - local: البلاطات المخزنة فقط، والخريطة محصورة بمجال التقريب والمستطيل
+      اللذين تغطيهما (لا مساحات رمادية خارجها).
+    - auto: البلاطات المخزنة إن وجدت، مع fallback_url لجلب البلاطة الناقصة
+      (خارج المناطق أو مستويات التقريب المحملة) من المصدر عند الاتصال.
+
+    Args:
+        bbox: منطقة الخريطة (جنوب، غرب، شمال، شرق)؛ تُحدّث أوقات استخدام بلاطاتها المخزنة
+        cache: مخزن البلاطات
+
+    Returns:
+        قاموس بمعاملات folium.Map (tiles، attr، وحدود التقريب والمنطقة في الوضع
+        local)، ومعه fallback_url في الوضع auto
+    """
+    if MAP_TILES_MODE == 'online':
+        return {'tiles': 'OpenStreetMap'}
+
+    cache = cache or TileCache()
+    coverage = cache.coverage()
+    if coverage is None and MAP_TILES_MODE != 'local':
+        return {'tiles': 'OpenStreetMap'}
+
+    if bbox is not None:
+        cache.touch_bbox(bbox)
+
+    basemap = {'tiles': LOCAL_TILES_URL, 'attr': LOCAL_TILES_ATTRIBUTION}
+    if MAP_TILES_MODE != 'local':
+        basemap['fallback_url'] = TILE_SOURCE_URL
+    elif coverage is not None:
+        (min_zoom, max_zoom), (south, west, north, east) = coverage
+        basemap.update(
+            min_zoom=min_zoom, max_zoom=max_zoom, max_bounds=True,
+            min_lat=south, max_lat=north, min_lon=west, max_lon=east,
+        )
+    return basemap
+
+
+def main(argv=None):
+    """نقطة الدخول لسطر الأوامر"""
+    parser = argparse.ArgumentParser(description="تحميل بلاطات الخريطة للعمل دون اتصال")
+    parser.add_argument('--zoom', nargs=2, type=int, default=list(TILE_PREFETCH_ZOOMS),
+                        metavar=('MIN', 'MAX'), help="مجال مستويات التقريب")
+    parser.add_argument('--pad', type=float, default=0.01, help="هامش المستطيلات بالدرجات")
+    parser.add_argument('--max-tiles', type=int, default=20000, help="الحد الأقصى لعدد البلاطات")
+    parser.add_argument('--mbtiles', help="استيراد ملف MBTiles بدلاً من التحميل")
+    args = parser.parse_args(argv)
+
+    cache = TileCache()
+
+    if args.mbtiles:
+        count = cache.import_mbtiles(args.mbtiles)
+        print(f"تم استيراد {count} بلاطة إلى {cache.root}")
+        return
+
+    from config import DATA_PATH
+    from utils.data_loader import load_houses_data
+
+    df = load_houses_data(str(PROJECT_ROOT / DATA_PATH))
+    bboxes = get_project_bboxes(df, pad_deg=args.pad)
+    if not bboxes:
+        print("لا توجد إحداثيات لحساب مناطق المشروع")
+        return
+
+    def report(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"{done}/{total}")
+
+    stats = prefetch_tiles(bboxes, tuple(args.zoom), cache=cache,
+                           max_tiles=args.max_tiles, progress=report)
+    print(stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+الخط الزمني لتقييمات المنازل (تراكم الإرسالات يوماً بيوم)
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+DATE_COLUMN = 'تاريخ الارسال'
+
+
+def build_timeline(df: pd.DataFrame) -> Dict:
+    """
+    حساب إطارات الخط الزمني التراكمية مرة واحدة
+
+    تُرتب المنازل حسب تاريخ الإرسال، ثم يُحسب لكل يوم (من أول يوم إلى آخر يوم،
+    بما فيها الأيام بلا إرسالات) عدد المنازل المرسلة حتى نهايته بـ searchsorted.
+    المنازل المعروضة في اليوم d هي إذاً index[:offsets[d]]، والانتقال من يوم
+    لآخر لا يحتاج إلا الفرق بين الإزاحتين.
+
+    Args:
+        df: DataFrame المنازل (بعد clean_houses_data)
+
+    Returns:
+        قاموس: index (فهارس المنازل مرتبة زمنياً)، times، days (نصوص YYYY-MM-DD)، offsets
+    """
+    empty = {'index': np.array([], dtype=df.index.dtype), 'times': np.array([], dtype='datetime64[ns]'),
+             'days': [], 'offsets': np.array([], dtype=int)}
+    if DATE_COLUMN not in df.columns:
+        return empty
+
+    dates = pd.to_datetime(df[DATE_COLUMN], errors='coerce')
+    valid = dates.notna() & df['latitude'].notna() & df['longitude'].notna()
+    if not valid.any():
+        return empty
+
+    times = dates[valid].to_numpy()
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+
+    days = pd.date_range(pd.Timestamp(times[0]).normalize(), pd.Timestamp(times[-1]).normalize(), freq='D')
+    offsets = np.searchsorted(times, (days + pd.Timedelta(days=1)).to_numpy(), side='left')
+
+    return {
+        'index': df.index[valid].to_numpy()[order],
+        'times': times,
+        'days': [day.strftime('%Y-%m-%d') for day in days],
+        'offsets': offsets,
+    }
+
+
+def filter_timeline(timeline: Dict, index: pd.Index) -> Dict:
+    """
+    تقييد الخط الزمني المحسوب مسبقاً بمجموعة منازل (الفلاتر الحالية) دون إعادة ترتيب
+
+    Args:
+        timeline: ناتج build_timeline
+        index: فهارس المنازل المعروضة
+
+    Returns:
+        قاموس بنفس بنية build_timeline
+    """
+    keep = np.isin(timeline['index'], index.to_numpy())
+    kept_before = np.concatenate(([0], np.cumsum(keep)))
+    return {
+        'index': timeline['index'][keep],
+        'times': timeline['times'][keep],
+        'days': timeline['days'],
+        'offsets': kept_before[timeline['offsets']],
+    }
+
+
+@st.cache_data(show_spinner=False)
+def get_timeline(data_version: str, _df: pd.DataFrame) -> Dict:
+    """
+    الخط الزمني محسوباً مرة واحدة لكل إصدار من البيانات
+
+    Args:
+        data_version: إصدار ملف البيانات (get_data_version)
+        _df: DataFrame المنازل الكامل (لا يدخل في مفتاح التخزين)
+
+    Returns:
+        ناتج build_timeline
+    """
+    return build_timeline(_df)